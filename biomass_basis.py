@@ -389,6 +389,24 @@ def jenkins2014(dbh, j3, j4):
 
     return jbio2
 
+def basal_area(dbh, precision=4):
+    """ Computes the basal area of one tree from its dbh. The stand and plot outputs round to 4 places; individual trees from ``tps_Tree`` round to 6.
+
+    The math form for basal area is basal area = 0.00007854 * dbh * dbh
+
+    **INPUTS**
+
+    :dbh: cm diameter at breast height
+    :precision: the number of decimal places to round to
+
+    **RETURNS**
+
+    The basal area, in m\ :sup:`2`.
+
+    """
+
+    return round(0.00007854*float(dbh)*float(dbh), precision)
+
 def which_fx(function_string):
     """ Find the correct function for doing the Biomass ( Mg ), Jenkins Biomass ( Mg ), Volume ( m\ :sup:`3` ) , and Basal Area ( m\ :sup:`2` ) and wood density in the lookup table.
     The keys for the lookup table are the same as the FORM field in TP00110
@@ -413,3 +431,123 @@ def which_fx(function_string):
     'alder_biopak': alder_biopak}
 
     return lookup[function_string]
+
+class Equation(object):
+    """ One biomass equation from TP00110, with its parameters. An Equation is called with a dbh ( cm ) like the lambdas it replaces, and returns the same tuple of Biomass ( Mg ), Volume ( m\ :sup:`3` ), Jenkins Biomass ( Mg ), and wood density. Unlike a lambda, it can be pickled, so equations compiled once can be handed to other processes.
+
+    .. Example:
+
+    >>> f = biomass_basis.Equation('lnln', 0.45, -6.9, 2.4, None, -2.5, 2.4, None, None, None)
+    >>> f(47.5)
+    >>> (biomass, volume, jenkins biomass, wood density)
+
+    **INPUTS**
+
+    :form: the `form` attribute in TP00110, see ``which_fx``
+    :woodden: the wood density
+    :b1, b2, b3: the biomass parameters
+    :j1, j2: the Jenkins parameters
+    :h1, h2, h3: the height parameters
+
+    **RETURNS**
+
+    An Equation, which is called with a dbh.
+    """
+    __slots__ = ('form', 'woodden', 'b1', 'b2', 'b3', 'j1', 'j2', 'h1', 'h2', 'h3')
+
+    def __init__(self, form, woodden, b1, b2, b3, j1, j2, h1, h2, h3):
+        self.form = form
+        self.woodden = woodden
+        self.b1 = b1
+        self.b2 = b2
+        self.b3 = b3
+        self.j1 = j1
+        self.j2 = j2
+        self.h1 = h1
+        self.h2 = h2
+        self.h3 = h3
+
+    def __call__(self, dbh):
+        return which_fx(self.form)(self.woodden, dbh, self.b1, self.b2, self.b3, self.j1, self.j2, self.h1, self.h2, self.h3)
+
+    def __getstate__(self):
+        return tuple(getattr(self, x) for x in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return "Equation(" + ", ".join([x + "=" + repr(getattr(self, x)) for x in self.__slots__]) + ")"
+
+def as_parameter(value, places=11):
+    """ A parameter from TP00110 as a rounded float, or None if it is missing or not a number.
+    """
+    try:
+        return round(float(str(value)), places)
+    except Exception:
+        return None
+
+def compile_equations(rows):
+    """ Make the equation table of one or more species from their rows in TP00110.
+
+    Each species gets the first row of each of its equation sets (`normal`, `big`, ...). Coast redwood (`segi`) always uses ``segi_biopak``, and keeps only one equation set. The wood density, proxy, and component of a species are taken from its first row.
+
+    **INPUTS**
+
+    :rows: rows of `SPECIES, EQNSET, FORM, H1, H2, H3, B1, B2, B3, J1, J2, WOODDENSITY, PROXY, COMPONENT` from TP00110
+
+    **RETURNS**
+
+    :eqns: a dictionary of species to a dictionary of equation set to Equation
+    :woodden_dict: a dictionary of wood densities by species
+    :proxy_dict: a dictionary of equation proxies by species
+    :component_dict: a dictionary of components by species
+    """
+    eqns = {}
+    woodden_dict = {}
+    proxy_dict = {}
+    component_dict = {}
+
+    for row in rows:
+        species = str(row[0]).strip().lower()
+        eqnset = str(row[1]).rstrip().lower()
+        form = str(row[2]).strip().lower()
+
+        woodden = as_parameter(row[11], 3)
+
+        try:
+            proxy = str(row[12]).strip().lower()
+        except Exception:
+            proxy = "None"
+
+        try:
+            component = str(row[13]).strip().lower()
+        except Exception:
+            component = "None"
+
+        if species not in woodden_dict:
+            woodden_dict[species] = woodden
+        if species not in proxy_dict:
+            proxy_dict[species] = proxy
+        if species not in component_dict:
+            component_dict[species] = component
+
+        if species == 'segi':
+            form = 'segi_biopak'
+
+        h1, h2, h3, b1, b2, b3, j1, j2 = [as_parameter(row[x]) for x in range(3, 11)]
+        this_eqn = Equation(form, woodden, b1, b2, b3, j1, j2, h1, h2, h3)
+
+        if species not in eqns:
+            eqns[species] = {eqnset: this_eqn}
+        elif eqnset not in eqns[species]:
+            # coast redwood only keeps its latest equation set
+            if species == 'segi':
+                eqns[species] = {eqnset: this_eqn}
+            else:
+                eqns[species][eqnset] = this_eqn
+        else:
+            pass
+
+    return eqns, woodden_dict, proxy_dict, component_dict
@@ -0,0 +1,1659 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import csv
+import gc
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.pool
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:
+    # resource is only on unix; without it the peak RSS is not reported
+    resource = None
+
+import poptree_basis
+import tps_Stand
+import tps_Tree
+import tps_NPP
+
+# the `--all` runs that can be streamed or spread over workers, by (action, scale, analysis), and the file each one writes. These are the same files the regular `--all` runs of tps_cli write.
+STREAMING_RUNS = {
+    ('bio', 'stand', 'composite'): 'all_stands_biomass_composite_output.csv',
+    ('bio', 'stand', 'tree'): 'all_stand_indvtree_output.csv',
+    ('bio', 'plot', 'composite'): 'all_plot_composite_output.csv',
+    ('bio', 'study', 'composite'): 'all_studies_biomass_composite_output.csv',
+    ('bio', 'study', 'tree'): 'all_study_indvtree_output.csv',
+    ('npp', 'stand', 'composite'): 'all_stand_composite_npp.csv',
+    ('npp', 'plot', 'composite'): 'all_plot_composite_npp.csv',
+}
+
+# the connection, queries, and Capture of a worker process, set by ``init_worker``
+WORKER = {}
+
+# the queries a Stand makes of the database when it is built, by the section and name in `qf_2.yaml`, once the equations of every species are on its Capture object (see ``Capture.load_equations``). ``fetch_stand`` runs these for the pipeline.
+STAND_QUERIES = [('plot', 'query_plot'), ('stand', 'query_species'), ('stand', 'query_replacements'), ('stand', 'query'), ('stand', 'query_trees_m')]
+
+def peak_rss_mb():
+    """ The peak resident set size of this process so far, in MB, as the operating system reports it, or None if it can not be read on this platform.
+    """
+    if resource == None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak/(1024.*1024.)
+    else:
+        return peak/1024.
+
+def current_rss_mb():
+    """ The resident set size of this process right now, in MB. Read from /proc where there is one; otherwise the peak is the best that can be given.
+    """
+    try:
+        with open('/proc/self/statm') as readfile:
+            pages = int(readfile.read().split()[1])
+        return pages*os.sysconf('SC_PAGE_SIZE')/(1024.*1024.)
+    except Exception:
+        return peak_rss_mb()
+
+def stream_stands(cur, XFACTOR, queries, standids):
+    """ Load the Stands one at a time, as they are asked for.
+
+    The generator does not keep a Stand once it has handed it over, so when whoever consumes the Stands lets go of one, it is freed before the next one is loaded.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :XFACTOR: a Capture object
+    :queries: the queries from `qf_2.yaml`
+    :standids: a list of standids
+
+    **RETURNS**
+
+    A generator of Stands.
+    """
+    for each_stand in standids:
+        yield tps_Stand.Stand(cur, XFACTOR, queries, each_stand.lower())
+
+def stand_biomasses(A, XFACTOR):
+    """ The stand Biomasses and their aggregate for one Stand, as `(Stand, Biomasses, Biomasses_Agg)`.
+    """
+    BM, _, _ = A.compute_biomasses(XFACTOR)
+    BMA = A.aggregate_biomasses(BM)
+    return A, BM, BMA
+
+def plot_biomasses(A, XFACTOR):
+    """ The plot Biomasses and their aggregate for one Stand, as `(Plot, Biomasses_plot, Biomasses_Agg_plot)`.
+    """
+    K = tps_Stand.Plot(A, XFACTOR, [])
+    BM_plot = K.compute_biomasses_plot(XFACTOR)
+    BMA_plot = K.aggregate_biomasses_plot(BM_plot)
+    return K, BM_plot, BMA_plot
+
+def stream_biomasses(stands, XFACTOR):
+    """ Compute the stand Biomasses for each Stand from a generator of Stands, one Stand at a time. Like ``stream_stands``, nothing is kept after a result is handed over (a loop variable would keep the last Stand alive).
+
+    **INPUTS**
+
+    :stands: a generator of Stands, like ``stream_stands``
+    :XFACTOR: a Capture object
+
+    **RETURNS**
+
+    A generator of `(Stand, Biomasses, Biomasses_Agg)`.
+    """
+    return map(lambda A: stand_biomasses(A, XFACTOR), stands)
+
+def stream_plot_biomasses(stands, XFACTOR):
+    """ Compute the plot Biomasses for each Stand from a generator of Stands, one Stand at a time.
+
+    **INPUTS**
+
+    :stands: a generator of Stands, like ``stream_stands``
+    :XFACTOR: a Capture object
+
+    **RETURNS**
+
+    A generator of `(Plot, Biomasses_plot, Biomasses_Agg_plot)`.
+    """
+    return map(lambda A: plot_biomasses(A, XFACTOR), stands)
+
+def all_standids(cur, queries, scale):
+    """ The standids of an `--all` run, in the order tps_cli runs them: every stand for the `stand` and `plot` scales, or the stands of each study in turn for the `study` scale.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :queries: the queries from `qf_2.yaml`
+    :scale: `stand`, `plot`, or `study`
+
+    **RETURNS**
+
+    A list of standids.
+    """
+    standids = []
+
+    if scale == 'study':
+        cur.execute(queries['execution']['list_of_all_studies'])
+        studyids = [str(row[0]) for row in cur]
+
+        standids = [x[1] for x in study_stands(cur, queries, studyids)]
+
+    else:
+        cur.execute(queries['execution']['list_of_all_stands'])
+        standids = [str(row[0]) for row in cur]
+
+    return standids
+
+def study_stands(cur, queries, studyids):
+    """ The stands of each study in turn, as `list_of_stands_in_studies` lists them. A stand that is in more than one study is listed once for each.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :queries: the queries from `qf_2.yaml`
+    :studyids: a list of studyids
+
+    **RETURNS**
+
+    A list of `(studyid, standid)`.
+    """
+    pairs = []
+
+    for each_study in studyids:
+        cur.execute(queries['execution']['list_of_stands_in_studies'].format(studyid=each_study))
+        pairs += [(each_study, str(row[0])) for row in cur]
+
+    return pairs
+
+def run_study(cur, XFACTOR, queries, studyids, run_key, filename_out):
+    """ Compute the stands of some studies and write them to one file, study by study, as the study outputs of tps_cli are written, but compute each distinct stand only once.
+
+    A stand that is in more than one study is written at its place in every study, as before. The first time it comes up, it is computed and written; if it comes up again later in the run, its rows (without the header) are also kept in a file of their own, which is copied to the output each time it comes up again, and removed after the last time. The outputs are the same, byte for byte, as when each stand was computed for each of its studies.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :XFACTOR: a Capture object
+    :queries: the queries from `qf_2.yaml`
+    :studyids: a list of studyids
+    :run_key: a key of STREAMING_RUNS with the `study` scale, like `('bio', 'study', 'composite')`
+    :filename_out: the csv file
+
+    **RETURNS**
+
+    :saved: a dictionary of how much work was saved, containing the number of studies, of places a stand is written (`stand_places`), of distinct stands computed, of places written from a stand computed earlier (`fanned_out`), and the tree-years computed and not computed again
+    """
+    pairs = study_stands(cur, queries, studyids)
+
+    last_place = {}
+    for index, each_pair in enumerate(pairs):
+        last_place[each_pair[1].lower()] = index
+
+    # the rows of the stands that come up again later in the run, and the tree-years of every stand computed
+    kept = {}
+    tree_years = {}
+
+    saved = {'studies': len(studyids), 'stand_places': len(pairs), 'distinct_stands': 0, 'fanned_out': 0, 'tree_years_computed': 0, 'tree_years_saved': 0}
+    keep_directory = tempfile.mkdtemp(prefix='tps_fanout_')
+
+    try:
+        for index, each_pair in enumerate(pairs):
+            standid = each_pair[1].lower()
+
+            if index == 0:
+                mode = 'w'
+            else:
+                mode = 'a'
+
+            if standid in kept:
+                with open(filename_out, 'ab') as writefile:
+                    with open(kept[standid], 'rb') as readfile:
+                        shutil.copyfileobj(readfile, writefile)
+
+                saved['fanned_out'] += 1
+                saved['tree_years_saved'] += tree_years[standid]
+
+            else:
+                A = tps_Stand.Stand(cur, XFACTOR, queries, standid)
+                result = compute_result(A, XFACTOR, run_key)
+                write_result(result, XFACTOR, run_key, filename_out, mode)
+
+                tree_years[standid] = len(A.table)
+                saved['distinct_stands'] += 1
+                saved['tree_years_computed'] += len(A.table)
+
+                if last_place[standid] > index:
+                    kept[standid] = os.path.join(keep_directory, standid + '.csv')
+                    write_result(result, XFACTOR, run_key, kept[standid], 'a')
+
+                del A
+                del result
+
+            if standid in kept and last_place[standid] == index:
+                os.remove(kept.pop(standid))
+
+    finally:
+        shutil.rmtree(keep_directory, ignore_errors=True)
+
+    print("wrote " + str(saved['stand_places']) + " stands of " + str(saved['studies']) + " studies to " + filename_out + " from " + str(saved['distinct_stands']) + " distinct stands")
+
+    if saved['fanned_out'] > 0:
+        total = saved['tree_years_computed'] + saved['tree_years_saved']
+        print(str(saved['fanned_out']) + " stands in more than one study were written from the stand computed for their first study, saving " + str(saved['tree_years_saved']) + " of " + str(total) + " tree-years (" + str(round(100.*saved['tree_years_saved']/max(total, 1), 1)) + "% of the work)")
+
+    return saved
+
+def compute_result(A, XFACTOR, run_key):
+    """ Compute what one of the STREAMING_RUNS writes for one Stand.
+
+    **INPUTS**
+
+    :A: a Stand
+    :XFACTOR: a Capture object
+    :run_key: a key of STREAMING_RUNS, like `('bio', 'stand', 'composite')`
+
+    **RETURNS**
+
+    A tuple whose first item is the Stand or its Plot, followed by what is written for it, if anything.
+    """
+    action, scale, analysis = run_key
+
+    if analysis == 'tree':
+        return (A,)
+    elif scale == 'plot':
+        return plot_biomasses(A, XFACTOR)
+    else:
+        return stand_biomasses(A, XFACTOR)
+
+def write_result(result, XFACTOR, run_key, filename_out, mode):
+    """ Write a result from ``compute_result`` to a file, with the same writer tps_cli uses for that run.
+
+    **INPUTS**
+
+    :result: a result from ``compute_result``
+    :XFACTOR: a Capture object
+    :run_key: a key of STREAMING_RUNS
+    :filename_out: the csv file
+    :mode: `w` for the first stand of a run, `a` for the rest
+    """
+    action, scale, analysis = run_key
+
+    if analysis == 'tree':
+        result[0].write_individual_trees(filename_out, mode)
+
+    elif action == 'bio' and scale == 'plot':
+        result[0].write_plot_composite(result[1], result[2], XFACTOR, filename_out, mode)
+
+    elif action == 'bio':
+        result[0].write_stand_composite(result[1], result[2], XFACTOR, filename_out, mode)
+
+    elif action == 'npp' and scale == 'plot':
+        tps_NPP.write_NPP_composite_plot(result[0], result[1], result[2], filename_out, mode)
+
+    elif action == 'npp':
+        tps_NPP.write_NPP_composite_stand(result[0], result[1], result[2], filename_out, mode)
+
+class Quarantine(object):
+    """ The stands and trees that an unattended (`--batch`) run set aside because they raised an error, kept in a file with one JSON object on each line, so the run can go on and they can be looked at and retried later (see ``retry_quarantined``).
+
+    Each line has the time, the kind of unit (`stand` or `tree`), the unit, the run it was in (like `["bio", "stand", "composite"]`), the stage it failed in (`compute` or `write`), the name of the error, its message, its context (see ``poptree_basis.DataError``), and the traceback.
+
+    **INPUTS**
+
+    :filename: the name of the file, added to if it is there already
+
+    **RETURNS**
+
+    :self.count: the number of units quarantined by this run
+    """
+    def __init__(self, filename='quarantine.jsonl'):
+        self.filename = filename
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, kind, unit, run_key, stage, error):
+        """ Record a unit that raised an error. This is called while the error is being handled, so its traceback is kept.
+        """
+        entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'kind': kind, 'unit': str(unit), 'run': list(run_key), 'stage': stage, 'error': type(error).__name__, 'message': str(error), 'context': getattr(error, 'context', {}), 'traceback': traceback.format_exc()}
+
+        # the threads of a batch of jobs share one quarantine
+        with self.lock:
+            with open(self.filename, 'a') as writefile:
+                writefile.write(json.dumps(entry, default=str) + "\n")
+
+            self.count += 1
+        print(kind + " " + str(unit) + " was quarantined in " + self.filename + " (" + entry['error'] + ": " + entry['message'] + ")")
+
+def read_quarantine(filename):
+    """ Read the entries of a quarantine file (see ``Quarantine``), skipping any line that was cut off.
+    """
+    entries = []
+
+    with open(filename, 'r') as readfile:
+        for each_line in readfile:
+            try:
+                entries.append(json.loads(each_line))
+            except ValueError:
+                continue
+
+    return entries
+
+def guarded_result(cur, XFACTOR, queries, standid, run_key, quarantine):
+    """ Build and compute one stand for a batch run. If it raises an error, it is quarantined, and `(None, standid)` is given in place of its result so that the run goes on.
+    """
+    try:
+        A = tps_Stand.Stand(cur, XFACTOR, queries, standid.lower())
+        return compute_result(A, XFACTOR, run_key)
+    except Exception as error:
+        quarantine.add('stand', standid, run_key, 'compute', error)
+        return (None, standid)
+
+def result_standid(result):
+    """ The standid of a result from ``compute_result`` or ``guarded_result``.
+    """
+    if result[0] == None:
+        return str(result[1])
+    elif isinstance(result[0], tps_Stand.Plot):
+        return result[0].Stand.standid
+    else:
+        return result[0].standid
+
+def guarded_write(result, XFACTOR, run_key, filename_out, mode, quarantine):
+    """ Write a result like ``write_result`` for a batch run. If it raises an error, whatever it had written is cut from the output and the stand is quarantined.
+
+    **RETURNS**
+
+    False if the stand was quarantined, otherwise True.
+    """
+    if mode == 'w' or not os.path.exists(filename_out):
+        begin = 0
+    else:
+        begin = os.path.getsize(filename_out)
+
+    try:
+        write_result(result, XFACTOR, run_key, filename_out, mode)
+        return True
+
+    except Exception as error:
+        if os.path.exists(filename_out):
+            with open(filename_out, 'r+b') as writefile:
+                writefile.truncate(begin)
+
+        quarantine.add('stand', result_standid(result), run_key, 'write', error)
+        return False
+
+def guarded_tree(cur, queries, treeid, analysis, filename_out, mode, quarantine):
+    """ Compute or check one tree and write it, as ``tps_cli.py bio tree`` does, for a batch run. If it raises an error, whatever it had written is cut from the output and the tree is quarantined.
+
+    **INPUTS**
+
+    :cur: a cursor
+    :queries: the queries from `qf_2.yaml`
+    :treeid: the treeid
+    :analysis: `composite` or `tree` for biomasses, or `checks`
+    :filename_out: the csv file
+    :mode: `wt` for the first tree, `a` for the rest
+    :quarantine: a Quarantine, or None to let the error through
+
+    **RETURNS**
+
+    False if the tree was quarantined, otherwise True.
+    """
+    if mode == 'wt' or not os.path.exists(filename_out):
+        begin = 0
+    else:
+        begin = os.path.getsize(filename_out)
+
+    stage = 'compute'
+
+    try:
+        A = tps_Tree.Tree(cur, queries, treeid)
+
+        if analysis == 'checks':
+            Checks = A.check_trees()
+            stage = 'write'
+            A.only_output_checks(Checks, checkfile = filename_out, mode = mode)
+        else:
+            Bios = A.compute_biomasses()
+            stage = 'write'
+            A.only_output_attributes(Bios, datafile = filename_out, mode = mode)
+
+        return True
+
+    except Exception as error:
+        if quarantine == None:
+            raise
+
+        if stage == 'write' and os.path.exists(filename_out):
+            with open(filename_out, 'r+b') as writefile:
+                writefile.truncate(begin)
+
+        quarantine.add('tree', treeid, ('bio', 'tree', analysis), stage, error)
+        return False
+
+def retry_quarantined(cur, XFACTOR, queries, filename_in='quarantine.jsonl', debug=False):
+    """ Run again only the stands and trees in a quarantine file (see ``Quarantine``), once what made them fail has been fixed.
+
+    The stands of each run are written, in the order they were quarantined, to a retry file next to the output of the run, like `all_stands_biomass_composite_output.retry.csv`, and the trees of each run to a file like `retry_bio_tree_checks_output.csv`, so the output of the run is not touched. The quarantine file is then rewritten with only the units that failed again, with their new errors; if every unit was fixed, it is kept as a record of them, renamed with `.done` at the end (like `quarantine.jsonl.done`).
+
+    **INPUTS**
+
+    :cur: a cursor
+    :XFACTOR: a Capture object
+    :queries: the queries from `qf_2.yaml`
+    :filename_in: the quarantine file
+    :debug: optional; if True, the units are not quarantined again, and bad data drops into the debugger (see ``poptree_basis.debug_here``) so it can be looked at
+
+    **RETURNS**
+
+    :retried: a dictionary of the number of units `retried`, `fixed`, and `failed` again
+    """
+    entries = read_quarantine(filename_in)
+
+    # each unit once, with the run it failed in, in the order it was first quarantined
+    units = []
+
+    for each_entry in entries:
+        unit = (each_entry['kind'], tuple(each_entry['run']), each_entry['unit'])
+        if unit not in units:
+            units.append(unit)
+
+    runs = []
+
+    for each_unit in units:
+        if each_unit[0:2] not in runs:
+            runs.append(each_unit[0:2])
+
+    batch = poptree_basis.BATCH
+    poptree_basis.BATCH = not debug
+
+    # the units that fail again go to a new quarantine, which then takes the place of the old one
+    quarantine = Quarantine(filename_in + '.retry')
+
+    if os.path.exists(quarantine.filename):
+        os.remove(quarantine.filename)
+
+    try:
+        for kind, run_key in runs:
+            unit_ids = [x[2] for x in units if x[0:2] == (kind, run_key)]
+
+            if kind == 'stand' and run_key in STREAMING_RUNS:
+                filename_out = os.path.splitext(STREAMING_RUNS[run_key])[0] + '.retry.csv'
+
+                if debug == True:
+                    for index, each_stand in enumerate(unit_ids):
+                        A = tps_Stand.Stand(cur, XFACTOR, queries, each_stand.lower())
+                        write_result(compute_result(A, XFACTOR, run_key), XFACTOR, run_key, filename_out, 'w' if index == 0 else 'a')
+                else:
+                    results, write = stream_results(cur, XFACTOR, queries, unit_ids, run_key[0], run_key[1], run_key[2], quarantine, filename_out)
+                    run_streaming(results, write)
+
+            elif kind == 'tree':
+                filename_out = 'retry_' + "_".join(run_key) + '_output.csv'
+                written = False
+
+                for each_tree in unit_ids:
+                    if written == True:
+                        mode = 'a'
+                    else:
+                        mode = 'wt'
+
+                    if debug == True:
+                        written = guarded_tree(cur, queries, each_tree, run_key[2], filename_out, mode, None)
+                    elif guarded_tree(cur, queries, each_tree, run_key[2], filename_out, mode, quarantine) == True:
+                        written = True
+
+            else:
+                print("the " + kind + "s of " + " ".join(run_key) + " can not be retried; they are kept in the quarantine")
+
+                with open(quarantine.filename, 'a') as writefile:
+                    for each_entry in entries:
+                        if (each_entry['kind'], tuple(each_entry['run'])) == (kind, run_key):
+                            writefile.write(json.dumps(each_entry, default=str) + "\n")
+
+                quarantine.count += len(unit_ids)
+
+    finally:
+        poptree_basis.BATCH = batch
+
+    if os.path.exists(quarantine.filename):
+        os.replace(quarantine.filename, filename_in)
+    elif debug == False:
+        os.replace(filename_in, filename_in + '.done')
+
+    retried = {'retried': len(units), 'fixed': len(units) - quarantine.count, 'failed': quarantine.count}
+    print("retried " + str(retried['retried']) + " quarantined units: " + str(retried['fixed']) + " were fixed and " + str(retried['failed']) + " failed again")
+
+    return retried
+
+def stream_results(cur, XFACTOR, queries, standids, action, scale, analysis, quarantine=None, filename_out=None):
+    """ Build the generator of results for one of the STREAMING_RUNS, and the function that writes each result to its file.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :XFACTOR: a Capture object
+    :queries: the queries from `qf_2.yaml`
+    :standids: a list of standids
+    :action: `bio` or `npp`
+    :scale: `stand`, `plot`, or `study`
+    :analysis: `composite` or `tree`
+    :quarantine: optional, a Quarantine for a batch run; a stand that raises an error is quarantined and given as `(None, standid)` instead of stopping the run (see ``guarded_result`` and ``guarded_write``)
+    :filename_out: optional, the csv file; STREAMING_RUNS gives the file if it is not given
+
+    **RETURNS**
+
+    :results: a generator of tuples whose first item is a Stand or a Plot
+    :write: a function taking a result and a mode (`w` or `a`) that writes the result
+    """
+    run_key = (action, scale, analysis)
+
+    if filename_out == None:
+        filename_out = STREAMING_RUNS[run_key]
+
+    if quarantine != None:
+        results = map(lambda standid: guarded_result(cur, XFACTOR, queries, standid, run_key, quarantine), standids)
+        write = lambda result, mode: guarded_write(result, XFACTOR, run_key, filename_out, mode, quarantine)
+
+        return results, write
+
+    stands = stream_stands(cur, XFACTOR, queries, standids)
+
+    if analysis == 'tree':
+        results = map(lambda A: (A,), stands)
+    elif scale == 'plot':
+        results = stream_plot_biomasses(stands, XFACTOR)
+    else:
+        results = stream_biomasses(stands, XFACTOR)
+
+    write = lambda result, mode: write_result(result, XFACTOR, run_key, filename_out, mode)
+
+    return results, write
+
+def run_streaming(results, write, memory_budget=None, start_index=0, journal=None):
+    """ Write each result as soon as it is made, then let go of it before the next one is made, and record the time and memory each stand took.
+
+    If a memory budget is given and the process is over it after a stand, garbage is collected; if it is still over, the stand is flagged in the summary and the run stops there, before the next stand is loaded. Every stand written so far is in the output and in the journal, so the run can go on from the next stand with `--resume`, in a new process that starts without what this one had built up.
+
+    If a journal is given (see ``RunJournal``), each stand is recorded in it once it is written, so the run can be resumed after it.
+
+    In a batch run (see ``stream_results``), a stand that was quarantined comes as `(None, standid)`, or its write gives False; it is recorded in the journal as done, with nothing written, and left out of the summary. The header is written with the first stand that is written.
+
+    **INPUTS**
+
+    :results: a generator of tuples whose first item is a Stand or a Plot, from ``stream_results``
+    :write: a function taking a result and a mode (`w` or `a`)
+    :memory_budget: optional, a memory budget in MB
+    :start_index: optional, the position in the run of the first result, when a run is resumed; only the first stand written to the output is written with `w`
+    :journal: optional, a RunJournal
+
+    **RETURNS**
+
+    :summary: a list with a dictionary for each stand, containing its standid, the number of tree-years, the size of its tree table, the seconds it took, the resident memory it added while it was held (`stand_mb`), the resident memory while it was held and after it was let go, the peak resident memory so far, and whether it was over the budget; if the last stand was over the budget, the run stopped after it
+    """
+    summary = []
+    index = start_index
+    peak_seen = 0.
+
+    # nothing is in the output yet, so the next stand written starts it with its header
+    if journal != None:
+        empty = (journal.end == 0)
+    else:
+        empty = (start_index == 0)
+
+    while True:
+        rss_before = current_rss_mb()
+        start = time.time()
+
+        try:
+            result = next(results)
+        except StopIteration:
+            break
+
+        if empty == True:
+            mode = 'w'
+        else:
+            mode = 'a'
+
+        # a stand a batch run quarantined is done, with nothing written for it
+        if result[0] == None or write(result, mode) == False:
+            if journal != None:
+                journal.record(index, result_standid(result))
+            del result
+            index += 1
+            continue
+
+        empty = False
+
+        # the memory of the process while it holds this stand and its outputs
+        rss_held = current_rss_mb()
+        peak_seen = max(peak_seen, rss_held)
+
+        if isinstance(result[0], tps_Stand.Plot):
+            A = result[0].Stand
+        else:
+            A = result[0]
+
+        standid = A.standid
+        tree_years = len(A.table)
+        table_kb = A.table.nbytes()/1024.
+
+        if journal != None:
+            journal.record(index, standid)
+
+        # let go of the stand and its outputs before measuring what is left
+        del A
+        del result
+
+        rss_after = current_rss_mb()
+        over_budget = False
+
+        if memory_budget != None and rss_after > memory_budget:
+            gc.collect()
+            rss_after = current_rss_mb()
+
+            if rss_after > memory_budget:
+                over_budget = True
+                print("after " + standid + " the run is using " + str(round(rss_after, 1)) + " MB, over the budget of " + str(memory_budget) + " MB; stopping the run")
+
+        summary.append({'standid': standid, 'tree_years': tree_years, 'table_kb': table_kb, 'seconds': time.time() - start, 'stand_mb': rss_held - rss_before, 'rss_held_mb': rss_held, 'rss_after_mb': rss_after, 'peak_rss_mb': max(peak_rss_mb() or 0., peak_seen), 'over_budget': over_budget})
+
+        index += 1
+
+        # the stand is written and in the journal, so the run stops here and is resumed from the next one
+        if over_budget == True:
+            break
+
+    return summary
+
+class RunJournal(object):
+    """ A journal of a streamed `--all` run, kept next to its output (like `all_stands_biomass_composite_output.journal`), so that a run that dies part of the way through can be resumed instead of started over.
+
+    The first line of the journal describes the run: its key, the number of stands, and a digest of the list of stands (see ``stand_list_digest``). Then, as each stand is written, a line is added with its position in the run, its standid, and the size of the output once it was written. Each line is flushed to disk before the next stand is started.
+
+    To resume, the journal is read up to its last whole line. The output is cut back to the size recorded for the last stand in it, which drops anything a stand that did not finish had written, and the run goes on from the next stand. If there is no journal, or it is for a different run or list of stands, or the output is shorter than the journal says, the run starts over from the first stand.
+
+    **INPUTS**
+
+    :filename_out: the output of the run
+    :run_key: a key of STREAMING_RUNS
+    :standids: all the standids of the run, in order
+    :resume: True to resume from the journal, False to start a new one
+
+    **RETURNS**
+
+    :self.next_index: the position in the run of the first stand still to do
+    :self.filename: the name of the journal
+    """
+    def __init__(self, filename_out, run_key, standids, resume=False):
+        self.filename_out = filename_out
+        self.filename = os.path.splitext(filename_out)[0] + '.journal'
+        self.header = {'run': list(run_key), 'total_stands': len(standids), 'stand_list': stand_list_digest(standids), 'output': filename_out}
+        self.standids = standids
+        self.next_index = 0
+        self.end = 0
+
+        if resume == True:
+            self.next_index = self.resume()
+
+        if self.next_index == 0:
+            with open(self.filename, 'w') as writefile:
+                writefile.write(json.dumps(self.header) + "\n")
+
+        self.writefile = open(self.filename, 'a')
+
+    def resume(self):
+        """ Read the journal and cut the output back to the last stand that was done, see above.
+
+        **RETURNS**
+
+        The position in the run of the first stand still to do.
+        """
+        if not os.path.exists(self.filename):
+            print("there is no journal " + self.filename + " to resume from; starting from the first stand")
+            return 0
+
+        lines = []
+        with open(self.filename, 'r') as readfile:
+            for each_line in readfile:
+
+                # the last line may have been cut off when the run died
+                if not each_line.endswith("\n"):
+                    break
+
+                try:
+                    lines.append(json.loads(each_line))
+                except ValueError:
+                    break
+
+        if lines == [] or lines[0] != self.header:
+            print("the journal " + self.filename + " is for a different run or list of stands; starting from the first stand")
+            return 0
+
+        entries = lines[1:]
+
+        if [x['index'] for x in entries] != list(range(len(entries))):
+            print("the journal " + self.filename + " is out of order; starting from the first stand")
+            return 0
+
+        if entries == []:
+            return 0
+
+        end = entries[-1]['end']
+
+        # a batch run that quarantined every stand so far has no output yet
+        if end == 0 and not os.path.exists(self.filename_out):
+            cut = 0
+
+        elif not os.path.exists(self.filename_out) or os.path.getsize(self.filename_out) < end:
+            print("the output " + self.filename_out + " is shorter than its journal says; starting from the first stand")
+            return 0
+
+        else:
+            cut = os.path.getsize(self.filename_out) - end
+
+            with open(self.filename_out, 'r+b') as writefile:
+                writefile.truncate(end)
+
+        self.end = end
+
+        # the journal is written again without any line that was cut off
+        with open(self.filename, 'w') as writefile:
+            for each_line in lines:
+                writefile.write(json.dumps(each_line) + "\n")
+
+        if len(entries) < len(self.standids):
+            print("resuming at stand " + str(len(entries) + 1) + " of " + str(len(self.standids)) + " (" + str(self.standids[len(entries)]) + "); " + str(cut) + " bytes written after " + entries[-1]['standid'] + " were cut from " + self.filename_out)
+        else:
+            print("every stand in the journal " + self.filename + " is already done")
+
+        return len(entries)
+
+    def record(self, index, standid):
+        """ Record that the stand at `index` in the run is written, with the size of the output after it, once the output is on disk.
+        """
+        # a batch run may not have written anything yet, if its first stands were quarantined
+        if os.path.exists(self.filename_out):
+            with open(self.filename_out, 'rb') as readfile:
+                os.fsync(readfile.fileno())
+                end = os.fstat(readfile.fileno()).st_size
+        else:
+            end = 0
+
+        self.end = end
+        self.writefile.write(json.dumps({'index': index, 'standid': standid, 'end': end}) + "\n")
+        self.writefile.flush()
+        os.fsync(self.writefile.fileno())
+
+    def close(self):
+        self.writefile.close()
+
+def write_run_summary(summary, filename_out='run_summary.csv', memory_budget=None):
+    """ Write the run summary from ``run_streaming`` to a csv file, and print the totals.
+
+    **INPUTS**
+
+    :summary: the summary from ``run_streaming``
+    :filename_out: the name of the csv file
+    :memory_budget: optional, the memory budget in MB that the run had
+
+    **RETURNS**
+
+    A csv file with one row for each stand, like ``STANDID, TREE_YEARS, TABLE_KB, SECONDS, STAND_MB, RSS_HELD_MB, RSS_AFTER_MB, PEAK_RSS_MB, OVER_BUDGET``.
+    """
+    with open(filename_out, 'w') as writefile:
+        writer = csv.writer(writefile, delimiter = ",", quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(['STANDID', 'TREE_YEARS', 'TABLE_KB', 'SECONDS', 'STAND_MB', 'RSS_HELD_MB', 'RSS_AFTER_MB', 'PEAK_RSS_MB', 'OVER_BUDGET'])
+
+        for each_stand in summary:
+
+            new_row = [each_stand['standid'].upper(), each_stand['tree_years'], round(each_stand['table_kb'], 1), round(each_stand['seconds'], 3), round(each_stand['stand_mb'], 1), round(each_stand['rss_held_mb'], 1), round(each_stand['rss_after_mb'], 1), round(each_stand['peak_rss_mb'], 1), str(each_stand['over_budget'])]
+            writer.writerow(new_row)
+
+    peak = max([peak_rss_mb() or 0.] + [x['peak_rss_mb'] for x in summary])
+    over = [x['standid'] for x in summary if x['over_budget'] == True]
+
+    print("streamed " + str(len(summary)) + " stands in " + str(round(sum([x['seconds'] for x in summary]), 1)) + " seconds; summary is in " + filename_out)
+
+    print("peak resident memory was " + str(round(peak, 1)) + " MB")
+
+    if memory_budget != None:
+        if over == []:
+            print("every stand stayed within the memory budget of " + str(memory_budget) + " MB")
+        else:
+            print(str(len(over)) + " stands went over the memory budget of " + str(memory_budget) + " MB: " + ", ".join(over))
+
+def share_capture(XFACTOR, queries=None):
+    """ Put the Capture object, with its equations loaded, and the queries in WORKER before the workers of a run are forked, so the workers get them as they are here instead of each querying for their own.
+
+    **INPUTS**
+
+    :XFACTOR: a Capture object, or None if each worker should build its own (see ``init_worker``)
+    :queries: optional, the queries from `qf_2.yaml`, for workers that are not given them when they start
+    """
+    WORKER.clear()
+
+    if XFACTOR != None:
+        if XFACTOR.equations == None:
+            XFACTOR.load_equations()
+        WORKER['XFACTOR'] = XFACTOR
+
+    if queries != None:
+        WORKER['queries'] = queries
+
+def init_worker(queries, forked=False):
+    """ Start a worker process of ``run_parallel`` with its own connection to the database, kept in WORKER.
+
+    If the process that started the workers put its Capture object in WORKER before they were forked, the workers share it (and its compiled equations) instead of each querying for their own. A forked worker's copy of it is detached from the parent's connection and given the worker's own (see ``poptree_basis.detach_connection``), so workers only ever use their own connection.
+
+    **INPUTS**
+
+    :queries: the queries from `qf_2.yaml`
+    :forked: optional, True in a forked worker; False when the stands are run on the process that started the run, which keeps its own connection
+    """
+    DATABASE_CONNECTION = poptree_basis.YamlConn()
+    conn, cur = DATABASE_CONNECTION.sql_connect()
+
+    WORKER['conn'] = conn
+    WORKER['cur'] = cur
+    WORKER['queries'] = queries
+
+    if 'XFACTOR' not in WORKER:
+        WORKER['XFACTOR'] = poptree_basis.Capture(cur, queries)
+    elif forked == True:
+        poptree_basis.detach_connection(WORKER['XFACTOR'], cur)
+
+def init_compute_worker():
+    """ Start a forked worker that only computes stands from what is handed to it, like those of ``run_pipeline`` and of ``jobs_basis.run_jobs``. It has no connection of its own, so its copy of the shared Capture object is detached from the parent's (see ``poptree_basis.detach_connection``).
+    """
+    poptree_basis.detach_connection(WORKER['XFACTOR'])
+
+def stand_costs(cur, queries):
+    """ Estimate the cost of computing each stand by the number of its tree-years, from one count over the whole database: the measurements of its trees in TP00102 and their mortality measurements in TP00103. Trees without any measurements add nothing.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :queries: the queries from `qf_2.yaml`
+
+    **RETURNS**
+
+    :costs: a dictionary of standid (in lower case) to its number of tree-years
+    """
+    costs = {}
+
+    cur.execute(queries['execution']['count_of_tree_years_by_stand'])
+    for row in cur:
+        costs[str(row[0]).strip().lower()] = int(row[1])
+
+    return costs
+
+def schedule_stands(standids, costs):
+    """ Order the stands of a run so the most expensive ones are started first, so that a large stand does not start last and hold up the end of the run. Stands with the same cost keep their order; a stand without an estimate is given the mean of the others.
+
+    **INPUTS**
+
+    :standids: a list of standids, in the order they should be written
+    :costs: a dictionary of standid (in lower case) to its estimated cost, like ``stand_costs``
+
+    **RETURNS**
+
+    A list of the positions of the stands in `standids`, in the order they should be started.
+    """
+    known = [costs[x.lower()] for x in standids if x.lower() in costs]
+
+    if known == []:
+        return list(range(len(standids)))
+
+    mean_cost = sum(known)/float(len(known))
+    estimates = [costs.get(x.lower(), mean_cost) for x in standids]
+
+    return sorted(range(len(standids)), key=lambda index: -estimates[index])
+
+def run_one_stand(task):
+    """ Compute one stand in a worker process and write it to its own part file, with the mode that stand would have had in a run on one process, so the parts can be put together in order.
+
+    **INPUTS**
+
+    :task: a tuple of `(index, standid, run_key, part_filename)`
+
+    **RETURNS**
+
+    A tuple of `(index, standid, part_filename, seconds, process id, tree-years)`.
+    """
+    index, standid, run_key, part_filename = task
+    start = time.time()
+
+    A = tps_Stand.Stand(WORKER['cur'], WORKER['XFACTOR'], WORKER['queries'], standid.lower())
+    result = compute_result(A, WORKER['XFACTOR'], run_key)
+
+    if index == 0:
+        mode = 'w'
+    else:
+        mode = 'a'
+
+    write_result(result, WORKER['XFACTOR'], run_key, part_filename, mode)
+
+    return index, standid, part_filename, time.time() - start, os.getpid(), len(A.table)
+
+def run_parallel(standids, run_key, queries, workers, filename_out=None, costs=None, XFACTOR=None):
+    """ Compute the stands of one of the STREAMING_RUNS on a pool of worker processes and put their outputs together in one file, in the same order as a run on one process.
+
+    Each worker has its own connection (see ``init_worker``) and writes each of its stands to a part file. If a Capture object is given, its equations are compiled (see ``Capture.load_equations``) and it is shared with the workers when they are forked, so adding workers does not add to the queries at the start of the run or to the memory they take; otherwise each worker makes its own. If the costs of the stands are given, the most expensive stands are started first (see ``schedule_stands``). The parts are appended to the output in the order of `standids` as soon as all the stands before them are done, so the output is the same, byte for byte, as the one made without workers.
+
+    The output is put together in `filename_out + '.partial'`, which is renamed to `filename_out` once every stand is in it. If a stand fails, the error is raised, the stands that were done before it are left in the partial file, in order, and `filename_out` is not touched.
+
+    .. note:: the workers are forked from the process that starts them, as tps_cli can not be imported again by a spawned process. Where forking is not possible, the stands are run on this process instead.
+
+    **INPUTS**
+
+    :standids: a list of standids, in the order they should be written
+    :run_key: a key of STREAMING_RUNS, like `('npp', 'stand', 'composite')`
+    :queries: the queries from `qf_2.yaml`
+    :workers: the number of worker processes
+    :filename_out: optional, the csv file; STREAMING_RUNS gives the file if it is not given
+    :costs: optional, a dictionary of standid (in lower case) to its estimated cost, like ``stand_costs``
+    :XFACTOR: optional, a Capture object to share with the workers
+
+    **RETURNS**
+
+    :summary: a list with a dictionary for each stand, in the order of `standids`, containing its standid, its estimated and actual tree-years, the seconds it took, the seconds from the start of the run until it was done, and the process id of the worker that computed it
+    """
+    if filename_out == None:
+        filename_out = STREAMING_RUNS[run_key]
+
+    if costs == None:
+        costs = {}
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        print("worker processes can not be forked on this platform; running the stands on one process")
+        context = None
+        workers = 1
+
+    share_capture(XFACTOR)
+
+    part_directory = tempfile.mkdtemp(prefix='tps_parts_')
+    tasks = [(index, standid, run_key, os.path.join(part_directory, str(index) + '.csv')) for index, standid in enumerate(standids)]
+    order = schedule_stands(standids, costs)
+    partial_filename = filename_out + '.partial'
+
+    summary = []
+    pool = None
+    start = time.time()
+
+    try:
+        if workers > 1:
+            pool = context.Pool(workers, initializer=init_worker, initargs=(queries, True))
+            results = pool.imap_unordered(run_one_stand, [tasks[x] for x in order], chunksize=1)
+        else:
+            init_worker(queries)
+            results = map(run_one_stand, tasks)
+
+        # stands that are done but still wait for a stand before them to be written
+        done = {}
+        next_index = 0
+
+        # the parts are copied as bytes so the line endings the csv writer used are kept; the output only takes its name once every stand is in it
+        with open(partial_filename, 'wb') as writefile:
+            for each_result in results:
+                done[each_result[0]] = each_result + (time.time() - start,)
+
+                while next_index in done:
+                    index, standid, part_filename, seconds, pid, tree_years, finished = done.pop(next_index)
+
+                    with open(part_filename, 'rb') as readfile:
+                        shutil.copyfileobj(readfile, writefile)
+
+                    os.remove(part_filename)
+                    summary.append({'standid': standid, 'est_tree_years': costs.get(standid.lower()), 'tree_years': tree_years, 'seconds': seconds, 'finished': finished, 'worker': pid})
+                    next_index += 1
+
+        if pool != None:
+            pool.close()
+            pool.join()
+
+        os.replace(partial_filename, filename_out)
+
+    except Exception:
+        print("the run stopped after " + str(len(summary)) + " of " + str(len(standids)) + " stands; the stands that were done, in order, are in " + partial_filename + " and " + filename_out + " was not written")
+        raise
+
+    finally:
+        if pool != None:
+            pool.terminate()
+        shutil.rmtree(part_directory, ignore_errors=True)
+
+    print("computed " + str(len(summary)) + " stands on " + str(workers) + " workers in " + str(round(time.time() - start, 1)) + " seconds (" + str(round(sum([x['seconds'] for x in summary]), 1)) + " seconds of work); output is in " + filename_out)
+
+    return summary
+
+def write_cost_report(summary, filename_out='stand_costs.csv'):
+    """ Write the estimated and actual cost of each stand of a run from ``run_parallel``, for tuning the schedule.
+
+    The estimated seconds of a stand are its estimated tree-years at the mean seconds per tree-year of the whole run, so a stand that is much slower or faster than its size suggests stands out in `RATIO` (actual over estimated seconds).
+
+    **INPUTS**
+
+    :summary: the summary from ``run_parallel``
+    :filename_out: the name of the csv file
+
+    **RETURNS**
+
+    A csv file with one row for each stand, from the most to the least expensive, like ``STANDID, EST_TREE_YEARS, TREE_YEARS, EST_SECONDS, SECONDS, RATIO, FINISHED, WORKER``.
+    """
+    estimated = [x for x in summary if x['est_tree_years'] != None]
+    total_estimated = sum([x['est_tree_years'] for x in estimated])
+
+    if total_estimated > 0:
+        seconds_per_tree_year = sum([x['seconds'] for x in estimated])/float(total_estimated)
+    else:
+        seconds_per_tree_year = None
+
+    with open(filename_out, 'w') as writefile:
+        writer = csv.writer(writefile, delimiter = ",", quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(['STANDID', 'EST_TREE_YEARS', 'TREE_YEARS', 'EST_SECONDS', 'SECONDS', 'RATIO', 'FINISHED', 'WORKER'])
+
+        for each_stand in sorted(summary, key=lambda x: -x['seconds']):
+
+            if each_stand['est_tree_years'] == None or seconds_per_tree_year == None:
+                est_seconds = None
+                ratio = None
+            else:
+                est_seconds = each_stand['est_tree_years']*seconds_per_tree_year
+                if est_seconds > 0:
+                    ratio = round(each_stand['seconds']/est_seconds, 2)
+                else:
+                    ratio = None
+                est_seconds = round(est_seconds, 3)
+
+            new_row = [each_stand['standid'].upper(), each_stand['est_tree_years'], each_stand['tree_years'], est_seconds, round(each_stand['seconds'], 3), ratio, round(each_stand['finished'], 3), each_stand['worker']]
+            writer.writerow(new_row)
+
+    print("estimated and actual costs of " + str(len(summary)) + " stands are in " + filename_out)
+
+class FetchedCursor(object):
+    """ A stand-in for a pymssql cursor that answers the queries of one stand from rows that were already fetched (see ``fetch_stand``), so that the Stand can be built on a process without its own connection to the database.
+
+    **INPUTS**
+
+    :fetched: a dictionary of the rows of each query, keyed by its sql
+
+    .. warning:: a query that was not fetched raises a KeyError, rather than quietly returning no rows.
+    """
+    def __init__(self, fetched):
+        self.fetched = fetched
+        self.rows = iter(())
+
+    def execute(self, sql):
+        self.rows = iter(self.fetched[sql])
+
+    def __iter__(self):
+        return self.rows
+
+def fetch_stand(cur, queries, standid):
+    """ Run the queries a Stand makes when it is built (see STAND_QUERIES) and keep their rows, for ``FetchedCursor``.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :queries: the queries from `qf_2.yaml`
+    :standid: the standid
+
+    **RETURNS**
+
+    :fetched: a dictionary of the rows of each query, keyed by its sql
+    """
+    fetched = {}
+
+    for section, name in STAND_QUERIES:
+        sql = queries[section][name].format(standid=standid.lower())
+        cur.execute(sql)
+        fetched[sql] = [tuple(row) for row in cur]
+
+    return fetched
+
+def compute_fetched_stand(task):
+    """ Build and compute one stand from its fetched rows in a worker process of ``run_pipeline``, and write it to its own part file with the mode it would have had in a run on one process.
+
+    **INPUTS**
+
+    :task: a tuple of `(index, standid, run_key, part_filename, fetched)`
+
+    **RETURNS**
+
+    A tuple of `(index, standid, part_filename, seconds, process id, tree-years)`, like ``run_one_stand``.
+    """
+    index, standid, run_key, part_filename, fetched = task
+    start = time.time()
+
+    A = tps_Stand.Stand(FetchedCursor(fetched), WORKER['XFACTOR'], WORKER['queries'], standid.lower())
+    result = compute_result(A, WORKER['XFACTOR'], run_key)
+
+    if index == 0:
+        mode = 'w'
+    else:
+        mode = 'a'
+
+    write_result(result, WORKER['XFACTOR'], run_key, part_filename, mode)
+
+    return index, standid, part_filename, time.time() - start, os.getpid(), len(A.table)
+
+def put_unless_stopped(each_queue, item, stop):
+    """ Put an item on a bounded queue, waiting while it is full, unless the pipeline is stopped.
+
+    **RETURNS**
+
+    True if the item was put, False if the pipeline was stopped first.
+    """
+    while not stop.is_set():
+        try:
+            each_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+def run_pipeline(standids, run_key, queries, XFACTOR, workers, fetchers=2, depth=None, filename_out=None, costs=None):
+    """ Run one of the STREAMING_RUNS as a pipeline of three stages, so the database, the CPU, and the disk are all kept busy at once:
+
+    * fetch: `fetchers` threads, each with its own connection, run the queries of one stand at a time (see ``fetch_stand``)
+    * compute: a pool of `workers` forked processes build and compute each stand from its rows (see ``compute_fetched_stand``) and write it to a part file
+    * write: this process appends the parts to the output in the order of `standids`, so the output is the same, byte for byte, as the one made on one process
+
+    The fetched stands wait on a queue that holds at most `depth` stands, and no more than `depth` stands are given to the compute stage at once, so a slow stage holds up the stages before it instead of letting fetched stands pile up in memory. If the costs of the stands are given, the most expensive ones are fetched first (see ``schedule_stands``).
+
+    The first error of a fetch thread or a compute worker stops the run: the fetch threads take no more stands, the compute workers are stopped, and the error is raised as soon as the writer sees it. Like ``run_parallel``, the output is put together in a file of the same name ending in `.partial`, which only takes the name of the output once every stand is in it, so a run that stops leaves an earlier output as it was.
+
+    The time each stage spends working and waiting is kept, and a stage that is busy most of the run while the others wait on it is the bottleneck (see ``write_pipeline_report``). The fetch threads wait when the compute stage can not keep up; the compute workers wait when the fetch stage can not; the writer waits for the next stand in order.
+
+    .. note:: like ``run_parallel``, the workers are forked, and share XFACTOR and its equations. Where forking is not possible, the stands are computed on one thread of this process.
+
+    **INPUTS**
+
+    :standids: a list of standids, in the order they should be written
+    :run_key: a key of STREAMING_RUNS, like `('npp', 'stand', 'composite')`
+    :queries: the queries from `qf_2.yaml`
+    :XFACTOR: a Capture object, shared with the workers
+    :workers: the number of compute processes
+    :fetchers: the number of fetch threads
+    :depth: optional, the most stands each queue holds; twice the number of workers if not given
+    :filename_out: optional, the csv file; STREAMING_RUNS gives the file if it is not given
+    :costs: optional, a dictionary of standid (in lower case) to its estimated cost, like ``stand_costs``
+
+    **RETURNS**
+
+    :summary: like ``run_parallel``, a dictionary for each stand in the order of `standids`
+    :stages: a list with a dictionary for each stage, containing its name, the number of threads or processes in it, the seconds they spent working and waiting, and the seconds of the run
+    """
+    if filename_out == None:
+        filename_out = STREAMING_RUNS[run_key]
+
+    if costs == None:
+        costs = {}
+
+    workers = max(workers, 1)
+    fetchers = max(fetchers, 1)
+
+    if depth == None:
+        depth = 2*workers
+
+    depth = max(depth, 1)
+
+    share_capture(XFACTOR, queries)
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        print("worker processes can not be forked on this platform; computing the stands on one thread")
+        context = None
+        workers = 1
+
+    part_directory = tempfile.mkdtemp(prefix='tps_parts_')
+
+    to_fetch = queue.Queue()
+    for index in schedule_stands(standids, costs):
+        to_fetch.put((index, standids[index]))
+
+    fetched_queue = queue.Queue(maxsize=depth)
+    written_queue = queue.Queue()
+
+    # the stands given to the compute stage and not done yet; the fetched stands wait for one of these
+    slots = threading.BoundedSemaphore(depth)
+    stop = threading.Event()
+    errors = []
+
+    busy = {'fetch': [0.]*fetchers, 'fetch_wait': [0.]*fetchers, 'compute_wait': 0., 'write': 0., 'write_wait': 0.}
+
+    def fetch(number):
+        try:
+            DATABASE_CONNECTION = poptree_basis.YamlConn()
+            conn, fetch_cur = DATABASE_CONNECTION.sql_connect()
+
+            while not stop.is_set():
+                try:
+                    index, standid = to_fetch.get_nowait()
+                except queue.Empty:
+                    break
+
+                start = time.time()
+                fetched = fetch_stand(fetch_cur, queries, standid)
+                fetched_at = time.time()
+                busy['fetch'][number] += fetched_at - start
+
+                put_unless_stopped(fetched_queue, (index, standid, fetched), stop)
+                busy['fetch_wait'][number] += time.time() - fetched_at
+
+        except Exception as error:
+            errors.append(error)
+            stop.set()
+
+    def finished(each_result):
+        slots.release()
+        written_queue.put(each_result)
+
+    def failed(error):
+        # the run is stopped before the slot is given back, so no other stand is given to the compute stage
+        errors.append(error)
+        stop.set()
+        slots.release()
+
+    def dispatch():
+        for each_stand in range(len(standids)):
+
+            while not stop.is_set() and not slots.acquire(timeout=0.1):
+                continue
+
+            waiting = time.time()
+            item = None
+            while not stop.is_set() and item == None:
+                try:
+                    item = fetched_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+            # the time the compute stage could have taken another stand, but none was fetched yet
+            busy['compute_wait'] += time.time() - waiting
+
+            if stop.is_set():
+                return
+
+            index, standid, fetched = item
+            task = (index, standid, run_key, os.path.join(part_directory, str(index) + '.csv'), fetched)
+            pool.apply_async(compute_fetched_stand, (task,), callback=finished, error_callback=failed)
+
+    partial_filename = filename_out + '.partial'
+
+    summary = []
+    pool = None
+    threads = []
+    start = time.time()
+
+    try:
+        # the pool is forked before the threads are started
+        if context != None and workers > 1:
+            pool = context.Pool(workers, initializer=init_compute_worker)
+        else:
+            pool = multiprocessing.pool.ThreadPool(1)
+
+        threads = [threading.Thread(target=fetch, args=(x,), daemon=True) for x in range(fetchers)]
+        threads.append(threading.Thread(target=dispatch, daemon=True))
+
+        for each_thread in threads:
+            each_thread.start()
+
+        # stands that are done but still wait for a stand before them to be written
+        done = {}
+        next_index = 0
+
+        # the parts are copied as bytes so the line endings the csv writer used are kept; the output only takes its name once every stand is in it
+        with open(partial_filename, 'wb') as writefile:
+            while next_index < len(standids):
+
+                # the first error of a fetch thread or a compute worker ends the run at once, before the stands done after it are written
+                if errors != []:
+                    raise errors[0]
+
+                waiting = time.time()
+
+                try:
+                    each_result = written_queue.get(timeout=0.1)
+                except queue.Empty:
+                    busy['write_wait'] += time.time() - waiting
+                    continue
+
+                busy['write_wait'] += time.time() - waiting
+                done[each_result[0]] = each_result + (time.time() - start,)
+
+                writing = time.time()
+                while next_index in done:
+                    index, standid, part_filename, seconds, pid, tree_years, stand_finished = done.pop(next_index)
+
+                    with open(part_filename, 'rb') as readfile:
+                        shutil.copyfileobj(readfile, writefile)
+
+                    os.remove(part_filename)
+                    summary.append({'standid': standid, 'est_tree_years': costs.get(standid.lower()), 'tree_years': tree_years, 'seconds': seconds, 'finished': stand_finished, 'worker': pid})
+                    next_index += 1
+
+                busy['write'] += time.time() - writing
+
+        if errors != []:
+            raise errors[0]
+
+        pool.close()
+        pool.join()
+
+        os.replace(partial_filename, filename_out)
+
+    except Exception:
+        print("the run stopped after " + str(len(summary)) + " of " + str(len(standids)) + " stands; the stands that were done, in order, are in " + partial_filename + " and " + filename_out + " was not written")
+        raise
+
+    finally:
+        # the fetch threads take no more stands once the run is stopped, and the ones still waiting for the database are let finish
+        stop.set()
+        if pool != None:
+            pool.terminate()
+        for each_thread in threads:
+            each_thread.join()
+        shutil.rmtree(part_directory, ignore_errors=True)
+
+    run_seconds = time.time() - start
+    compute_seconds = sum([x['seconds'] for x in summary])
+
+    stages = [
+        {'stage': 'fetch', 'units': fetchers, 'busy': sum(busy['fetch']), 'waiting': sum(busy['fetch_wait']), 'run_seconds': run_seconds},
+        {'stage': 'compute', 'units': workers, 'busy': compute_seconds, 'waiting': busy['compute_wait'], 'run_seconds': run_seconds},
+        {'stage': 'write', 'units': 1, 'busy': busy['write'], 'waiting': busy['write_wait'], 'run_seconds': run_seconds},
+    ]
+
+    print("computed " + str(len(summary)) + " stands with " + str(fetchers) + " fetch threads, " + str(workers) + " compute workers, and 1 writer in " + str(round(run_seconds, 1)) + " seconds; output is in " + filename_out)
+
+    return summary, stages
+
+def write_pipeline_report(stages, filename_out='pipeline_report.csv'):
+    """ Write how busy each stage of a ``run_pipeline`` run was, and print which stage held up the run.
+
+    The utilization of a stage is the seconds its threads or processes spent working over the seconds they were there for (the seconds of the run times their number). The stage with the highest utilization is the bottleneck: the database if it is `fetch`, the CPU if it is `compute`, and the disk if it is `write`.
+
+    **INPUTS**
+
+    :stages: the stages from ``run_pipeline``
+    :filename_out: the name of the csv file
+
+    **RETURNS**
+
+    A csv file with one row for each stage, like ``STAGE, UNITS, BUSY_SECONDS, WAIT_SECONDS, UTILIZATION``.
+    """
+    utilization = {}
+
+    with open(filename_out, 'w') as writefile:
+        writer = csv.writer(writefile, delimiter = ",", quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(['STAGE', 'UNITS', 'BUSY_SECONDS', 'WAIT_SECONDS', 'UTILIZATION'])
+
+        for each_stage in stages:
+
+            if each_stage['run_seconds'] > 0:
+                utilization[each_stage['stage']] = min(each_stage['busy']/(each_stage['run_seconds']*each_stage['units']), 1.)
+            else:
+                utilization[each_stage['stage']] = 0.
+
+            new_row = [each_stage['stage'], each_stage['units'], round(each_stage['busy'], 3), round(each_stage['waiting'], 3), round(utilization[each_stage['stage']], 3)]
+            writer.writerow(new_row)
+
+    resources = {'fetch': 'the database', 'compute': 'the CPU', 'write': 'the disk'}
+
+    print(", ".join([x['stage'] + " " + str(int(round(100*utilization[x['stage']]))) + "% busy on " + str(x['units']) for x in stages]) + "; report is in " + filename_out)
+
+    if utilization != {}:
+        bottleneck = max(stages, key=lambda x: utilization[x['stage']])['stage']
+        print("the bottleneck is " + bottleneck + " (" + resources.get(bottleneck, bottleneck) + ")")
+
+def parse_shard(text):
+    """ Read a shard given like `2/4` (the second of four shards) into a tuple of `(2, 4)`. Shards are numbered from 1.
+    """
+    try:
+        shard, shards = [int(x) for x in str(text).split('/')]
+    except ValueError:
+        raise ValueError("a shard is given like `2/4`, not `" + str(text) + "`")
+
+    if shards < 1 or shard < 1 or shard > shards:
+        raise ValueError("shard " + str(text) + " does not exist; shards are numbered from 1 to n, like `1/4` to `4/4`")
+
+    return shard, shards
+
+def shard_stands(standids, costs, shards):
+    """ Split the stands of a run into shards of about the same cost, the same way on every machine. The stands are dealt out from the most to the least expensive (see ``stand_costs``), each to the shard with the least cost so far; ties go to the lower standid and the lower shard, so the split only depends on the stands and their costs.
+
+    **INPUTS**
+
+    :standids: a list of standids, in the order they should be written
+    :costs: a dictionary of standid (in lower case) to its estimated cost; a stand without an estimate is given the mean of the others
+    :shards: the number of shards
+
+    **RETURNS**
+
+    A list of the positions of the stands in `standids` for each shard, each in the order of `standids`.
+    """
+    known = [costs[x.lower()] for x in standids if x.lower() in costs]
+
+    if known == []:
+        mean_cost = 1.
+    else:
+        mean_cost = sum(known)/float(len(known))
+
+    estimates = [costs.get(x.lower(), mean_cost) for x in standids]
+
+    assigned = [[] for x in range(shards)]
+    loads = [0.]*shards
+
+    for index in sorted(range(len(standids)), key=lambda x: (-estimates[x], standids[x].lower(), x)):
+        shard = loads.index(min(loads))
+        assigned[shard].append(index)
+        loads[shard] += estimates[index]
+
+    return [sorted(x) for x in assigned]
+
+def shard_filename(filename_out, shard, shards, extension='.csv'):
+    """ The name of the output (or, with `extension` of `.json`, the manifest) of one shard of a run, like `all_stands_biomass_composite_output.shard-2-of-4.csv`.
+    """
+    return os.path.splitext(filename_out)[0] + '.shard-' + str(shard) + '-of-' + str(shards) + extension
+
+def stand_list_digest(standids):
+    """ A digest of the standids of a run, in order, kept in the manifests so that shards made from different lists of stands are not merged.
+    """
+    return hashlib.sha1("\n".join([x.lower() for x in standids]).encode('utf-8')).hexdigest()
+
+def plan_digest(assigned):
+    """ A digest of the stands of each shard of a run, kept in the manifests so that only shards of the same plan are merged.
+    """
+    return hashlib.sha1(json.dumps(assigned).encode('utf-8')).hexdigest()
+
+def plan_shards(standids, costs, shards, plan_filename):
+    """ The stands of each shard of a run, decided once for all the machines. The first machine to get here splits the stands by their costs (see ``shard_stands``) and writes the split to `plan_filename`; every machine after it reads the split from there, even if the costs it would count now are different, so no stand is left out or computed twice because the database changed between the shards.
+
+    The plan is written to a file of its own and then linked to `plan_filename`, which fails if another machine linked its plan first; that plan is then used instead.
+
+    **INPUTS**
+
+    :standids: a list of standids, in the order they should be written
+    :costs: a dictionary of standid (in lower case) to its estimated cost, or a function that gives it, so the costs are only counted if there is no plan yet
+    :shards: the number of shards
+    :plan_filename: the plan of the run, in the directory the shards share
+
+    **RETURNS**
+
+    A list of the positions of the stands in `standids` for each shard, each in the order of `standids`. A ValueError is raised if the plan is from a different list of stands or a different number of shards.
+    """
+    if not os.path.exists(plan_filename):
+        if callable(costs):
+            costs = costs()
+
+        plan = {'shards': shards, 'total_stands': len(standids), 'stand_list': stand_list_digest(standids), 'costs': [costs.get(x.lower()) for x in standids], 'assigned': shard_stands(standids, costs, shards)}
+
+        own_filename = plan_filename + '.' + str(os.getpid())
+        with open(own_filename, 'w') as writefile:
+            json.dump(plan, writefile)
+
+        try:
+            os.link(own_filename, plan_filename)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(own_filename)
+
+    with open(plan_filename, 'r') as readfile:
+        plan = json.load(readfile)
+
+    if plan['stand_list'] != stand_list_digest(standids) or plan['shards'] != shards:
+        raise ValueError("the shard plan " + plan_filename + " is for another list of stands or number of shards; remove it to plan the shards again")
+
+    return plan['assigned']
+
+def run_shard(cur, XFACTOR, queries, standids, run_key, shard, shards, costs=None):
+    """ Compute one shard of one of the STREAMING_RUNS (see ``shard_stands``) and write its output and its manifest next to where the output of the whole run goes (see ``shard_filename``), for ``merge_shards`` to put together.
+
+    The stands of the shard come from the plan of the run (see ``plan_shards``), which is written next to the outputs by the first shard to start. Each stand is written with the mode it would have had in a run on one process, so only the shard with the first stand of the run has the header, and the merged output is the same, byte for byte, as the one made on one machine. The manifest records the stands of every shard in the plan, and where each stand of this shard is in its output.
+
+    **INPUTS**
+
+    :cur: a pymssql cursor
+    :XFACTOR: a Capture object
+    :queries: the queries from `qf_2.yaml`
+    :standids: all the standids of the run, in the order they should be written
+    :run_key: a key of STREAMING_RUNS
+    :shard: the number of this shard, from 1
+    :shards: the number of shards
+    :costs: optional, a dictionary of standid (in lower case) to its estimated cost, like ``stand_costs``, or a function that gives it; only used by the shard that writes the plan
+
+    **RETURNS**
+
+    :manifest_filename: the name of the manifest
+    """
+    if costs == None:
+        costs = {}
+
+    plan = plan_shards(standids, costs, shards, shard_filename(STREAMING_RUNS[run_key], 'plan', shards, '.json'))
+    assigned = plan[shard - 1]
+    filename_out = shard_filename(STREAMING_RUNS[run_key], shard, shards)
+    manifest_filename = shard_filename(STREAMING_RUNS[run_key], shard, shards, '.json')
+
+    # the shard may not have the first stand of the run, so nothing is written with `w`
+    open(filename_out, 'wb').close()
+
+    stands = []
+    start = time.time()
+
+    for index in assigned:
+        stand_start = time.time()
+
+        A = tps_Stand.Stand(cur, XFACTOR, queries, standids[index].lower())
+        result = compute_result(A, XFACTOR, run_key)
+
+        if index == 0:
+            mode = 'w'
+        else:
+            mode = 'a'
+
+        begin = os.path.getsize(filename_out)
+        write_result(result, XFACTOR, run_key, filename_out, mode)
+
+        stands.append({'index': index, 'standid': standids[index], 'begin': begin, 'end': os.path.getsize(filename_out), 'tree_years': len(A.table), 'seconds': round(time.time() - stand_start, 3)})
+
+        del A
+        del result
+
+    manifest = {'run': list(run_key), 'shard': shard, 'shards': shards, 'total_stands': len(standids), 'stand_list': stand_list_digest(standids), 'plan': plan_digest(plan), 'assigned': plan, 'output': filename_out, 'stands': stands}
+
+    with open(manifest_filename, 'w') as writefile:
+        json.dump(manifest, writefile, indent=1)
+
+    print("computed " + str(len(stands)) + " of " + str(len(standids)) + " stands for shard " + str(shard) + " of " + str(shards) + " in " + str(round(time.time() - start, 1)) + " seconds; output is in " + filename_out + " and its manifest in " + manifest_filename)
+
+    return manifest_filename
+
+def merge_shards(manifest_filenames, filename_out=None):
+    """ Put the outputs of the shards of a run together into the output of the whole run, in the order of the run, from their manifests (see ``run_shard``). The outputs of the shards are looked for next to their manifests.
+
+    The manifests must all be from the same run, list of stands, and plan, there must be one for every shard, each shard must have computed the stands the plan gave it, and the plan must give every stand of the run to exactly one shard, so that no stand is left out or written twice; otherwise a ValueError is raised and nothing is written.
+
+    **INPUTS**
+
+    :manifest_filenames: the manifests of all the shards
+    :filename_out: optional, the csv file; STREAMING_RUNS gives the file of the run if it is not given
+
+    **RETURNS**
+
+    :filename_out: the name of the merged output
+    """
+    manifests = []
+
+    for each_filename in manifest_filenames:
+        with open(each_filename, 'r') as readfile:
+            manifest = json.load(readfile)
+
+        manifest['directory'] = os.path.dirname(each_filename)
+        manifests.append(manifest)
+
+    if manifests == []:
+        raise ValueError("there are no manifests to merge")
+
+    first = manifests[0]
+
+    for each_manifest in manifests:
+        if each_manifest['run'] != first['run'] or each_manifest['shards'] != first['shards'] or each_manifest['stand_list'] != first['stand_list'] or each_manifest['plan'] != first['plan']:
+            raise ValueError("shard " + str(each_manifest['shard']) + "/" + str(each_manifest['shards']) + " of " + " ".join(each_manifest['run']) + " is not from the same run as shard " + str(first['shard']) + "/" + str(first['shards']) + " of " + " ".join(first['run']))
+
+    found = sorted([x['shard'] for x in manifests])
+    missing = [x for x in range(1, first['shards'] + 1) if x not in found]
+
+    if missing != [] or len(found) != len(set(found)):
+        raise ValueError("a merge needs each of the " + str(first['shards']) + " shards once; missing " + str(missing) + ", given " + str(found))
+
+    # every stand of the run is in exactly one shard of the plan
+    planned = sorted([x for each_shard in first['assigned'] for x in each_shard])
+    if plan_digest(first['assigned']) != first['plan'] or planned != list(range(first['total_stands'])):
+        raise ValueError("the shard plan does not give every stand of the run to exactly one shard")
+
+    for each_manifest in manifests:
+        if [x['index'] for x in each_manifest['stands']] != first['assigned'][each_manifest['shard'] - 1]:
+            raise ValueError("shard " + str(each_manifest['shard']) + "/" + str(each_manifest['shards']) + " does not have the stands the plan gave it")
+
+    pieces = []
+    for each_manifest in manifests:
+        part_filename = os.path.join(each_manifest['directory'], os.path.basename(each_manifest['output']))
+        pieces += [(x['index'], part_filename, x['begin'], x['end']) for x in each_manifest['stands']]
+
+    pieces.sort()
+
+    if [x[0] for x in pieces] != list(range(first['total_stands'])):
+        raise ValueError("the shards do not have every stand of the run once")
+
+    if filename_out == None:
+        filename_out = STREAMING_RUNS[tuple(first['run'])]
+
+    with open(filename_out, 'wb') as writefile:
+        for index, part_filename, begin, end in pieces:
+            with open(part_filename, 'rb') as readfile:
+                readfile.seek(begin)
+                writefile.write(readfile.read(end - begin))
+
+    print("merged " + str(len(pieces)) + " stands from " + str(len(manifests)) + " shards into " + filename_out)
+
+    return filename_out
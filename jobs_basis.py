@@ -0,0 +1,344 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import concurrent.futures
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import yaml
+
+import poptree_basis
+import tps_Tree
+import execution_basis
+
+# the runs a job can ask for, by (action, scale, analysis), and the key of execution_basis.STREAMING_RUNS its stands are computed with. The units of `study` jobs are studyids, the units of `tree` jobs are treeids, and the units of the rest are standids. `tree` jobs are not computed by stand, so they have no key.
+JOB_RUNS = {
+    ('bio', 'stand', 'composite'): ('bio', 'stand', 'composite'),
+    ('bio', 'stand', 'tree'): ('bio', 'stand', 'tree'),
+    ('bio', 'plot', 'composite'): ('bio', 'plot', 'composite'),
+    ('bio', 'study', 'composite'): ('bio', 'study', 'composite'),
+    ('bio', 'study', 'tree'): ('bio', 'study', 'tree'),
+    ('npp', 'stand', 'composite'): ('npp', 'stand', 'composite'),
+    ('npp', 'plot', 'composite'): ('npp', 'plot', 'composite'),
+    ('npp', 'study', 'composite'): ('npp', 'stand', 'composite'),
+    ('bio', 'tree', 'composite'): None,
+    ('bio', 'tree', 'tree'): None,
+    ('bio', 'tree', 'checks'): None,
+}
+
+# the connection of each thread of the thread executor, made on first use by ``thread_cursor``
+THREAD = threading.local()
+
+def read_jobs(filename_in):
+    """ Read a batch of jobs from a YAML file. The file is a list of jobs (or a mapping with the list under `jobs`), each with a `run` like ``tps_cli.py`` takes, the `units` to run it on, and optionally a `name` and an `output` file, like so:
+
+    .. code-block:: yaml
+
+        - name: west_stands
+          run: bio stand composite
+          units: [ab08, av06]
+        - name: study_npp
+          run: npp study composite
+          units: [rs01]
+        - name: checks
+          run: bio tree checks
+          units: [av06000100001, av06000100002]
+
+    **INPUTS**
+
+    :filename_in: the name of the YAML file
+
+    **RETURNS**
+
+    :jobs: a list with a dictionary for each job, containing its name, run (a key of JOB_RUNS), units, output file, and an error message if the job can not be run, or None
+
+    Two jobs can not write the same output, however its path is written (`out.csv` and `./out.csv` are the same file); a ValueError is raised if they do, before any job is run.
+    """
+    with open(filename_in, 'r') as readfile:
+        listed = yaml.safe_load(readfile)
+
+    if isinstance(listed, dict):
+        listed = listed.get('jobs', [])
+
+    if listed == None:
+        listed = []
+
+    jobs = []
+    outputs = []
+
+    for index, each_job in enumerate(listed):
+        name = str(each_job.get('name', 'job' + str(index + 1)))
+        run = tuple(str(each_job.get('run', '')).lower().split())
+        units = each_job.get('units', [])
+
+        if not isinstance(units, list):
+            units = [units]
+
+        units = [str(x).strip() for x in units]
+        output = os.path.normpath(str(each_job.get('output', name + '_output.csv')))
+        error = None
+
+        # the same file by another path is the same output
+        same_file = os.path.normcase(os.path.abspath(output))
+
+        if same_file in outputs:
+            raise ValueError("the jobs " + jobs[outputs.index(same_file)]['name'] + " and " + name + " both write " + output)
+
+        if run not in JOB_RUNS:
+            error = "`" + " ".join(run) + "` is not a run a job can do; use one of " + ", ".join([" ".join(x) for x in sorted(JOB_RUNS.keys())])
+        elif units == []:
+            error = "no units to run on"
+
+        outputs.append(same_file)
+        jobs.append({'name': name, 'run': run, 'units': units, 'output': output, 'error': error})
+
+    return jobs
+
+def thread_cursor():
+    """ The database cursor of this thread of the thread executor. Each thread opens its own connection the first time it is used and keeps it for the rest of the batch, as pymssql connections can not be shared between threads.
+    """
+    if not hasattr(THREAD, 'cur'):
+        DATABASE_CONNECTION = poptree_basis.YamlConn()
+        THREAD.conn, THREAD.cur = DATABASE_CONNECTION.sql_connect()
+
+    return THREAD.cur
+
+def job_standids(queries, job):
+    """ The standids of a job: its units, or the stands of each of its studies in turn for a `study` job. Runs on the thread executor.
+    """
+    if job['run'][1] != 'study':
+        return list(job['units'])
+
+    cur = thread_cursor()
+    standids = []
+
+    for each_study in job['units']:
+        cur.execute(queries['execution']['list_of_stands_in_studies'].format(studyid=each_study))
+        standids += [str(row[0]) for row in cur]
+
+    return standids
+
+def fetch_job_stand(queries, standid):
+    """ Fetch the rows of one stand on the thread executor; see ``execution_basis.fetch_stand``.
+    """
+    return execution_basis.fetch_stand(thread_cursor(), queries, standid)
+
+def run_tree_job(queries, job, filename_out, quarantine=None):
+    """ Compute or check the trees of a `tree` job, in the order they were given, and write them to one file, as ``tps_cli.py bio tree`` does. Runs on the thread executor: each tree is only a few queries and a few equations, so it is not worth sending to a process.
+
+    If a quarantine is given (see ``execution_basis.Quarantine``), a tree that raises an error is quarantined and the job goes on without it.
+
+    **RETURNS**
+
+    The number of trees.
+    """
+    cur = thread_cursor()
+    analysis = job['run'][2]
+
+    if quarantine != None:
+        written = False
+
+        for each_tree in job['units']:
+            if written == True:
+                mode = 'a'
+            else:
+                mode = 'wt'
+
+            if execution_basis.guarded_tree(cur, queries, each_tree, analysis, filename_out, mode, quarantine) == True:
+                written = True
+
+        return len(job['units'])
+
+    for index, each_tree in enumerate(job['units']):
+
+        if index == 0:
+            mode = 'wt'
+        else:
+            mode = 'a'
+
+        A = tps_Tree.Tree(cur, queries, each_tree)
+
+        if analysis == 'checks':
+            Checks = A.check_trees()
+            A.only_output_checks(Checks, checkfile = filename_out, mode = mode)
+        else:
+            Bios = A.compute_biomasses()
+            A.only_output_attributes(Bios, datafile = filename_out, mode = mode)
+
+    return len(job['units'])
+
+def join_parts(part_filenames, filename_out):
+    """ Append the part files of a job to its output in order, as bytes so the line endings the csv writer used are kept. Runs on the thread executor.
+    """
+    with open(filename_out, 'wb') as writefile:
+        for each_part in part_filenames:
+            with open(each_part, 'rb') as readfile:
+                shutil.copyfileobj(readfile, writefile)
+
+async def run_stand_job(threads, processes, queries, job, part_directory, limit):
+    """ Run a job on stands: the stands are fetched on the thread executor and computed on the process executor, all at once, and their parts are put together in the order of the job.
+
+    **INPUTS**
+
+    :threads: the thread executor
+    :processes: the process executor
+    :queries: the queries from `qf_2.yaml`
+    :job: a job from ``read_jobs``
+    :part_directory: a directory for the part file of each stand
+    :limit: an asyncio.Semaphore shared by all the jobs, held by each stand from when it is fetched until it is computed, so that only so many fetched stands are held at once
+
+    **RETURNS**
+
+    The number of stands.
+    """
+    loop = asyncio.get_running_loop()
+    run_key = JOB_RUNS[job['run']]
+    standids = await loop.run_in_executor(threads, job_standids, queries, job)
+
+    if standids == []:
+        raise ValueError("no stands were found for " + ", ".join(job['units']))
+
+    async def run_stand(index, standid):
+        part_filename = os.path.join(part_directory, str(index) + '.csv')
+
+        async with limit:
+            fetched = await loop.run_in_executor(threads, fetch_job_stand, queries, standid)
+            await loop.run_in_executor(processes, execution_basis.compute_fetched_stand, (index, standid, run_key, part_filename, fetched))
+
+        return part_filename
+
+    part_filenames = await asyncio.gather(*[run_stand(index, standid) for index, standid in enumerate(standids)])
+    await loop.run_in_executor(threads, join_parts, part_filenames, job['output'])
+
+    return len(standids)
+
+async def run_job(threads, processes, queries, job, limit, quarantine=None):
+    """ Run one job and keep what became of it, so that a job that fails does not stop the others.
+
+    **RETURNS**
+
+    A dictionary for the job containing its name, run, output, the number of stands or trees, the seconds it took, its status (`done`, `failed`, or `skipped`), and the error, if any.
+    """
+    loop = asyncio.get_running_loop()
+    result = {'name': job['name'], 'run': " ".join(job['run']), 'output': job['output'], 'count': 0, 'seconds': 0., 'status': 'skipped', 'error': job['error']}
+
+    if job['error'] != None:
+        return result
+
+    start = time.time()
+    part_directory = tempfile.mkdtemp(prefix='tps_job_')
+
+    try:
+        if JOB_RUNS[job['run']] == None:
+            result['count'] = await loop.run_in_executor(threads, run_tree_job, queries, job, job['output'], quarantine)
+        else:
+            result['count'] = await run_stand_job(threads, processes, queries, job, part_directory, limit)
+        result['status'] = 'done'
+
+    except Exception as error:
+        result['status'] = 'failed'
+        result['error'] = type(error).__name__ + ": " + str(error)
+
+    finally:
+        shutil.rmtree(part_directory, ignore_errors=True)
+
+    result['seconds'] = time.time() - start
+    print("job " + job['name'] + " (" + result['run'] + ") " + result['status'] + " in " + str(round(result['seconds'], 1)) + " seconds")
+
+    return result
+
+async def orchestrate(jobs, queries, threads, processes, depth, quarantine=None):
+    """ Run all the jobs at the same time on the executors, and gather what became of each.
+    """
+    limit = asyncio.Semaphore(depth)
+    return await asyncio.gather(*[run_job(threads, processes, queries, each_job, limit, quarantine) for each_job in jobs])
+
+def run_jobs(jobs, queries, XFACTOR, workers=2, threads=4, depth=None, quarantine=None):
+    """ Run a batch of jobs at the same time, sharing one Capture object and its equations, instead of starting ``tps_cli.py`` once for each.
+
+    The jobs are run on an asyncio event loop. Queries go to a thread executor of `threads` threads, each with its own connection (see ``thread_cursor``); stands are computed on a process executor of `workers` forked processes that share XFACTOR (see ``execution_basis.compute_fetched_stand``). Each job writes its own output, in the same order as ``tps_cli.py`` would write it, and a job that fails does not stop the others.
+
+    .. note:: the processes are forked before any thread opens a connection. Where forking is not possible, the stands are computed on the thread executor instead.
+
+    **INPUTS**
+
+    :jobs: the jobs from ``read_jobs``
+    :queries: the queries from `qf_2.yaml`
+    :XFACTOR: a Capture object, shared by every job
+    :workers: the number of processes computing stands
+    :threads: the number of threads running queries
+    :depth: optional, the most fetched stands held at once over all the jobs; twice the number of workers if not given
+    :quarantine: optional, a Quarantine that the trees of `tree` jobs which raise an error are put in, instead of failing their job (see ``run_tree_job``)
+
+    **RETURNS**
+
+    :results: a list with a dictionary for each job, in the order of `jobs`, see ``run_job``
+    """
+    workers = max(workers, 1)
+    threads = max(threads, 1)
+
+    if depth == None:
+        depth = 2*workers
+
+    execution_basis.share_capture(XFACTOR, queries)
+
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        print("worker processes can not be forked on this platform; computing the stands on threads")
+        context = None
+
+    thread_executor = concurrent.futures.ThreadPoolExecutor(threads)
+
+    if context != None:
+        process_executor = concurrent.futures.ProcessPoolExecutor(workers, mp_context=context, initializer=execution_basis.init_compute_worker)
+
+        # forked executors start all their processes on the first task, so they are started here, before any thread is
+        process_executor.submit(os.getpid).result()
+    else:
+        process_executor = thread_executor
+
+    start = time.time()
+
+    try:
+        results = asyncio.run(orchestrate(jobs, queries, thread_executor, process_executor, max(depth, 1), quarantine))
+    finally:
+        thread_executor.shutdown()
+        process_executor.shutdown()
+
+    done = len([x for x in results if x['status'] == 'done'])
+    print("ran " + str(done) + " of " + str(len(results)) + " jobs in " + str(round(time.time() - start, 1)) + " seconds")
+
+    return results
+
+def write_job_report(results, filename_out='job_report.csv'):
+    """ Write what became of each job of a batch from ``run_jobs``.
+
+    **INPUTS**
+
+    :results: the results from ``run_jobs``
+    :filename_out: the name of the csv file
+
+    **RETURNS**
+
+    A csv file with one row for each job, like ``JOB, RUN, OUTPUT, UNITS_RUN, SECONDS, STATUS, ERROR``, where ``UNITS_RUN`` is the number of stands or trees.
+    """
+    with open(filename_out, 'w') as writefile:
+        writer = csv.writer(writefile, delimiter = ",", quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(['JOB', 'RUN', 'OUTPUT', 'UNITS_RUN', 'SECONDS', 'STATUS', 'ERROR'])
+
+        for each_job in results:
+            new_row = [each_job['name'], each_job['run'], each_job['output'], each_job['count'], round(each_job['seconds'], 3), each_job['status'], each_job['error'] or '']
+            writer.writerow(new_row)
+
+    failed = [x['name'] for x in results if x['status'] != 'done']
+
+    if failed != []:
+        print(str(len(failed)) + " jobs were not done: " + ", ".join(failed) + "; see " + filename_out)
+    else:
+        print("every job was done; report is in " + filename_out)
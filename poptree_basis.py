@@ -4,7 +4,62 @@
 import sys
 import os
 import yaml
-import pymssql
+import biomass_basis
+
+# when True, the places that would stop in the debugger at an odd record raise a DataError instead, so that an unattended run can set the stand or tree aside and go on. tps_cli sets this with --batch
+BATCH = False
+
+class DataError(Exception):
+    """ An odd record that a stand or tree can not be computed or written with. In batch mode (see BATCH) it is raised where the program would otherwise stop in the debugger.
+
+    **INPUTS**
+
+    :message: what is wrong
+    :context: optional, a dictionary of the stand, plot, tree, year, species, etc. it happened on
+    """
+    def __init__(self, message, context=None):
+        Exception.__init__(self, message)
+
+        if context == None:
+            context = {}
+
+        self.context = context
+
+def debug_here(message, context=None):
+    """ Print what is wrong with a record and stop in the debugger, in the frame that called this, so it can be looked at; in batch mode (see BATCH), raise a DataError with the message and context instead.
+
+    **INPUTS**
+
+    :message: what is wrong
+    :context: optional, a dictionary of the stand, plot, tree, year, species, etc. it happened on
+    """
+    if BATCH == True:
+        raise DataError(message, context)
+
+    print(message)
+
+    if context != None:
+        print(context)
+
+    import pdb
+    pdb.Pdb().set_trace(sys._getframe(1))
+
+# the cursors that forked workers were detached from (see detach_connection); they are kept here, unused, for as long as the worker lives
+DETACHED = []
+
+def detach_connection(holder, cur=None):
+    """ Keep a forked worker process off the database connection of the process that forked it. A worker gets a copy of everything its parent held when it was forked, including the parent's live connection, and two processes that use one connection read and write the same socket. Workers must only use their own connection, or none at all.
+
+    The cursor of `holder` (a Capture object or a Stand, which carry one in `cur`) is swapped for the worker's own, or for None where the worker does not query. The parent's cursor is kept in DETACHED, unused, instead of being let go of: closing it from the worker could end the session the parent is still using.
+
+    **INPUTS**
+
+    :holder: an object with a `cur`, like a Capture object or a Stand
+    :cur: optional, the worker's own cursor
+    """
+    if holder.cur is not cur:
+        DETACHED.append(holder.cur)
+        holder.cur = cur
 
 HERE = os.path.dirname(os.path.realpath(__file__))
 sys.path.insert(0, os.path.join(HERE))
@@ -54,6 +109,10 @@ class YamlConn(object):
         sql_user = self.config['user']
         sql_pw = self.config['password']
         sql_db = self.config['database']
+
+        # the driver is only needed to connect, so that `tps_cli.py merge` and the tests run without it
+        import pymssql
+
         conn = pymssql.connect(server = sql_server, user=sql_user, password=sql_pw, database = sql_db)
         cur = conn.cursor()
 
@@ -128,6 +187,8 @@ class Capture(object):
 
     :A.total_areas[standid][year]: the area of the whole stand for a given year by summing the plots.
 
+    :A.equations: the equation table of every species in TP00110, once ``load_equations()`` has been called; otherwise None, and each Stand queries the equations of its own species.
+
 
     .. note: A slot exists for computing the number of plots, although we currently do not use this output.
 
@@ -141,6 +202,7 @@ class Capture(object):
         self.num_plots = {}
         self.additions = {}
         self.mortalities = {}
+        self.equations = None
         self.cur = cursor
         self.queries = queries
         self.create_additions()
@@ -152,6 +214,22 @@ class Capture(object):
         self.get_total_stand_area()
         #self.create_num_plots()
 
+    def load_equations(self):
+        """ Compile the equations of every species in TP00110 with one query, so that Stands use them instead of querying TP00110 for each of their species. This is done once, before stands are run on worker processes, so the workers share the table instead of each building their own.
+
+        **INPUTS**
+
+        No explicit inputs are needed.
+
+        **RETURNS**
+
+        :self.equations: the tuple of `(eqns, woodden_dict, proxy_dict, component_dict)` from ``biomass_basis.compile_equations``
+        """
+        self.cur.execute(self.queries['execution']['all_equations'])
+        self.equations = biomass_basis.compile_equations(list(self.cur))
+
+        return self.equations
+
     def create_additions(self):
         """ Generates the look-up of plots which are "additions" in the database (activity code is A).
 
@@ -0,0 +1,460 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import array
+import bisect
+import math
+import operator
+import sys
+
+# years are stored as short integers; a tree-year without a year gets this value and is read back as None
+NO_YEAR = -1
+
+class Codes(object):
+    """ A small lookup of names (species, plots, tree ids, statuses, dbh codes) to integer codes, so the columns of a TreeStateTable can hold integers instead of strings.
+
+    .. Example:
+
+    >>> C = Codes()
+    >>> C.code('psme')
+    >>> 0
+    >>> C.names[0]
+    >>> 'psme'
+
+    **INPUTS**
+
+    No explicit inputs are needed.
+
+    **RETURNS**
+
+    :self.names: a list of the names, indexed by code
+    :self.lookup: a dictionary of the codes, keyed by name
+    """
+    def __init__(self):
+        self.names = []
+        self.lookup = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def code(self, name):
+        """ Get the code for a name, adding the name if it is new.
+        """
+        try:
+            return self.lookup[name]
+        except KeyError:
+            self.lookup[name] = len(self.names)
+            self.names.append(name)
+            return self.lookup[name]
+
+
+class Record(object):
+    """ The named fields of a record that is a tuple underneath. Records are built like the tuple they replace, from one sequence of values (``IntervalChange((1985, 1990, ...))``), so building one costs about what building the tuple does. They still read like the tuples and dictionaries they replace: by position (``R[1]``, ``R[1:3]``), by field name (``R.npp_yr`` or ``R['npp_yr']``), and by unpacking. They hash and compare just like their tuple.
+
+    Subclasses list their fields in `fields`, in order; each field becomes a property over its position.
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for index, field in enumerate(cls.__dict__.get('fields', ())):
+            setattr(cls, field, property(operator.itemgetter(index)))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        else:
+            return super().__getitem__(key)
+
+    def keys(self):
+        return list(self.fields)
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + ", ".join([field + "=" + repr(getattr(self, field)) for field in self.fields]) + ")"
+
+
+class IntervalChange(Record, tuple):
+    """ The change in a stand, plot, or species between two remeasurements, as computed by ``tps_NPP.compute_NPP()``. Fields are read by name, like ``C['npp_yr']``.
+    """
+    __slots__ = ()
+    fields = ('year_begin', 'year_end', 'delta_live_bio', 'delta_live_jenkins', 'delta_live_volume', 'delta_live_basal', 'delta_live_tph', 'npp_yr', 'npp_j_yr')
+
+
+class TreeStateTable(object):
+    """ Columnar storage of every tree-year on a Stand. Each row is one tree in one year on one plot, either in `live` (which includes ingrowth and missing trees) or in `dead`. Ingrowth and missing trees are masks over the live rows, so no tree-year is stored twice.
+
+    Rows are kept in the order they are first loaded. Loading the same tree, year, plot and group again replaces the values in place, just like updating the nested dictionaries did. For each year, species, and plot, a dictionary of treeid to row number is kept for each of `live` and `dead`.
+
+    .. Example:
+
+    >>> A = tps_Stand.Stand(cur, XFACTOR, queries, 'ncna')
+    >>> A.table.rows(1985, 'psme', 'ncna0001', 'live')
+    >>> {'ncna000100001': 0, 'ncna000100002': 1, ...}
+    >>> A.table.observation(0)
+    >>> (47.5, '1', 'G', 1985)
+    >>> A.table.basal[0]
+    >>> 0.1772
+
+    **INPUTS**
+
+    No explicit inputs are needed; rows are added by ``Stand.get_all_live_trees()`` and ``Stand.get_all_dead_trees()``.
+
+    **RETURNS**
+
+    :self.year: the year the row is aggregated to (after additions and mortalities are moved)
+    :self.raw_year: the year the row was measured in
+    :self.species: the species code of the row, see self.species_codes
+    :self.plot: the plot code of the row, see self.plot_codes
+    :self.tid: the treeid code of the row, see self.tree_codes
+    :self.dbh: the dbh ( cm ) of the row, NaN if there is not one
+    :self.status: the status code of the row, see self.status_codes
+    :self.dbh_code: the dbh code of the row, see self.dbh_codes
+    :self.live: 1 if the row is in live
+    :self.ingrowth: 1 if the row is ingrowth (status 2)
+    :self.dead: 1 if the row is in dead
+    :self.missing: 1 if the row is a missing tree (status 9)
+    :self.basal: the basal area ( m\ :sup:`2` ) of the row, rounded to 4 places, once metrics have been computed
+    :self.biomass: the biomass ( Mg ) of the row, once metrics have been computed
+    :self.volume: the volume ( m\ :sup:`3` ) of the row, once metrics have been computed
+    :self.jenkins: the Jenkins' biomass ( Mg ) of the row, once metrics have been computed
+    :self.equation: the code of the equation set (`normal` or `big`) used for the row, see self.equation_codes, once metrics have been computed
+
+    .. note:: the nested dictionary of year, species, plot, `live`/`ingrowth`/`dead`, and treeid that Stands used before is available from ``as_nested()``.
+    """
+    def __init__(self):
+        self.species_codes = Codes()
+        self.plot_codes = Codes()
+        self.tree_codes = Codes()
+        self.status_codes = Codes()
+        self.dbh_codes = Codes()
+        self.equation_codes = Codes()
+
+        self.year = array.array('h')
+        self.raw_year = array.array('h')
+        self.species = array.array('H')
+        self.plot = array.array('H')
+        self.tid = array.array('L')
+        self.dbh = array.array('d')
+        self.status = array.array('B')
+        self.dbh_code = array.array('B')
+
+        self.live = bytearray()
+        self.ingrowth = bytearray()
+        self.dead = bytearray()
+        self.missing = bytearray()
+
+        self.basal = array.array('d')
+        self.biomass = array.array('d')
+        self.volume = array.array('d')
+        self.jenkins = array.array('d')
+        self.equation = array.array('B')
+
+        # (year, species, plot) : ({treeid: live row}, {treeid: dead row}), in the order loaded
+        self.groups = {}
+        self.version = 0
+        self._nested = None
+        self._nested_version = None
+
+    def __len__(self):
+        return len(self.year)
+
+    def has_plot(self, year, species, plot):
+        """ True if any tree-year, live or dead, has been loaded for that year, species, and plot.
+        """
+        return (year, species, plot) in self.groups
+
+    def put(self, year, species, plot, tid, dbh, status, dbh_code, raw_year, group):
+        """ Add one tree-year to the table, or replace it if the same tree is already in that year, plot, and group.
+
+        **INPUTS**
+
+        :year: the year to aggregate to
+        :species: the four character species code, lowercase
+        :plot: the plotid, lowercase
+        :tid: the treeid, lowercase
+        :dbh: the dbh ( cm ), or None
+        :status: the status, as a string
+        :dbh_code: the dbh code, as a string
+        :raw_year: the year of measurement
+        :group: either `live` or `dead`
+
+        **RETURNS**
+
+        The row number of the tree-year.
+        """
+        key = (year, species, plot)
+
+        if key not in self.groups:
+            self.groups[key] = ({}, {})
+
+        if group == 'live':
+            rows = self.groups[key][0]
+        else:
+            rows = self.groups[key][1]
+
+        if year == None:
+            year = NO_YEAR
+
+        if raw_year == None:
+            raw_year = NO_YEAR
+
+        if dbh == None:
+            dbh = float('nan')
+
+        if tid in rows:
+            row = rows[tid]
+            self.year[row] = year
+            self.raw_year[row] = raw_year
+            self.dbh[row] = dbh
+            self.status[row] = self.status_codes.code(status)
+            self.dbh_code[row] = self.dbh_codes.code(dbh_code)
+            if status == "2":
+                self.ingrowth[row] = 1
+            self.missing[row] = 1 if status == "9" else 0
+
+        else:
+            row = len(self.year)
+            rows[tid] = row
+            self.year.append(year)
+            self.raw_year.append(raw_year)
+            self.species.append(self.species_codes.code(species))
+            self.plot.append(self.plot_codes.code(plot))
+            self.tid.append(self.tree_codes.code(tid))
+            self.dbh.append(dbh)
+            self.status.append(self.status_codes.code(status))
+            self.dbh_code.append(self.dbh_codes.code(dbh_code))
+            self.live.append(1 if group == 'live' else 0)
+            self.dead.append(1 if group == 'dead' else 0)
+            self.ingrowth.append(1 if group == 'live' and status == "2" else 0)
+            self.missing.append(1 if status == "9" else 0)
+
+        self.version += 1
+
+        return row
+
+    def find(self, year, species, plot, group, tid):
+        """ Get the row number of one tree-year. Raises a KeyError if it is not in the table.
+        """
+        return self.rows(year, species, plot, group)[tid]
+
+    def rows(self, year, species, plot, group):
+        """ Get the rows for one year, species, plot and group (`live`, `dead`, or `ingrowth`) as a dictionary of treeid to row number, in the order they were loaded. If there are no rows, an empty dictionary is returned.
+        """
+        try:
+            live_rows, dead_rows = self.groups[(year, species, plot)]
+        except KeyError:
+            return {}
+
+        if group == 'live':
+            return live_rows
+        elif group == 'dead':
+            return dead_rows
+        elif group == 'ingrowth':
+            return {k: row for k, row in live_rows.items() if self.ingrowth[row]}
+        else:
+            return {}
+
+    def layout(self):
+        """ The years, species, and plots in the table, in the order they were loaded, like this: `{year: {species: [plot, plot, ...]}}`.
+        """
+        layout = {}
+        for (year, species, plot) in self.groups.keys():
+            if year not in layout:
+                layout[year] = {species: [plot]}
+            elif species not in layout[year]:
+                layout[year][species] = [plot]
+            else:
+                layout[year][species].append(plot)
+
+        return layout
+
+    def get_year(self, row):
+        """ The aggregation year of a row, or None.
+        """
+        if self.year[row] == NO_YEAR:
+            return None
+        return self.year[row]
+
+    def get_raw_year(self, row):
+        """ The measurement year of a row, or None.
+        """
+        if self.raw_year[row] == NO_YEAR:
+            return None
+        return self.raw_year[row]
+
+    def get_dbh(self, row):
+        """ The dbh of a row, or None.
+        """
+        if math.isnan(self.dbh[row]):
+            return None
+        return self.dbh[row]
+
+    def no_dbh_mask(self):
+        """ A mask over all the rows, 1 where the row has no dbh. NaN is the only value that is not equal to itself, so the column is checked in one pass without looking at each row's observation.
+        """
+        return bytearray([x != x for x in self.dbh])
+
+    def observation(self, row):
+        """ The row as the tuple that Stands used to hold in their nested dictionary, `(dbh, status, dbh_code, raw_year)`.
+        """
+        return (self.get_dbh(row), self.status_codes.names[self.status[row]], self.dbh_codes.names[self.dbh_code[row]], self.get_raw_year(row))
+
+    def reset_metrics(self):
+        """ Set the basal area, biomass, volume, and Jenkins columns to NaN for all rows, so that they can be filled with ``set_metrics()``. The equation column is set to the code for `none`.
+        """
+        blank = [float('nan')]*len(self.year)
+        self.basal = array.array('d', blank)
+        self.biomass = array.array('d', blank)
+        self.volume = array.array('d', blank)
+        self.jenkins = array.array('d', blank)
+        self.equation = array.array('B', [self.equation_codes.code('none')])*len(self.year)
+
+    def set_metrics(self, row, basal, bio):
+        """ Set the metrics of one row from its basal area and the tuple returned by the biomass equation, `(biomass, volume, jenkins biomass, wood density)`.
+        """
+        self.basal[row] = basal
+        self.biomass[row] = bio[0]
+        self.volume[row] = bio[1]
+        self.jenkins[row] = bio[2]
+
+    def bio(self, row):
+        """ Get the `(biomass, volume, jenkins biomass)` for a row, in the same order the biomass equations return them.
+        """
+        return (self.biomass[row], self.volume[row], self.jenkins[row])
+
+    def as_nested(self):
+        """ A compatibility view of the table as the nested dictionary Stands used to hold: `{year: {species: {plot: {'live': {treeid: (dbh, status, dbh_code, raw_year)}, 'ingrowth': {...}, 'dead': {...}}}}}`. The view is built on first use and kept until the table changes.
+        """
+        if self._nested != None and self._nested_version == self.version:
+            return self._nested
+
+        nested = {}
+        for (year, species, plot), (live_rows, dead_rows) in self.groups.items():
+            if year not in nested:
+                nested[year] = {}
+            if species not in nested[year]:
+                nested[year][species] = {}
+
+            nested[year][species][plot] = {'live': {k: self.observation(row) for k, row in live_rows.items()}, 'ingrowth': {k: self.observation(row) for k, row in live_rows.items() if self.ingrowth[row]}, 'dead': {k: self.observation(row) for k, row in dead_rows.items()}}
+
+        self._nested = nested
+        self._nested_version = self.version
+
+        return self._nested
+
+    def nbytes(self):
+        """ The number of bytes held by the table: the columns, the masks, the name lookups, and the per-plot row dictionaries.
+        """
+        total = sys.getsizeof(self)
+        for each_column in [self.year, self.raw_year, self.species, self.plot, self.tid, self.dbh, self.status, self.dbh_code, self.live, self.ingrowth, self.dead, self.missing, self.basal, self.biomass, self.volume, self.jenkins, self.equation]:
+            total += sys.getsizeof(each_column)
+
+        for each_codes in [self.species_codes, self.plot_codes, self.tree_codes, self.status_codes, self.dbh_codes, self.equation_codes]:
+            total += deep_sizeof(each_codes.names) + sys.getsizeof(each_codes.lookup)
+
+        total += sys.getsizeof(self.groups)
+        for key, (live_rows, dead_rows) in self.groups.items():
+            total += sys.getsizeof(key) + sys.getsizeof(live_rows) + sys.getsizeof(dead_rows)
+
+        return total
+
+    def memory_report(self):
+        """ Compare the bytes held by the table to the bytes held by the nested dictionary view of the same data.
+
+        **RETURNS**
+
+        A dictionary with the number of tree-years (`rows`), the bytes of the table (`table_bytes`) and of the nested view (`nested_bytes`), and the bytes per tree-year of each (`table_per_row`, `nested_per_row`).
+        """
+        rows = len(self)
+        table_bytes = self.nbytes()
+
+        # build the nested view freshly so that it is not kept after the report
+        cached, cached_version = self._nested, self._nested_version
+        self._nested = None
+        nested_bytes = deep_sizeof(self.as_nested())
+        self._nested, self._nested_version = cached, cached_version
+
+        return {'rows': rows, 'table_bytes': table_bytes, 'nested_bytes': nested_bytes, 'table_per_row': table_bytes/max(rows, 1), 'nested_per_row': nested_bytes/max(rows, 1)}
+
+
+def deep_sizeof(obj, seen=None):
+    """ The number of bytes held by a dictionary, list, or tuple and everything in it. Objects that are referenced more than once are counted once.
+    """
+    if seen == None:
+        seen = set()
+
+    if id(obj) in seen:
+        return 0
+
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_sizeof(k, seen) + deep_sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for v in obj:
+            size += deep_sizeof(v, seen)
+
+    return size
+
+
+class MeasurementIndex(object):
+    """ The live measurements of each tree on a Stand, as sorted years and the dbh measured in each, so that the last live dbh before any year can be found with one binary search.
+
+    .. Example:
+
+    >>> A = tps_Stand.Stand(cur, XFACTOR, queries, 'ncna')
+    >>> A.live_measurements.last_before('ncna000100001', 1995)
+    >>> (1985, 47.5)
+
+    **INPUTS**
+
+    No explicit inputs are needed; measurements are added by ``Stand.get_all_live_trees()``.
+
+    **RETURNS**
+
+    :self.years: a dictionary keyed by treeid of the sorted years with a live dbh
+    :self.dbhs: a dictionary keyed by treeid of the dbh ( cm ) in each of those years
+    """
+    def __init__(self):
+        self.years = {}
+        self.dbhs = {}
+
+    def __len__(self):
+        return sum([len(x) for x in self.years.values()])
+
+    def add(self, tid, year, dbh):
+        """ Add a live measurement of a tree. A second measurement in the same year replaces the first.
+        """
+        if tid not in self.years:
+            self.years[tid] = array.array('h', [year])
+            self.dbhs[tid] = array.array('d', [dbh])
+            return
+
+        years = self.years[tid]
+        index = bisect.bisect_left(years, year)
+
+        if index < len(years) and years[index] == year:
+            self.dbhs[tid][index] = dbh
+        else:
+            years.insert(index, year)
+            self.dbhs[tid].insert(index, dbh)
+
+    def last_before(self, tid, year):
+        """ The last live measurement of a tree before a year, as a tuple of `(year, dbh)`, or None if there is not one.
+        """
+        try:
+            years = self.years[tid]
+            index = bisect.bisect_left(years, year) - 1
+        except (KeyError, TypeError):
+            return None
+
+        if index < 0:
+            return None
+
+        return (years[index], self.dbhs[tid][index])
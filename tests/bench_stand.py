@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+""" Measure the large synthetic stand `zz99` (50,888 tree-years, see ``synthetic.large_stand_store``): the memory of its tree table, the size and build time of the NPP interval records, and the time to compute and aggregate its biomasses. These are the numbers quoted in the commits that changed them.
+
+Run it from the repository with ``python tests/bench_stand.py``. Times are the best of 5 runs.
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+
+import synthetic
+import poptree_basis
+import table_basis
+import tps_Stand
+
+def best_of(function, runs=5):
+    """ The best time of `runs` calls of `function`, in ms.
+    """
+    best = None
+
+    for each_run in range(runs):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+
+        if best == None or seconds < best:
+            best = seconds
+
+    return best*1000.
+
+def bytes_each(function, count):
+    """ The bytes held per object by the list `function` builds, by tracemalloc.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = function()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+
+    return (after - before)/float(count)
+
+def record_report(A):
+    """ The bytes per object and build time of an NPP interval record for every row of the table, next to the dictionary it replaces.
+    """
+    table = A.table
+    n = len(table)
+    years = [table.get_year(row) for row in range(n)]
+    intervals = [(years[i], years[i] + 5) + tuple([float(i)]*7) for i in range(n)]
+    interval_keys = ['year_begin', 'year_end', 'delta_live_bio', 'delta_live_jenkins', 'delta_live_volume', 'delta_live_basal', 'delta_live_tph', 'npp_yr', 'npp_j_yr']
+
+    builds = [
+        ('NPP interval dict', lambda: [dict(zip(interval_keys, x)) for x in intervals]),
+        ('IntervalChange', lambda: [table_basis.IntervalChange(x) for x in intervals]),
+    ]
+
+    for name, build in builds:
+        print("  {0:<20} {1:6.1f} B  {2:6.1f} ms".format(name, bytes_each(build, n), best_of(build)))
+
+def main():
+    store = synthetic.large_stand_store()
+    cur = synthetic.FakeCursor(store)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        XFACTOR = poptree_basis.Capture(cur, synthetic.QUERIES)
+        A = tps_Stand.Stand(cur, XFACTOR, synthetic.QUERIES, 'zz99')
+
+    report = A.table.memory_report()
+    print("tree table of zz99: " + str(report['rows']) + " tree-years")
+    print("  table        {0:6.1f} bytes per tree-year".format(report['table_per_row']))
+    print("  nested dict  {0:6.1f} bytes per tree-year".format(report['nested_per_row']))
+
+    print("NPP records, one for every tree-year:")
+    record_report(A)
+
+    # the grouped results are kept on the Stand, so each run starts without them
+    def compute(keep_names):
+        A._grouped = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            return A.compute_biomasses(XFACTOR, keep_names=keep_names)
+
+    print("compute_biomasses:")
+    print("  without names  {0:7.1f} ms".format(best_of(lambda: compute(False))))
+    print("  with names     {0:7.1f} ms".format(best_of(lambda: compute(True))))
+
+    Biomasses = compute(False)[0]
+    K = tps_Stand.Plot(A, XFACTOR, [])
+    with contextlib.redirect_stdout(io.StringIO()):
+        Biomasses_Plot = K.compute_biomasses_plot(XFACTOR)
+
+    print("aggregates:")
+    print("  stand  {0:7.2f} ms".format(best_of(lambda: A.aggregate_biomasses(Biomasses))))
+    print("  plot   {0:7.2f} ms".format(best_of(lambda: K.aggregate_biomasses_plot(Biomasses_Plot))))
+
+if __name__ == "__main__":
+    main()
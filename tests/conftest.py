@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+""" Shared fixtures for the tests: the synthetic stands from ``synthetic.py``, a cursor over them, the queries, and a Capture object. Every test runs in its own temporary directory, since the runs write their outputs to the working directory.
+"""
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+
+import synthetic
+import poptree_basis
+
+@pytest.fixture
+def store():
+    return synthetic.build_store()
+
+@pytest.fixture
+def cur(store):
+    return synthetic.FakeCursor(store)
+
+@pytest.fixture
+def queries():
+    return synthetic.QUERIES
+
+@pytest.fixture
+def xfactor(cur, queries):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return poptree_basis.Capture(cur, queries)
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def quiet():
+    """ Keep the progress the runs print out of the test output.
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+class SyntheticConnection(object):
+    """ Stands in for ``poptree_basis.YamlConn`` so that the code that opens its own connection (the workers of the parallel, pipeline, and shard runs) gets a cursor over the synthetic stands.
+    """
+    store = None
+
+    def __init__(self):
+        self.queries = synthetic.QUERIES
+
+    def sql_connect(self):
+        return None, synthetic.FakeCursor(SyntheticConnection.store)
+
+@pytest.fixture
+def database(store, monkeypatch):
+    """ Every connection opened during the test, in this process or in the workers forked from it, reads the synthetic stands of `store`.
+    """
+    monkeypatch.setattr(SyntheticConnection, 'store', store)
+    monkeypatch.setattr(poptree_basis, 'YamlConn', SyntheticConnection)
+    return store
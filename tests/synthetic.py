@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+""" Synthetic stands for the tests and benchmarks, and a cursor that answers the queries in `qf_2.yaml` from them, so that Stand, Plot, Tree, and the --all runs can be exercised without the database.
+
+The stands are made from a seeded random number generator, so they are the same every time. ``build_store`` makes four small stands with additions, mortality, detail plots, unusual areas and minimums, trees over the maximum of their equations, missing trees, and two studies. ``large_stand_store`` makes `zz99`, a stand of 40 plots of 200 trees remeasured 8 times (50,888 tree-years), which the numbers in the commits were measured on (see ``bench_stand.py``).
+"""
+import os
+import random
+import yaml
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+
+with open(os.path.join(HERE, '..', 'qf_2.yaml'), 'r') as readfile:
+    QUERIES = yaml.safe_load(readfile)
+
+SPECIES_EQNS = {
+    # species: list of (eqnset, form, h1,h2,h3,b1,b2,b3,j1,j2,woodden,proxy,component)
+    'psme': [('normal', 'lnln', None, None, None, 1.0, 0.0001, 2.5, -2.5, 2.4, 0.45, 'none', 'vsw'),
+             ('big', 'lnln', None, None, None, 1.0, 0.00011, 2.45, -2.5, 2.4, 0.45, 'none', 'vsw')],
+    'tshe': [('normal', 'biopak', None, None, None, 4.0, 2.4, 0, -2.4, 2.45, 0.42, 'none', 'bat')],
+    'acma': [('normal', 'mod_biopak', 30.4, -0.034, 0.68, 0.05, 2.0, 0.6, -2.0, 2.3, 0.44, 'none', 'bat')],
+    'alsi': [('normal', 'd2ht', 20.0, -0.03, 0.9, 0.4, 0, 0, -2.2, 2.3, 0.37, 'alru', 'vsw')],
+    'segi': [('normal', 'biopak', None, None, None, -10.0, 2.5, 0, -2.5, 2.4, 0.38, 'none', 'bat')],
+}
+
+MAXREF = {'psme': 150., 'tshe': 150., 'acma': 105., 'alsi': 8., 'segi': 500.}
+
+
+class Store(object):
+    """ The rows of the synthetic tables, like the ones in the database.
+    """
+    def __init__(self):
+        self.trees = []      # (treeid, species, standid, plotid, dbh, status, year, dbh_code, study)
+        self.trees_m = []    # (treeid, species, standid, plotid, dbh_last, year)
+        self.tp112 = []      # (plotid, year, activity, detail, area, min)
+        self.study = {}
+
+
+def make_stand(store, rng, standid, nplots, years, species, detail_plots=(), unusual_area=None,
+               unusual_min=None, addition=None, mortality=None, ntrees=12, big_trees=0, study='HSGY'):
+    """ Add a stand of `nplots` plots of `ntrees` trees each, remeasured in `years`, to the store. Trees grow a little each remeasurement, and go missing (status 9) or die (status 6) now and then. `addition` and `mortality` are a year and the plots it is on.
+    """
+    plots = ["%s%04d" % (standid.upper(), p + 1) for p in range(nplots)]
+    for plot in plots:
+        for y in years:
+            area = 625
+            mn = 15.0
+            det = 'N'
+            if plot in detail_plots:
+                det = 'Y'
+                mn = 5.0
+            if unusual_area and plot in unusual_area:
+                area = unusual_area[plot]
+            if unusual_min and plot in unusual_min:
+                mn = unusual_min[plot]
+            store.tp112.append((plot, y, 'R', det, area, mn))
+    if addition:
+        for plot in addition[1]:
+            store.tp112.append((plot, addition[0], 'A', 'N', 625, 15.0))
+    if mortality:
+        for plot in mortality[1]:
+            store.tp112.append((plot, mortality[0], 'M', 'N', 625, 15.0))
+    tcount = 0
+    for plot in plots:
+        small_ok = plot in detail_plots or (unusual_min and plot in unusual_min)
+        for t in range(ntrees):
+            tcount += 1
+            tid = "%s%05d" % (plot, t + 1)
+            sp = rng.choice(species)
+            if small_ok and rng.random() < 0.4:
+                dbh = rng.uniform(5.5, 14.0)
+            else:
+                dbh = rng.uniform(15.0, 90.0)
+            if big_trees and t < big_trees:
+                dbh = MAXREF.get(sp, 150.) + 5
+            start = rng.randrange(0, 2) if t % 5 == 0 else 0
+            status_seq = []
+            alive = True
+            missing_streak = 0
+            for i, y in enumerate(years[start:]):
+                if not alive:
+                    break
+                r = rng.random()
+                idx = start + i
+                if i == 0:
+                    st = '2' if start > 0 else '1'
+                elif r < 0.08 and idx < len(years) - 1 and missing_streak == 0:
+                    st = '9'
+                elif r < 0.16:
+                    st = '6'
+                else:
+                    st = '1'
+                if st == '9':
+                    missing_streak += 1
+                    store.trees.append((tid, sp.upper(), standid.upper(), plot, None, st, y, 'M', study))
+                    continue
+                missing_streak = 0
+                if st == '6':
+                    alive = False
+                    yy = y
+                    if mortality and plot in mortality[1] and years[idx - 1] < mortality[0] < y:
+                        yy = mortality[0]
+                    store.trees.append((tid, sp.upper(), standid.upper(), plot, None, '6', yy, 'M', study))
+                    store.trees_m.append((tid, sp.upper(), standid.upper(), plot, round(dbh, 1), yy))
+                    continue
+                dbh = dbh + rng.uniform(0.2, 2.0)
+                store.trees.append((tid, sp.upper(), standid.upper(), plot, round(dbh, 1), st, y, 'G', study))
+        if addition and plot in addition[1]:
+            # a few addition trees measured in the addition year
+            for k in range(3):
+                tid = "%s9%04d" % (plot, k + 1)
+                sp = rng.choice(species)
+                store.trees.append((tid, sp.upper(), standid.upper(), plot, round(rng.uniform(16, 40), 1), '1', addition[0], 'G', study))
+    store.study.setdefault(study, []).append(standid.upper())
+
+
+def build_store():
+    """ The four small stands: `aa01` and `ab02` in study HSGY, `ac03` and `ad04` in study WS01.
+    """
+    rng = random.Random(42)
+    s = Store()
+    make_stand(s, rng, 'aa01', 4, [1980, 1985, 1990, 1995], ['psme', 'tshe', 'acma'],
+               addition=(1987, ['AA010002']), mortality=(1992, ['AA010001', 'AA010003']))
+    make_stand(s, rng, 'ab02', 5, [1981, 1988, 1996, 2004], ['psme', 'tshe', 'acma'],
+               detail_plots=('AB020003', 'AB020004'), unusual_area={'AB020005': 1000.0})
+    make_stand(s, rng, 'ac03', 3, [1978, 1984, 1990], ['psme', 'acma', 'segi'],
+               unusual_min={'AC030002': 10.0}, big_trees=2, study='WS01')
+    make_stand(s, rng, 'ad04', 2, [1990, 2000, 2010], ['tshe', 'psme'], study='WS01', ntrees=30)
+    return s
+
+
+def large_stand_store():
+    """ The large stand `zz99`: 40 plots of 200 trees, remeasured every 5 years from 1980 to 2015.
+    """
+    rng = random.Random(7)
+    s = Store()
+    make_stand(s, rng, 'zz99', 40, list(range(1980, 2020, 5)), ['psme', 'tshe', 'acma'], ntrees=200)
+    return s
+
+
+class FakeCursor(object):
+    """ A stand-in for a pymssql cursor over a Store. It answers each query in `qf_2.yaml` the tests use from the rows of the Store, and raises KeyError for any other.
+    """
+    def __init__(self, store):
+        self.s = store
+        self.rows = []
+        self.log = []
+
+    def __iter__(self):
+        rows = self.rows
+        self.rows = []
+        return iter(rows)
+
+    def fetchall(self):
+        rows = self.rows
+        self.rows = []
+        return rows
+
+    def execute(self, sql, *args):
+        self.log.append(sql)
+        self.rows = list(self._answer(sql))
+        return None
+
+    def _answer(self, sql):
+        s = self.s
+        q = QUERIES
+        low = sql.lower()
+        st = q['stand']
+        if sql == st['query_additions']:
+            return sorted({(p, y) for (p, y, a, d, ar, m) in s.tp112 if a == 'A'})
+        if sql == st['query_mortalities']:
+            return sorted({(p, y) for (p, y, a, d, ar, m) in s.tp112 if a == 'M'})
+        if sql == st['query_context_dtl']:
+            return [(p,) for (p, y, a, d, ar, m) in s.tp112 if d == 'Y']
+        if sql == st['query_unusual_plot_sql']:
+            return [(p, y, ar) for (p, y, a, d, ar, m) in s.tp112 if ar != 625]
+        if sql == st['query_total_stand_sql']:
+            return sorted({(y, p, ar) for (p, y, a, d, ar, m) in s.tp112 if a in ('R', 'E')})
+        if sql == st['query_unusual_plot_minimums_sql']:
+            return [(p, y, m) for (p, y, a, d, ar, m) in s.tp112 if d != 'Y' and m < 15.0]
+        if "from fsdbdata.dbo.tp00112 where plotid like '" in low and 'detailplot, plot_area' in low:
+            stand = sql.split("like '")[1][:4].upper()
+            return [(p, y, d, ar, m) for (p, y, a, d, ar, m) in s.tp112 if p.startswith(stand)]
+        if 'select distinct(year) from fsdbdata.dbo.tp00112 where plotid like' in low:
+            stand = sql.split("like '")[1][:4].upper()
+            return sorted({(y,) for (p, y, a, d, ar, m) in s.tp112 if p.startswith(stand) and a in ('R', 'E')})
+        if low.startswith('select year, plotid from fsdbdata.dbo.tp00112'):
+            stand = sql.split("like '")[1][:4].upper()
+            return [(y, p) for (p, y, a, d, ar, m) in s.tp112 if p.startswith(stand)]
+        if low.startswith('select distinct(fsdbdata.dbo.tp00101.species)'):
+            stand = sql.split("like '")[1][:4].upper()
+            return sorted({(t[1],) for t in s.trees if t[2] == stand})
+        if low.startswith('select species, eqnset') and "like '" not in sql:
+            return [(sp.upper(),) + r for sp, rows in sorted(SPECIES_EQNS.items()) for r in rows]
+        if low.startswith('select species, eqnset'):
+            sp = sql.split("like '")[1].split("'")[0].lower()
+            return [(sp.upper(),) + r for r in SPECIES_EQNS.get(sp, [])]
+        if 'tp00103.dbh_last' in low and 'standid like' in low:
+            stand = sql.split("standid like '")[1][:4].upper()
+            rows = [t for t in s.trees_m if t[2] == stand]
+            return sorted(rows, key=lambda t: t[5])
+        if 'tp00102.dbh' in low and "tp00101.standid like '" in low and 'plotid like' not in low:
+            stand = sql.split("standid like '")[1][:4].upper()
+            rows = [t for t in s.trees if t[2] == stand]
+            return sorted(rows, key=lambda t: (t[6], t[1], t[3]))
+        if 'tp00102.dbh' in low and 'tp00101.treeid like' in low:
+            tid = sql.split("treeid like '")[1].split("'")[0].upper()
+            rows = [t + (t[2],) for t in s.trees if t[0] == tid]
+            return sorted(rows, key=lambda t: t[6])
+        if low.startswith('select year, tag, check_notes'):
+            return []
+        ex = q['execution']
+        if sql == ex['list_of_all_stands']:
+            return sorted({(t[2],) for t in s.trees})
+        if sql == ex['list_of_all_studies']:
+            return sorted({(st_,) for st_ in s.study})
+        if low.startswith('select distinct(standid) from fsdbdata.dbo.tp00101 where psp_studyid like'):
+            study = sql.split("like '")[1].split("'")[0]
+            return [(x,) for x in sorted(s.study.get(study, []))]
+        if 'count(*)' in low and 'group by' in low and 'standid' in low:
+            # the measurements in tp00102 and the mortality measurements in tp00103 of each stand
+            counts = {}
+            for t in s.trees + s.trees_m:
+                counts[t[2]] = counts.get(t[2], 0) + 1
+            return sorted(counts.items())
+        if low.startswith('select species, eqnset') or 'from fsdbdata.dbo.tp00110' in low:
+            want = None
+            if 'species like' in low:
+                want = low.split("species like '")[1].split("'")[0]
+            out = []
+            for sp, rows in sorted(SPECIES_EQNS.items()):
+                if want is None or sp == want:
+                    out.extend([(sp.upper(),) + r for r in rows])
+            return out
+        raise KeyError("unhandled query: " + sql)
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import tps_Stand
+
+def totals(start):
+    """ A dictionary of the TOTAL_METRICS; the tree counts are integers, as they are when they come from whole trees, and the rest count up by 0.1 from `start`.
+    """
+    values = {}
+    for index, each_metric in enumerate(tps_Stand.TOTAL_METRICS):
+        if each_metric.endswith('_trees'):
+            values[each_metric] = int(start) + index
+        else:
+            values[each_metric] = start + 0.1*index
+    return values
+
+def test_stand_aggregate_sums_each_total_over_the_species(cur, xfactor, queries, quiet):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, 'aa01')
+
+    Biomasses = {1990: {'psme': totals(1.), 'tshe': totals(2.5)}, 1980: {'tshe': totals(4.)}}
+    Biomasses_Agg = A.aggregate_biomasses(Biomasses)
+
+    assert list(Biomasses_Agg.keys()) == [1980, 1990]
+    assert list(Biomasses_Agg[1990].keys()) == tps_Stand.TOTAL_METRICS
+    assert Biomasses_Agg[1980] == totals(4.)
+
+    for each_metric in tps_Stand.TOTAL_METRICS:
+        assert Biomasses_Agg[1990][each_metric] == sum([Biomasses[1990][x][each_metric] for x in ['psme', 'tshe']])
+        # the counts of trees stay integers
+        assert type(Biomasses_Agg[1990][each_metric]) == type(Biomasses[1990]['psme'][each_metric])
+
+def test_plot_aggregate_sums_each_total_over_the_species_on_each_plot(cur, xfactor, queries, quiet):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, 'aa01')
+        K = tps_Stand.Plot(A, xfactor, [])
+
+    Biomasses = {
+        1990: {'psme': {'aa010002': totals(1.), 'aa010001': totals(2.)}, 'tshe': {'aa010001': totals(3.)}},
+        1980: {'tshe': {'aa010001': totals(5.)}},
+    }
+    Biomasses_Agg = K.aggregate_biomasses_plot(Biomasses)
+
+    # plots are in the order they are found, years in order for each plot
+    assert list(Biomasses_Agg.keys()) == ['aa010001', 'aa010002']
+    assert list(Biomasses_Agg['aa010001'].keys()) == [1980, 1990]
+    assert list(Biomasses_Agg['aa010002'].keys()) == [1990]
+
+    assert Biomasses_Agg['aa010001'][1980] == totals(5.)
+    assert Biomasses_Agg['aa010002'][1990] == totals(1.)
+
+    for each_metric in tps_Stand.TOTAL_METRICS:
+        assert Biomasses_Agg['aa010001'][1990][each_metric] == totals(2.)[each_metric] + totals(3.)[each_metric]
+        assert type(Biomasses_Agg['aa010001'][1990][each_metric]) == type(totals(2.)[each_metric])
+
+    # the totals of the input are not changed by adding to them
+    assert Biomasses[1990]['psme']['aa010001'] == totals(2.)
@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import csv
+import random
+
+import synthetic
+import poptree_basis
+import tps_Stand
+
+def test_bad_trees_are_the_tree_years_with_no_dbh(store, queries, quiet):
+    synthetic.make_stand(store, random.Random(3), 'xx01', 2, [1980, 1990], ['psme', 'tshe'])
+    store.trees.append(('XX0100019999', 'PSME', 'XX01', 'XX010001', None, '1', 1990, 'G', 'HSGY'))
+    store.trees.append(('XX0100029999', 'TSHE', 'XX01', 'XX010002', None, '2', 1990, 'G', 'HSGY'))
+    cur = synthetic.FakeCursor(store)
+
+    with quiet:
+        XFACTOR = poptree_basis.Capture(cur, queries)
+        A = tps_Stand.Stand(cur, XFACTOR, queries, 'xx01')
+        Biomasses, BadTreeRef, Rob_Biomasses = A.compute_biomasses(XFACTOR)
+
+    # the ingrowth tree is in both live and ingrowth, as it is in the tree table
+    assert BadTreeRef == {1990: {'psme': {'xx010001': {'dead': [], 'live': ['xx0100019999'], 'ingrowth': []}}, 'tshe': {'xx010002': {'dead': [], 'live': ['xx0100029999'], 'ingrowth': ['xx0100029999']}}}}
+
+    A.write_bad_trees()
+    with open('xx01_stand_member_check.csv', 'r') as readfile:
+        rows = list(csv.reader(readfile))
+
+    assert rows == [['standid', 'year', 'species', 'plot', 'treeid', 'state', 'issue'], ['xx01', '1990', 'psme', 'xx010001', 'xx0100019999', 'live', 'dbh is None'], ['xx01', '1990', 'tshe', 'xx010002', 'xx0100029999', 'live', 'dbh is None']]
+
+def test_missing_and_dead_trees_given_a_dbh_are_not_bad_trees(cur, xfactor, queries, quiet):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, 'aa01')
+        Biomasses, BadTreeRef, Rob_Biomasses = A.compute_biomasses(xfactor)
+
+    assert BadTreeRef == {}
+    assert A.bad_tree_table() == []
@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import execution_basis
+
+def test_tree_years_count_both_measurement_tables(queries):
+    # the count query, on the same tables in sqlite, which has no fsdbdata.dbo schema
+    sql = queries['execution']['count_of_tree_years_by_stand'].replace('fsdbdata.dbo.', '')
+
+    conn = sqlite3.connect(':memory:')
+    cur = conn.cursor()
+    cur.execute("create table tp00101 (treeid text, standid text)")
+    cur.execute("create table tp00102 (treeid text, year int)")
+    cur.execute("create table tp00103 (treeid text, year int)")
+
+    # on aa01, one tree is measured twice and then dies, one is measured once and then dies, and one has no measurements at all
+    cur.executemany("insert into tp00101 values (?, ?)", [('AA0100010001', 'AA01'), ('AA0100010002', 'AA01'), ('AA0100010003', 'AA01'), ('AB0200010001', 'AB02')])
+    cur.executemany("insert into tp00102 values (?, ?)", [('AA0100010001', 1980), ('AA0100010001', 1985), ('AA0100010003', 1980), ('AB0200010001', 1981)])
+    cur.executemany("insert into tp00103 values (?, ?)", [('AA0100010001', 1990), ('AA0100010003', 1987)])
+
+    costs = execution_basis.stand_costs(cur, {'execution': {'count_of_tree_years_by_stand': sql}})
+
+    assert costs == {'aa01': 5, 'ab02': 1}
@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+
+import pytest
+
+import jobs_basis
+import tps_Tree
+
+from test_parallel import serial_output
+
+def write_jobs(text):
+    with open('jobs.yaml', 'w') as writefile:
+        writefile.write(text)
+    return 'jobs.yaml'
+
+def test_outputs_are_normalized():
+    jobs = jobs_basis.read_jobs(write_jobs("""
+- name: west
+  run: bio stand composite
+  units: [aa01]
+  output: ./out/../west.csv
+- name: east
+  run: bio stand composite
+  units: ab02
+"""))
+
+    assert [x['output'] for x in jobs] == ['west.csv', 'east_output.csv']
+    assert [x['error'] for x in jobs] == [None, None]
+
+def test_two_jobs_can_not_write_the_same_file_by_different_paths():
+    filename_in = write_jobs("""
+- name: west
+  run: bio stand composite
+  units: [aa01]
+  output: out.csv
+- name: east
+  run: npp stand composite
+  units: [ab02]
+  output: """ + os.path.join(os.getcwd(), 'out.csv') + """
+""")
+
+    with pytest.raises(ValueError) as error:
+        jobs_basis.read_jobs(filename_in)
+
+    assert 'west' in str(error.value) and 'east' in str(error.value)
+
+def serial_tree_output(cur, queries, treeids, quiet):
+    """ The output of `bio tree tree` on some trees, written one tree after another the way tps_cli writes it.
+    """
+    with quiet:
+        for index, each_tree in enumerate(treeids):
+            A = tps_Tree.Tree(cur, queries, each_tree)
+            A.only_output_attributes(A.compute_biomasses(), datafile='serial_trees.csv', mode='wt' if index == 0 else 'a')
+
+    with open('serial_trees.csv', 'rb') as readfile:
+        return readfile.read()
+
+def test_a_batch_of_jobs_gives_the_outputs_of_serial_runs(database, cur, xfactor, queries, quiet):
+    # trees measured in every year they are listed, so none of them stop at the debugger
+    unmeasured = set([x[0] for x in database.trees if x[4] == None])
+    treeids = sorted(set([x[0] for x in database.trees if x[0] not in unmeasured and x[2] == 'AB02']))[:3]
+    study_stands = database.study['WS01']
+
+    filename_in = write_jobs("""
+- name: stands
+  run: bio stand composite
+  units: [aa01, ac03]
+- name: study_npp
+  run: npp study composite
+  units: [WS01]
+- name: trees
+  run: bio tree tree
+  units: [""" + ", ".join(treeids) + """]
+- name: bogus
+  run: bio forest composite
+  units: [aa01]
+- name: nostudy
+  run: bio study composite
+  units: [nosuchstudy]
+""")
+
+    jobs = jobs_basis.read_jobs(filename_in)
+
+    with quiet:
+        results = jobs_basis.run_jobs(jobs, queries, xfactor, 2, 2)
+        jobs_basis.write_job_report(results, 'job_report.csv')
+
+    expected = {
+        'stands_output.csv': serial_output(cur, xfactor, queries, ('bio', 'stand', 'composite'), ['aa01', 'ac03'], quiet),
+        'study_npp_output.csv': serial_output(cur, xfactor, queries, ('npp', 'stand', 'composite'), study_stands, quiet),
+        'trees_output.csv': serial_tree_output(cur, queries, treeids, quiet),
+    }
+
+    for each_output, each_expected in expected.items():
+        with open(each_output, 'rb') as readfile:
+            assert readfile.read() == each_expected
+
+    assert not os.path.exists('bogus_output.csv')
+    assert not os.path.exists('nostudy_output.csv')
+
+    with open('job_report.csv', 'r') as readfile:
+        report = list(csv.DictReader(readfile))
+
+    assert [(x['JOB'], x['STATUS'], x['UNITS_RUN']) for x in report] == [('stands', 'done', '2'), ('study_npp', 'done', str(len(study_stands))), ('trees', 'done', '3'), ('bogus', 'skipped', '0'), ('nostudy', 'failed', '0')]
+    assert [x['ERROR'] for x in report][:3] == ['', '', '']
+    assert report[3]['ERROR'].startswith('`bio forest composite` is not a run a job can do')
+    assert report[4]['ERROR'] == 'ValueError: no stands were found for nosuchstudy'
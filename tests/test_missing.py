@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+import random
+
+import synthetic
+import poptree_basis
+import table_basis
+import tps_Stand
+
+YEARS = [1980, 1985, 1990, 1995, 2000, 2005, 2010]
+
+def missing_stand_store():
+    """ A stand of one plot remeasured 7 times: tree 1 is always measured, tree 2 goes missing for 5 remeasurements in a row, and tree 3 is missing in the first year and measured after.
+    """
+    store = synthetic.Store()
+    synthetic.make_stand(store, random.Random(1), 'mt01', 1, YEARS, ['psme'], ntrees=0, study='MT')
+
+    def tree(treeid, dbh, status, year):
+        if dbh == None:
+            dbh_code = 'M'
+        else:
+            dbh_code = 'G'
+        store.trees.append((treeid, 'PSME', 'MT01', 'MT010001', dbh, status, year, dbh_code, 'MT'))
+
+    for each_year in YEARS:
+        tree('MT01000100001', 40.0 + each_year - 1980, '1', each_year)
+
+    tree('MT01000100002', 20.0, '1', 1980)
+    for each_year in YEARS[1:-1]:
+        tree('MT01000100002', None, '9', each_year)
+    tree('MT01000100002', 30.0, '1', 2010)
+
+    tree('MT01000100003', None, '9', 1980)
+    for each_year in YEARS[1:]:
+        tree('MT01000100003', 25.0 + each_year - 1985, '1', each_year)
+
+    return store
+
+def live_observations(A, treeid):
+    """ The observation of a tree in each year it is in the live rows of the table.
+    """
+    observations = {}
+    for each_year in YEARS:
+        rows = A.table.rows(each_year, 'psme', 'mt010001', 'live')
+        if treeid in rows:
+            observations[each_year] = A.table.observation(rows[treeid])
+    return observations
+
+def missing_stand(capsys):
+    store = missing_stand_store()
+    cur = synthetic.FakeCursor(store)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        XFACTOR = poptree_basis.Capture(cur, synthetic.QUERIES)
+
+    capsys.readouterr()
+    A = tps_Stand.Stand(cur, XFACTOR, synthetic.QUERIES, 'mt01')
+    return A, capsys.readouterr().out
+
+def test_a_tree_missing_for_five_remeasurements_carries_its_last_dbh_and_year(capsys):
+    A, printed = missing_stand(capsys)
+    observations = live_observations(A, 'mt01000100002')
+
+    # every missing year has the dbh of 1980, with 1980 as its raw year
+    for each_year in YEARS[1:-1]:
+        assert observations[each_year] == (20.0, '9', 'M', 1980)
+
+    assert observations[1980] == (20.0, '1', 'G', 1980)
+    assert observations[2010] == (30.0, '1', 'G', 2010)
+
+def test_a_tree_missing_in_its_first_year_does_not_wrap_to_the_last(capsys):
+    A, printed = missing_stand(capsys)
+    observations = live_observations(A, 'mt01000100003')
+
+    # it has no measurement before 1980, so it keeps no dbh there rather than the one from 2010
+    assert observations[1980][0] == None
+    assert observations[1985] == (25.0, '1', 'G', 1985)
+
+    # and the message names the tree and the year, instead of raising a TypeError
+    assert printed.count("cannot find a live measurement for the missing tree: mt01000100003 before 1980") == 1
+
+def test_the_last_measurement_before_a_year():
+    index = table_basis.MeasurementIndex()
+    for each_year, each_dbh in [(1990, 22.0), (1980, 20.0), (2000, 25.0)]:
+        index.add('t1', each_year, each_dbh)
+
+    assert index.last_before('t1', 1980) == None
+    assert index.last_before('t1', 1985) == (1980, 20.0)
+    assert index.last_before('t1', 1990) == (1980, 20.0)
+    assert index.last_before('t1', 2030) == (2000, 25.0)
+    assert index.last_before('t2', 1990) == None
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+import execution_basis
+
+def serial_output(cur, xfactor, queries, run_key, standids, quiet):
+    """ The output of the run on one process, streamed the way tps_cli streams it.
+    """
+    filename_out = 'serial_' + execution_basis.STREAMING_RUNS[run_key]
+
+    with quiet:
+        results, write = execution_basis.stream_results(cur, xfactor, queries, standids, *run_key, filename_out=filename_out)
+        execution_basis.run_streaming(results, write)
+
+    with open(filename_out, 'rb') as readfile:
+        return readfile.read()
+
+@pytest.mark.parametrize('run_key', [('bio', 'stand', 'composite'), ('npp', 'plot', 'composite')])
+def test_parallel_output_is_in_the_order_of_a_serial_run(database, cur, xfactor, queries, quiet, run_key):
+    standids = execution_basis.all_standids(cur, queries, run_key[1])
+    expected = serial_output(cur, xfactor, queries, run_key, standids, quiet)
+
+    # the costs start the last stand first, so the stands finish out of order
+    costs = {x.lower(): index for index, x in enumerate(standids)}
+
+    with quiet:
+        summary = execution_basis.run_parallel(standids, run_key, queries, 2, 'parallel.csv', costs, xfactor)
+
+    assert [x['standid'] for x in summary] == standids
+    with open('parallel.csv', 'rb') as readfile:
+        assert readfile.read() == expected
+    assert not os.path.exists('parallel.csv.partial')
+
+def test_a_failed_parallel_run_leaves_the_output_alone(database, cur, xfactor, queries, quiet, monkeypatch):
+    run_key = ('bio', 'stand', 'composite')
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    prefixes = [b''] + [serial_output(cur, xfactor, queries, run_key, standids[:x], quiet) for x in [1, 2]]
+
+    compute_result = execution_basis.compute_result
+
+    def fail_on_the_third_stand(A, XFACTOR, run_key):
+        if A.standid == standids[2].lower():
+            raise ValueError("bad stand")
+        return compute_result(A, XFACTOR, run_key)
+
+    monkeypatch.setattr(execution_basis, 'compute_result', fail_on_the_third_stand)
+
+    with open('parallel.csv', 'w') as writefile:
+        writefile.write('the last good output\n')
+
+    with quiet:
+        with pytest.raises(ValueError):
+            execution_basis.run_parallel(standids, run_key, queries, 2, 'parallel.csv', None, xfactor)
+
+    with open('parallel.csv', 'r') as readfile:
+        assert readfile.read() == 'the last good output\n'
+
+    # the stands written before the error came back are kept, in order; which of them were done by then is up to the workers
+    with open('parallel.csv.partial', 'rb') as readfile:
+        assert readfile.read() in prefixes
+
+def test_workers_only_use_their_own_connection(database, cur, xfactor, queries, quiet, monkeypatch):
+    run_key = ('bio', 'stand', 'composite')
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    parent_cur = xfactor.cur
+
+    compute_result = execution_basis.compute_result
+
+    def check_the_connection(A, XFACTOR, run_key):
+        # the forked copy of the cursor is the same object as the parent's
+        if XFACTOR.cur is parent_cur or A.cur is parent_cur:
+            raise AssertionError("a worker used the connection of the process that forked it")
+        return compute_result(A, XFACTOR, run_key)
+
+    monkeypatch.setattr(execution_basis, 'compute_result', check_the_connection)
+
+    with quiet:
+        execution_basis.run_parallel(standids, run_key, queries, 2, 'parallel.csv', None, xfactor)
+        execution_basis.run_pipeline(standids, run_key, queries, xfactor, 2, 1, 2, 'pipeline.csv')
+
+    # the process that started the run keeps its connection
+    assert xfactor.cur is parent_cur
+
+def test_the_pipeline_output_is_in_the_order_of_a_serial_run(database, cur, xfactor, queries, quiet):
+    run_key = ('bio', 'stand', 'composite')
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    expected = serial_output(cur, xfactor, queries, run_key, standids, quiet)
+
+    # the last stand is fetched first
+    costs = {x.lower(): index for index, x in enumerate(standids)}
+
+    with quiet:
+        summary, stages = execution_basis.run_pipeline(standids, run_key, queries, xfactor, 2, 2, 2, 'pipeline.csv', costs)
+
+    assert [x['standid'] for x in summary] == standids
+    with open('pipeline.csv', 'rb') as readfile:
+        assert readfile.read() == expected
+    assert not os.path.exists('pipeline.csv.partial')
+
+def test_a_failed_stand_stops_the_pipeline(database, cur, xfactor, queries, quiet, monkeypatch):
+    run_key = ('bio', 'stand', 'composite')
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+
+    compute_result = execution_basis.compute_result
+    fetch_stand = execution_basis.fetch_stand
+    fetched = []
+
+    def fail_on_the_first_stand(A, XFACTOR, run_key):
+        if A.standid == standids[0].lower():
+            raise ValueError("bad stand")
+        return compute_result(A, XFACTOR, run_key)
+
+    def count_the_fetches(cur, queries, standid):
+        fetched.append(standid)
+        return fetch_stand(cur, queries, standid)
+
+    monkeypatch.setattr(execution_basis, 'compute_result', fail_on_the_first_stand)
+    monkeypatch.setattr(execution_basis, 'fetch_stand', count_the_fetches)
+
+    with open('pipeline.csv', 'w') as writefile:
+        writefile.write('the last good output\n')
+
+    with quiet:
+        with pytest.raises(ValueError):
+            execution_basis.run_pipeline(standids, run_key, queries, xfactor, 2, 1, 1, 'pipeline.csv')
+
+    # one stand is computed at a time and one waits, so the fetch thread stops before it gets to the last stand
+    assert len(fetched) < len(standids)
+
+    with open('pipeline.csv', 'r') as readfile:
+        assert readfile.read() == 'the last good output\n'
+
+    # nothing comes before the first stand, so nothing is in the .partial file
+    with open('pipeline.csv.partial', 'rb') as readfile:
+        assert readfile.read() == b''
+
+def test_a_failed_pipeline_keeps_the_stands_before_the_error_in_order(database, cur, xfactor, queries, quiet, monkeypatch):
+    run_key = ('bio', 'stand', 'composite')
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    prefixes = [b''] + [serial_output(cur, xfactor, queries, run_key, standids[:x], quiet) for x in [1, 2]]
+
+    compute_result = execution_basis.compute_result
+
+    def fail_on_the_third_stand(A, XFACTOR, run_key):
+        if A.standid == standids[2].lower():
+            raise ValueError("bad stand")
+        return compute_result(A, XFACTOR, run_key)
+
+    monkeypatch.setattr(execution_basis, 'compute_result', fail_on_the_third_stand)
+
+    with open('pipeline.csv', 'w') as writefile:
+        writefile.write('the last good output\n')
+
+    with quiet:
+        with pytest.raises(ValueError):
+            execution_basis.run_pipeline(standids, run_key, queries, xfactor, 2, 2, 2, 'pipeline.csv')
+
+    with open('pipeline.csv', 'r') as readfile:
+        assert readfile.read() == 'the last good output\n'
+
+    # the stands written before the error came back are kept, in order; which of them were done by then is up to the workers
+    with open('pipeline.csv.partial', 'rb') as readfile:
+        assert readfile.read() in prefixes
@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import tps_Stand
+
+@pytest.fixture
+def plot_workers(monkeypatch):
+    monkeypatch.setattr(tps_Stand, 'PLOT_WORKERS', 2)
+    yield
+    tps_Stand.close_chunk_pool()
+
+def test_plot_workers_give_the_same_biomasses(cur, xfactor, queries, quiet, plot_workers, monkeypatch):
+    monkeypatch.setattr(tps_Stand, 'PLOT_WORKERS', 1)
+
+    one_process = {}
+    with quiet:
+        for each_stand in ['ab02', 'aa01']:
+            A = tps_Stand.Stand(cur, xfactor, queries, each_stand)
+            one_process[each_stand] = A.compute_biomasses(xfactor, keep_names=True)
+
+    monkeypatch.setattr(tps_Stand, 'PLOT_WORKERS', 2)
+
+    pools = []
+    with quiet:
+        for each_stand in ['ab02', 'aa01']:
+            B = tps_Stand.Stand(cur, xfactor, queries, each_stand)
+            assert B.compute_biomasses(xfactor, keep_names=True) == one_process[each_stand]
+            pools.append(tps_Stand.CHUNK_POOL['pool'])
+
+    # the plot workers are forked once for the run
+    assert pools[0] is pools[1]
+    # the stands are sent without their cursor, and keep it here
+    assert B.cur is cur
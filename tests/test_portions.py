@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import csv
+
+import tps_Stand
+
+def portions(cur, xfactor, queries, quiet, standid, thresholds):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, standid)
+        return A, A.compute_biomasses(xfactor, thresholds=thresholds)
+
+def test_the_15_cm_portion_is_the_rob_portion(cur, xfactor, queries, quiet):
+    for each_stand in ['aa01', 'ab02', 'ac03', 'ad04']:
+        A, (Biomasses, BadTreeRef, Rob) = portions(cur, xfactor, queries, quiet, each_stand, None)
+        B, (Biomasses_B, BadTreeRef_B, Portions) = portions(cur, xfactor, queries, quiet, each_stand, [10.0, 15.0, 25.0])
+
+        assert Portions[15.0] == Rob
+        assert Biomasses_B == Biomasses
+
+def test_a_portion_under_every_minimum_is_the_totals(cur, xfactor, queries, quiet):
+    # ab02 has detail plots and an unusual area, ac03 a plot with a 10 cm minimum
+    for each_stand in ['ab02', 'ac03']:
+        A, (Biomasses, BadTreeRef, Portions) = portions(cur, xfactor, queries, quiet, each_stand, [1.0])
+
+        for each_year in Biomasses:
+            for each_species in Biomasses[each_year]:
+                for each_metric in tps_Stand.TOTAL_METRICS:
+                    total = Biomasses[each_year][each_species][each_metric]
+                    portion = Portions[1.0][each_year][each_species][each_metric]
+
+                    # the trees per unit area of a portion are not multiplied by the percent area of the total, which is at most 1
+                    if each_metric.endswith('_trees'):
+                        assert portion >= total - 1e-12
+                    else:
+                        assert abs(portion - total) <= 1e-9*max(1., abs(total))
+
+def test_the_portions_fall_as_the_threshold_rises(cur, xfactor, queries, quiet):
+    thresholds = [5.0, 15.0, 25.0, 40.0, 80.0]
+    A, (Biomasses, BadTreeRef, Portions) = portions(cur, xfactor, queries, quiet, 'ab02', thresholds)
+
+    fell = False
+    for each_year in Biomasses:
+        for each_species in Biomasses[each_year]:
+            for each_metric in tps_Stand.TOTAL_METRICS:
+                values = [Portions[x][each_year][each_species][each_metric] for x in thresholds]
+
+                for lower, higher in zip(values, values[1:]):
+                    assert higher <= lower + 1e-12
+                    if higher < lower:
+                        fell = True
+
+    assert fell
+
+def test_the_portion_rows_are_written_with_their_threshold(cur, xfactor, queries, quiet):
+    A, (Biomasses, BadTreeRef, Portions) = portions(cur, xfactor, queries, quiet, 'aa01', [30.0, 15.0])
+    A.write_stand_portions(Portions, xfactor, 'portions.csv', 'w')
+
+    with open('portions.csv', 'r') as readfile:
+        rows = list(csv.reader(readfile))
+
+    assert rows[:4] == [
+        ['DBCODE', 'ENTITY', 'STANDID', 'SPECIES', 'YEAR', 'DBH_MIN_CM', 'PORTION', 'TPH_NHA', 'BA_M2HA', 'VOL_M3HA', 'BIO_MGHA', 'JENKBIO_MGHA', 'NO_PLOTS'],
+        ['TP001', '06', 'AA01', 'ACMA', '1980', '15.0', 'INGROWTH', '0', '0.0', '0.0', '0.0', '0.0', '4'],
+        ['TP001', '06', 'AA01', 'ACMA', '1980', '15.0', 'LIVE', '176', '15.455', '75171.159', '33075.31', '94.687', '4'],
+        ['TP001', '06', 'AA01', 'ACMA', '1980', '15.0', 'MORT', '0', '0.0', '0.0', '0.0', '0.0', '4'],
+    ]
+
+    # three rows for each threshold, year, and species, the lower threshold first
+    years_and_species = sum([len(Portions[15.0][x]) for x in Portions[15.0]])
+    assert len(rows) == 1 + 2*3*years_and_species
+    assert [x[5] for x in rows[1:]] == ['15.0']*3*years_and_species + ['30.0']*3*years_and_species
+
+    # the 15 cm rows are the rows of the rob output, with the threshold put in
+    A.write_stand_rob(Portions[15.0], xfactor, 'rob.csv', 'w')
+    with open('rob.csv', 'r') as readfile:
+        rob_rows = list(csv.reader(readfile))
+
+    assert [x[:5] + x[6:] for x in rows[1:1 + 3*years_and_species]] == rob_rows[1:]
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import execution_basis
+
+from test_parallel import serial_output
+
+RUN_KEY = ('bio', 'stand', 'composite')
+
+def test_quarantined_stands_are_retried_once_fixed(cur, xfactor, queries, quiet, monkeypatch):
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    bad_stand = standids[1]
+
+    compute_result = execution_basis.compute_result
+
+    def fail_on_the_bad_stand(A, XFACTOR, run_key):
+        if A.standid == bad_stand.lower():
+            raise ValueError("bad stand")
+        return compute_result(A, XFACTOR, run_key)
+
+    monkeypatch.setattr(execution_basis, 'compute_result', fail_on_the_bad_stand)
+
+    quarantine = execution_basis.Quarantine('quarantine.jsonl')
+    with quiet:
+        results, write = execution_basis.stream_results(cur, xfactor, queries, standids, *RUN_KEY, quarantine=quarantine)
+        execution_basis.run_streaming(results, write)
+
+    # the run went on without the bad stand
+    good_stands = [x for x in standids if x != bad_stand]
+    with open(execution_basis.STREAMING_RUNS[RUN_KEY], 'rb') as readfile:
+        assert readfile.read() == serial_output(cur, xfactor, queries, RUN_KEY, good_stands, quiet)
+
+    entries = execution_basis.read_quarantine('quarantine.jsonl')
+    assert [(x['kind'], x['unit'], x['run'], x['error']) for x in entries] == [('stand', bad_stand, list(RUN_KEY), 'ValueError')]
+
+    # the stand still fails, so it stays in the quarantine
+    with quiet:
+        retried = execution_basis.retry_quarantined(cur, xfactor, queries, 'quarantine.jsonl')
+
+    assert retried == {'retried': 1, 'fixed': 0, 'failed': 1}
+    assert [x['unit'] for x in execution_basis.read_quarantine('quarantine.jsonl')] == [bad_stand]
+
+    # once it is fixed, it is written to the retry file and the quarantine is kept as done
+    monkeypatch.setattr(execution_basis, 'compute_result', compute_result)
+
+    with quiet:
+        retried = execution_basis.retry_quarantined(cur, xfactor, queries, 'quarantine.jsonl')
+
+    assert retried == {'retried': 1, 'fixed': 1, 'failed': 0}
+    assert not os.path.exists('quarantine.jsonl')
+    assert [x['unit'] for x in execution_basis.read_quarantine('quarantine.jsonl.done')] == [bad_stand]
+
+    with open('all_stands_biomass_composite_output.retry.csv', 'rb') as readfile:
+        assert readfile.read() == serial_output(cur, xfactor, queries, RUN_KEY, [bad_stand], quiet)
@@ -0,0 +1,23 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import table_basis
+import tps_Stand
+
+def test_observations_are_the_tuples_stands_held(cur, xfactor, queries, quiet):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, 'aa01')
+
+    observation = A.table.observation(0)
+    assert type(observation) == tuple
+    assert len(observation) == 4
+
+def test_interval_changes_are_read_by_name():
+    C = table_basis.IntervalChange((1985, 1990, 1., 2., 3., 4., 5., 6., 7.))
+
+    assert C['year_begin'] == 1985
+    assert C['npp_j_yr'] == C.npp_j_yr == 7.
+    assert C.keys() == ['year_begin', 'year_end', 'delta_live_bio', 'delta_live_jenkins', 'delta_live_volume', 'delta_live_basal', 'delta_live_tph', 'npp_yr', 'npp_j_yr']
+    assert hash(C) == hash((1985, 1990, 1., 2., 3., 4., 5., 6., 7.))
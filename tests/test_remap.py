@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import tps_Stand
+
+def test_additions_roll_back_and_mortalities_roll_forward():
+    add_map, mort_map = tps_Stand.replacement_years([1980, 1990, 2000], [1980, 1985, 2004], [1983, 1990, 2003])
+
+    assert add_map == {1980: 1980, 1985: 1980, 2004: 2000}
+    # mortality after the last remeasurement has nowhere to go
+    assert mort_map == {1983: 1990, 1990: 2000}
+
+def test_additions_before_the_first_remeasurement_roll_forward_to_it():
+    add_map, mort_map = tps_Stand.replacement_years([1980, 1990, 2000], [1975], [])
+
+    assert add_map == {1975: 1980}
+
+def test_a_stand_with_no_remeasurements_keeps_its_years(capsys):
+    replacements, mort_replacements = tps_Stand.stand_replacements('xx01', [], {1985: ['XX010001']}, {1987: ['XX010001']})
+
+    assert replacements == {}
+    assert mort_replacements == {}
+    assert 'xx01' in capsys.readouterr().out
+
+    new_years = tps_Stand.remap_year_column(['xx01', 'xx01'], [1985, 1987], ['XX010001', 'XX010001'], bytearray([0, 1]), {'xx01': replacements}, {'xx01': mort_replacements})
+    assert new_years == [1985, 1987]
+
+def test_only_the_listed_plots_and_the_dead_rows_are_rolled():
+    replacements, mort_replacements = tps_Stand.stand_replacements('xx01', [1980, 1990], {1985: ['XX010001']}, {1985: ['XX010002']})
+
+    standids = ['xx01']*4
+    years = [1985, 1985, 1985, None]
+    plots = ['XX010001', 'XX010002', 'XX010002', 'XX010001']
+    dead = bytearray([0, 0, 1, 0])
+
+    new_years = tps_Stand.remap_year_column(standids, years, plots, dead, {'xx01': replacements}, {'xx01': mort_replacements})
+    assert new_years == [1980, 1985, 1990, None]
+
+def test_a_dead_addition_is_rolled_by_mortality_from_its_rolled_year():
+    replacements, mort_replacements = tps_Stand.stand_replacements('xx01', [1980, 1990, 2000], {1985: ['XX010001']}, {1980: ['XX010001']})
+
+    new_years = tps_Stand.remap_year_column(['xx01'], [1985], ['XX010001'], bytearray([1]), {'xx01': replacements}, {'xx01': mort_replacements})
+    assert new_years == [1990]
+
+def test_many_stands_at_once_match_each_stand_on_its_own():
+    stands = {
+        'xx01': ([1980, 1990, 2000], {1975: ['XX010001'], 1985: ['XX010002']}, {1995: ['XX010001']}),
+        'xx02': ([1982, 1992], {1987: ['XX020001', 'XX020002']}, {1984: ['XX020002']}),
+        'xx03': ([], {1990: ['XX030001']}, {}),
+        'xx04': ([1980, 1990], {}, {}),
+    }
+
+    replacements = {}
+    mort_replacements = {}
+    for each_stand, (decent_years, additions, mortalities) in stands.items():
+        replacements[each_stand], mort_replacements[each_stand] = tps_Stand.stand_replacements(each_stand, decent_years, additions, mortalities)
+
+    # the same plots and years on every stand, so only the stand tells the rows apart
+    columns = {}
+    for each_stand in stands:
+        rows = []
+        for each_plot in [each_stand.upper() + '0001', each_stand.upper() + '0002']:
+            for each_year in [1975, 1984, 1985, 1987, 1990, 1995, None]:
+                for each_dead in [0, 1]:
+                    rows.append((each_stand, each_year, each_plot, each_dead))
+        columns[each_stand] = rows
+
+    one_by_one = []
+    for each_stand, rows in columns.items():
+        standids, years, plots, dead = zip(*rows)
+        one_by_one.extend(tps_Stand.remap_year_column(standids, years, plots, bytearray(dead), {each_stand: replacements[each_stand]}, {each_stand: mort_replacements[each_stand]}))
+
+    all_rows = [row for each_stand in columns for row in columns[each_stand]]
+    standids, years, plots, dead = zip(*all_rows)
+    at_once = tps_Stand.remap_year_column(standids, years, plots, bytearray(dead), replacements, mort_replacements)
+
+    assert at_once == one_by_one
+    assert at_once != list(years)
+
+    # spot check each kind of roll
+    rolled = dict(zip(all_rows, at_once))
+    assert rolled[('xx01', 1975, 'XX010001', 0)] == 1980
+    assert rolled[('xx01', 1985, 'XX010002', 0)] == 1980
+    assert rolled[('xx01', 1995, 'XX010001', 1)] == 2000
+    assert rolled[('xx01', 1995, 'XX010001', 0)] == 1995
+    assert rolled[('xx02', 1987, 'XX020001', 0)] == 1982
+    assert rolled[('xx02', 1984, 'XX020002', 1)] == 1992
+    assert rolled[('xx03', 1990, 'XX030001', 0)] == 1990
+    assert rolled[('xx04', 1985, 'XX040001', 1)] == 1985
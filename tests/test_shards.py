@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+import execution_basis
+
+from test_parallel import serial_output
+
+RUN_KEY = ('bio', 'stand', 'composite')
+
+def run_shards(cur, xfactor, queries, standids, quiet, costs_of_each_shard):
+    with quiet:
+        return [execution_basis.run_shard(cur, xfactor, queries, standids, RUN_KEY, index + 1, len(costs_of_each_shard), x) for index, x in enumerate(costs_of_each_shard)]
+
+def test_merged_shards_are_the_output_of_a_serial_run(cur, xfactor, queries, quiet):
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    expected = serial_output(cur, xfactor, queries, RUN_KEY, standids, quiet)
+
+    # the costs the second shard counts are the other way around, as if the database changed; it still takes its stands from the plan of the first
+    costs = {x.lower(): index for index, x in enumerate(standids)}
+    changed = {x.lower(): -index for index, x in enumerate(standids)}
+    assert execution_basis.shard_stands(standids, changed, 2) != execution_basis.shard_stands(standids, costs, 2)
+
+    manifests = run_shards(cur, xfactor, queries, standids, quiet, [costs, changed])
+
+    with quiet:
+        execution_basis.merge_shards(manifests, 'merged.csv')
+
+    with open('merged.csv', 'rb') as readfile:
+        assert readfile.read() == expected
+
+    assigned = []
+    for each_filename in manifests:
+        with open(each_filename, 'r') as readfile:
+            manifest = json.load(readfile)
+        assert manifest['assigned'] == execution_basis.shard_stands(standids, costs, 2)
+        assigned += [x['index'] for x in manifest['stands']]
+
+    assert sorted(assigned) == list(range(len(standids)))
+
+def test_shards_that_do_not_match_the_plan_are_not_merged(cur, xfactor, queries, quiet):
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    manifests = run_shards(cur, xfactor, queries, standids, quiet, [{}, {}])
+
+    # the second shard claims a stand of the first as well
+    with open(manifests[0], 'r') as readfile:
+        first = json.load(readfile)
+    with open(manifests[1], 'r') as readfile:
+        second = json.load(readfile)
+
+    second['stands'] = first['stands'][:1] + second['stands']
+    with open(manifests[1], 'w') as writefile:
+        json.dump(second, writefile)
+
+    with pytest.raises(ValueError):
+        execution_basis.merge_shards(manifests, 'merged.csv')
+
+    # and a plan that leaves a stand out of every shard
+    second['stands'] = second['stands'][1:]
+    second['assigned'] = [first['assigned'][0][1:], first['assigned'][1]]
+    second['plan'] = execution_basis.plan_digest(second['assigned'])
+    first.update({'assigned': second['assigned'], 'plan': second['plan']})
+
+    for each_filename, each_manifest in zip(manifests, [first, second]):
+        with open(each_filename, 'w') as writefile:
+            json.dump(each_manifest, writefile)
+
+    with pytest.raises(ValueError):
+        execution_basis.merge_shards(manifests, 'merged.csv')
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import json
+import math
+import os
+import random
+
+import synthetic
+import poptree_basis
+import tps_Stand
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+
+# the stand outputs of the synthetic stands from the code before the single-pass aggregation, which divided each tree by the area of its plot on its own
+with open(os.path.join(HERE, 'data', 'baseline_biomasses.json'), 'r') as readfile:
+    BASELINE = json.load(readfile)
+
+def assert_same_totals(old, new):
+    assert sorted(old.keys()) == sorted([str(x) for x in new.keys()])
+
+    for each_year in new:
+        assert sorted(old[str(each_year)].keys()) == sorted(new[each_year].keys())
+
+        for each_species in new[each_year]:
+            old_values = old[str(each_year)][each_species]
+            new_values = new[each_year][each_species]
+            assert sorted(old_values.keys()) == sorted(new_values.keys())
+
+            for each_key in new_values:
+                # the plots are summed before they are divided by their area, so only the last digits may differ
+                assert math.isclose(old_values[each_key], new_values[each_key], rel_tol=1e-12, abs_tol=1e-18), (each_year, each_species, each_key)
+
+def test_stand_biomasses_match_the_per_tree_sums(cur, xfactor, queries, quiet):
+    for each_stand in sorted(BASELINE):
+        with quiet:
+            A = tps_Stand.Stand(cur, xfactor, queries, each_stand)
+            Biomasses, BadTreeRef, Rob_Biomasses = A.compute_biomasses(xfactor)
+
+        assert_same_totals(BASELINE[each_stand]['Biomasses'], Biomasses)
+        assert_same_totals(BASELINE[each_stand]['Rob_Biomasses'], Rob_Biomasses)
+
+def test_names_are_only_kept_when_asked_for(cur, xfactor, queries, quiet):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, 'aa01')
+        without_names = A.compute_biomasses(xfactor)[0]
+        with_names = A.compute_biomasses(xfactor, keep_names=True)[0]
+
+    for each_year in without_names:
+        for each_species in without_names[each_year]:
+            assert 'name_live' not in without_names[each_year][each_species]
+            names = A.tree_names(with_names[each_year][each_species]['name_live'])
+            assert len(names) == len(set(names))
+
+def test_rob_live_jenkins_is_only_from_trees_of_15_cm_or_more(queries, quiet):
+    # a stand whose first plots are detail plots, so each year starts with a plot that has small live trees
+    store = synthetic.Store()
+    synthetic.make_stand(store, random.Random(3), 'xx01', 3, [1980, 1990], ['psme', 'tshe'], detail_plots=('XX010001', 'XX010002'))
+    cur = synthetic.FakeCursor(store)
+
+    with quiet:
+        XFACTOR = poptree_basis.Capture(cur, queries)
+        A = tps_Stand.Stand(cur, XFACTOR, queries, 'xx01')
+        Biomasses, BadTreeRef, Rob_Biomasses = A.compute_biomasses(XFACTOR)
+
+    results = A.tree_results
+    context = A.plot_context(XFACTOR)
+    expected = {}
+    small = 0
+
+    for row in range(len(results)):
+        if not results.live[row] or math.isnan(results.dbh[row]):
+            continue
+
+        if results.dbh[row] < 15.0:
+            small += 1
+            continue
+
+        year = results.get_year(row)
+        plot = results.plot_codes.names[results.plot[row]]
+        species = results.species_codes.names[results.species[row]]
+        key = (year, species)
+        expected[key] = expected.get(key, 0.) + results.jenkins[row]/context[(year, plot)]['area']*context[(year, plot)]['pct']
+
+    # the stand has small live trees, so the rob portion differs from the totals
+    assert small > 0
+
+    for (year, species), value in expected.items():
+        assert math.isclose(Rob_Biomasses[year][species]['total_live_jenkins'], value, rel_tol=1e-12)
+        assert Rob_Biomasses[year][species]['total_live_jenkins'] < Biomasses[year][species]['total_live_jenkins']
+
+def test_the_kept_names_turn_back_into_the_treeids_of_the_stand(cur, xfactor, queries, quiet):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, 'aa01')
+        with_names = A.compute_biomasses(xfactor, keep_names=True)[0]
+
+    for each_year in with_names:
+        for each_species in with_names[each_year]:
+            plots = [x[2] for x in A.table.groups if x[0] == each_year and x[1] == each_species]
+
+            for each_key, each_state in [('name_live', 'live'), ('name_mort', 'dead')]:
+                names = A.tree_names(with_names[each_year][each_species][each_key])
+                treeids = [x for each_plot in plots for x in A.table.rows(each_year, each_species, each_plot, each_state)]
+
+                # the QC compares these to lists of treeids, so they must be treeids and not codes
+                assert all(isinstance(x, str) for x in names)
+                assert sorted(names) == sorted(treeids), (each_year, each_species, each_key)
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import json
+
+import execution_basis
+
+RUN_KEY = ('bio', 'stand', 'composite')
+
+def stream(cur, xfactor, queries, standids, quiet, resume=False, memory_budget=None):
+    """ A streamed --all run the way tps_cli runs it, with its journal; gives the summary and the journal.
+    """
+    journal = execution_basis.RunJournal(execution_basis.STREAMING_RUNS[RUN_KEY], RUN_KEY, standids, resume)
+
+    with quiet:
+        results, write = execution_basis.stream_results(cur, xfactor, queries, standids[journal.next_index:], *RUN_KEY)
+        summary = execution_basis.run_streaming(results, write, memory_budget, journal.next_index, journal)
+
+    journal.close()
+
+    return summary, journal
+
+def read_output():
+    with open(execution_basis.STREAMING_RUNS[RUN_KEY], 'rb') as readfile:
+        return readfile.read()
+
+def test_a_run_over_the_memory_budget_stops_and_resumes_to_the_same_output(cur, xfactor, queries, quiet):
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    assert len(standids) > 2
+
+    stream(cur, xfactor, queries, standids, quiet)
+    whole = read_output()
+
+    # no process fits in 1 MB, so each run stops after its first stand
+    summary, journal = stream(cur, xfactor, queries, standids, quiet, memory_budget=1.)
+    assert [x['standid'] for x in summary] == [standids[0].lower()]
+    assert summary[-1]['over_budget'] == True
+
+    for each_stand in standids[1:]:
+        summary, journal = stream(cur, xfactor, queries, standids, quiet, resume=True, memory_budget=1.)
+        assert [x['standid'] for x in summary] == [each_stand.lower()]
+
+    assert read_output() == whole
+
+    # a budget the run stays under does not stop it
+    summary, journal = stream(cur, xfactor, queries, standids, quiet, memory_budget=1e9)
+    assert [x['standid'] for x in summary] == [x.lower() for x in standids]
+    assert read_output() == whole
+
+def test_a_run_resumes_after_a_journal_cut_off_in_a_line(cur, xfactor, queries, quiet):
+    standids = execution_basis.all_standids(cur, queries, 'stand')
+    assert len(standids) > 3
+
+    summary, journal = stream(cur, xfactor, queries, standids, quiet)
+    whole = read_output()
+
+    with open(journal.filename, 'r') as readfile:
+        lines = readfile.readlines()
+
+    # the run died while recording its third stand, part of the way into the fourth
+    with open(journal.filename, 'w') as writefile:
+        writefile.write("".join(lines[:3]) + lines[3][:len(lines[3])//2])
+
+    end = json.loads(lines[3])['end']
+    with open(execution_basis.STREAMING_RUNS[RUN_KEY], 'wb') as writefile:
+        writefile.write(whole[:end + 10])
+
+    summary, journal = stream(cur, xfactor, queries, standids, quiet, resume=True)
+
+    # the third stand was written but not recorded, so it is done again
+    assert [x['standid'] for x in summary] == [x.lower() for x in standids[2:]]
+    assert read_output() == whole
+
+    with open(journal.filename, 'r') as readfile:
+        entries = [json.loads(x) for x in readfile][1:]
+    assert [x['index'] for x in entries] == list(range(len(standids)))
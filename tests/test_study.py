@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import pytest
+
+import execution_basis
+import tps_Stand
+
+def each_study_output(cur, xfactor, queries, studyids, run_key, filename_out):
+    """ The output of a study run that computes every stand of every study again, the way tps_cli did before stands were shared.
+    """
+    index = 0
+    for each_study in studyids:
+        cur.execute(queries['execution']['list_of_stands_in_studies'].format(studyid=each_study))
+        for each_stand in [str(row[0]) for row in cur]:
+            A = tps_Stand.Stand(cur, xfactor, queries, each_stand.lower())
+            execution_basis.write_result(execution_basis.compute_result(A, xfactor, run_key), xfactor, run_key, filename_out, 'w' if index == 0 else 'a')
+            index += 1
+
+    with open(filename_out, 'rb') as readfile:
+        return readfile.read()
+
+@pytest.mark.parametrize('run_key', [('bio', 'study', 'composite'), ('bio', 'study', 'tree')])
+def test_stands_in_two_studies_are_written_for_each_from_one_computation(store, cur, xfactor, queries, quiet, run_key, monkeypatch, tmp_path):
+    # aa01, the first stand of the run, is also in WS01, and ac03 is also in a third study
+    store.study['WS01'].append('AA01')
+    store.study['ZZ01'] = ['AC03', 'AB02']
+    studyids = sorted(store.study)
+
+    with quiet:
+        expected = each_study_output(cur, xfactor, queries, studyids, run_key, 'each_study.csv')
+
+    # the fan-out files go to a directory of their own here, to see that they are removed
+    temporary = tmp_path / 'temporary'
+    temporary.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(temporary))
+
+    with quiet:
+        saved = execution_basis.run_study(cur, xfactor, queries, studyids, run_key, 'shared.csv')
+
+    with open('shared.csv', 'rb') as readfile:
+        assert readfile.read() == expected
+
+    assert saved['stand_places'] == 7
+    assert saved['distinct_stands'] == 4
+    assert saved['fanned_out'] == 3
+    assert os.listdir(str(temporary)) == []
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import io
+
+import synthetic
+import poptree_basis
+import tps_Stand
+
+def large_stand():
+    store = synthetic.large_stand_store()
+    cur = synthetic.FakeCursor(store)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        XFACTOR = poptree_basis.Capture(cur, synthetic.QUERIES)
+        A = tps_Stand.Stand(cur, XFACTOR, synthetic.QUERIES, 'zz99')
+
+    return A
+
+def test_large_stand_has_the_tree_years_the_numbers_were_measured_on():
+    A = large_stand()
+    assert len(A.table) == 50888
+    assert len(A.table.plot_codes) == 40
+
+def test_table_is_smaller_than_the_nested_view():
+    report = large_stand().table.memory_report()
+    assert report['rows'] == 50888
+    assert report['table_per_row'] < report['nested_per_row']
+
+def test_nested_view_matches_the_table(cur, xfactor, queries, quiet):
+    with quiet:
+        A = tps_Stand.Stand(cur, xfactor, queries, 'aa01')
+
+    nested = A.table.as_nested()
+    rows = 0
+
+    for year in nested:
+        for species in nested[year]:
+            for plot in nested[year][species]:
+                for group in ['live', 'dead']:
+                    for tid, observation in nested[year][species][plot][group].items():
+                        row = A.table.find(year, species, plot, group, tid)
+                        assert observation == A.table.observation(row)
+                        rows += 1
+
+    assert rows == len(A.table)
@@ -7,6 +7,7 @@ import biomass_basis
 import bisect
 import csv
 import tps_Stand
+import table_basis
 
 
 def plot_wrap_compute_NPP(Bios_plot, type):
@@ -80,7 +81,7 @@ def compute_NPP(Stand, Bios, type, breakdown_type):
 
     **RETURNS**
 
-    :NPP_output: NPP at the stand or plot scale
+    :NPP_output: NPP at the stand or plot scale, as an IntervalChange record for each year (and species)
     """
 
     if breakdown_type != 'plot':
@@ -134,15 +135,14 @@ def compute_NPP(Stand, Bios, type, breakdown_type):
                         npp_j = (delta_live_jenkins + Bios[year_begin][each_species]['total_dead_jenkins'])/duration
 
                         if each_year not in NPP_output:
-                            NPP_output[each_year] = {each_species: {'year_begin': year_begin, 'year_end': year_end, 'delta_live_bio': delta_live_bio, 'delta_live_jenkins' : delta_live_jenkins, 'delta_live_volume' : delta_live_volume, 'delta_live_basal' : delta_live_basal, 'delta_live_tph' : delta_live_tph, 'npp_yr' : npp, 'npp_j_yr': npp_j}}
+                            NPP_output[each_year] = {each_species: table_basis.IntervalChange((year_begin, year_end, delta_live_bio, delta_live_jenkins, delta_live_volume, delta_live_basal, delta_live_tph, npp, npp_j))}
                         
                         elif each_year in NPP_output:
                             if each_species not in NPP_output[each_year]:
-                                NPP_output[each_year][each_species] = {'year_begin': year_begin, 'year_end': year_end, 'delta_live_bio': delta_live_bio, 'delta_live_jenkins' : delta_live_jenkins, 'delta_live_volume' : delta_live_volume, 'delta_live_basal' : delta_live_basal, 'delta_live_tph' : delta_live_tph, 'npp_yr' : npp, 'npp_j_yr': npp_j}
+                                NPP_output[each_year][each_species] = table_basis.IntervalChange((year_begin, year_end, delta_live_bio, delta_live_jenkins, delta_live_volume, delta_live_basal, delta_live_tph, npp, npp_j))
                             
                             elif each_species in NPP_output[each_year]:
-                                print("this species has already been included for this year, please debug")
-                                import pdb; pdb.set_trace()
+                                poptree_basis.debug_here("this species has already been included for this year, please debug", {breakdown_type: getattr(Stand, 'standid', Stand), 'year': each_year, 'species': each_species})
 
                 else:
                     pass
@@ -163,13 +163,12 @@ def compute_NPP(Stand, Bios, type, breakdown_type):
                         npp_j = delta_live_jenkins/duration
 
                         if each_year not in NPP_output:
-                            NPP_output[each_year] = {each_species: {'year_begin': year_begin, 'year_end': year_end, 'delta_live_bio': delta_live_bio, 'delta_live_jenkins' : delta_live_jenkins, 'delta_live_volume' : delta_live_volume, 'delta_live_basal' : delta_live_basal, 'delta_live_tph' : delta_live_tph, 'npp_yr' : npp, 'npp_j_yr': npp_j}}
+                            NPP_output[each_year] = {each_species: table_basis.IntervalChange((year_begin, year_end, delta_live_bio, delta_live_jenkins, delta_live_volume, delta_live_basal, delta_live_tph, npp, npp_j))}
                         elif each_year in NPP_output:
                             if each_species not in NPP_output[each_year]:
-                                NPP_output[each_year][each_species] = {'year_begin': year_begin, 'year_end': year_end, 'delta_live_bio': delta_live_bio, 'delta_live_jenkins' : delta_live_jenkins, 'delta_live_volume' : delta_live_volume, 'delta_live_basal' : delta_live_basal, 'delta_live_tph' : delta_live_tph, 'npp_yr' : npp, 'npp_j_yr': npp_j}
+                                NPP_output[each_year][each_species] = table_basis.IntervalChange((year_begin, year_end, delta_live_bio, delta_live_jenkins, delta_live_volume, delta_live_basal, delta_live_tph, npp, npp_j))
                             elif each_species in NPP_output[each_year]:
-                                print("this species has already been included for this year, please debug")
-                                import pdb; pdb.set_trace()
+                                poptree_basis.debug_here("this species has already been included for this year, please debug", {breakdown_type: getattr(Stand, 'standid', Stand), 'year': each_year, 'species': each_species})
 
                 else:
                     pass
@@ -204,13 +203,12 @@ def compute_NPP(Stand, Bios, type, breakdown_type):
                         npp_j = (delta_live_jenkins + npp_from_mort_j)/duration
 
                         if each_year not in NPP_output:
-                            NPP_output[each_year] = {each_species: {'year_begin': year_begin, 'year_end': year_end, 'delta_live_bio': delta_live_bio, 'delta_live_jenkins' : delta_live_jenkins, 'delta_live_volume' : delta_live_volume, 'delta_live_basal' : delta_live_basal, 'delta_live_tph' : delta_live_tph, 'npp_yr' : npp, 'npp_j_yr': npp_j}}
+                            NPP_output[each_year] = {each_species: table_basis.IntervalChange((year_begin, year_end, delta_live_bio, delta_live_jenkins, delta_live_volume, delta_live_basal, delta_live_tph, npp, npp_j))}
                         elif each_year in NPP_output:
                             if each_species not in NPP_output[each_year]:
-                                NPP_output[each_year][each_species] = {'year_begin': year_begin, 'year_end': year_end, 'delta_live_bio': delta_live_bio, 'delta_live_jenkins' : delta_live_jenkins, 'delta_live_volume' : delta_live_volume, 'delta_live_basal' : delta_live_basal, 'delta_live_tph' : delta_live_tph, 'npp_yr' : npp, 'npp_j_yr': npp_j}
+                                NPP_output[each_year][each_species] = table_basis.IntervalChange((year_begin, year_end, delta_live_bio, delta_live_jenkins, delta_live_volume, delta_live_basal, delta_live_tph, npp, npp_j))
                             elif each_species in NPP_output[each_year]:
-                                print("this species has already been included, please debug")
-                                import pdb; pdb.set_trace()
+                                poptree_basis.debug_here("this species has already been included, please debug", {breakdown_type: getattr(Stand, 'standid', Stand), 'year': each_year, 'species': each_species})
                 else:
                     pass
 
@@ -229,11 +227,10 @@ def compute_NPP(Stand, Bios, type, breakdown_type):
                 npp_j = (delta_live_jenkins + Bios[year_begin]['total_dead_jenkins']/duration)
 
                 if each_year not in NPP_output:
-                    NPP_output[each_year] = {'year_begin': year_begin, 'year_end': year_end, 'delta_live_bio': delta_live_bio, 'delta_live_jenkins' : delta_live_jenkins, 'delta_live_volume' : delta_live_volume, 'delta_live_basal' : delta_live_basal, 'delta_live_tph' : delta_live_tph, 'npp_yr' : npp, 'npp_j_yr' : npp_j}
+                    NPP_output[each_year] = table_basis.IntervalChange((year_begin, year_end, delta_live_bio, delta_live_jenkins, delta_live_volume, delta_live_basal, delta_live_tph, npp, npp_j))
                 
                 elif each_year in NPP_output:
-                    print("the year is already in the NPP output for this stand, please debug")
-                    import pdb; pdb.set_trace()
+                    poptree_basis.debug_here("the year is already in the NPP output for this stand, please debug", {breakdown_type: getattr(Stand, 'standid', Stand), 'year': each_year})
 
 
     return NPP_output
@@ -280,7 +277,7 @@ def write_NPP_composite_stand(Stand, BM, BMA, *args):
                 writer.writerow(new_row_1)
             
             except Exception:
-                import pdb; pdb.set_trace()
+                poptree_basis.debug_here("the NPP of all the species could not be written", {'standid': Stand.standid, 'year': each_year})
 
             for each_species in npp_out[each_year].keys():
 
@@ -331,7 +328,7 @@ def write_NPP_composite_plot(Plot, BM_plot, BMA_plot, *args):
                     writer.writerow(new_row_1)
             
                 except Exception:
-                    import pdb; pdb.set_trace()
+                    poptree_basis.debug_here("the NPP of all the species could not be written", {'standid': Plot.Stand.standid, 'plot': each_plot, 'year': each_year})
 
                 # the years should be the same but go over the species one anger another here
                 for each_species in npp_out[each_plot][each_year].keys():
@@ -7,6 +7,206 @@ import biomass_basis
 import bisect
 import csv
 import os
+import array
+import atexit
+import multiprocessing
+import pickle
+import table_basis
+
+# the metrics added up for each bucket of trees in Stand.group_tree_results(), in order; each bucket also ends with an array of the codes of its treeids
+BUCKET_METRICS = ['trees', 'bio', 'volume', 'jenkins', 'basal']
+EMPTY_BUCKET = (0, 0., 0., 0., 0., ())
+
+# the dbh ( cm ) cutoffs of the portions computed alongside the stand totals when none are asked for; 15 cm is the "rob" portion
+THRESHOLDS = [15.0]
+
+# the number of processes the plots of one stand are split over when its trees are computed and grouped (see Stand.grouped_results()); 1 computes them on this process. tps_cli sets this with --plot-workers
+PLOT_WORKERS = 1
+
+# the Capture object that plot_chunk_worker() reads, set just before the workers are forked
+CHUNK_STAND = {}
+
+# the pool of plot workers, forked for the first stand that is split and kept for the rest of the run (see chunk_pool())
+CHUNK_POOL = {}
+
+# stands on a worker process are not split again; this is warned about once
+DAEMON_WARNING = []
+
+# the totals added up over all the species by Stand.aggregate_biomasses() and Plot.aggregate_biomasses_plot(), in order
+TOTAL_METRICS = ['total_live_trees', 'total_dead_trees', 'total_ingrowth_trees', 'total_live_basal', 'total_dead_basal', 'total_ingrowth_basal', 'total_live_bio', 'total_dead_bio', 'total_ingrowth_bio', 'total_live_volume', 'total_dead_volume', 'total_ingrowth_volume', 'total_live_jenkins', 'total_dead_jenkins', 'total_ingrowth_jenkins']
+
+def replacement_years(decent_years, additions_years, mortality_years):
+    """ Find the remeasurement year that each additions year and each mortality year is rolled to, by a sorted search over the decent (E or R) years of a stand.
+
+    Additions roll back to the same or prior decent year; an additions year before the first decent year rolls forward to the first decent year. Mortalities roll forward to the next decent year; mortality years after the last decent year are left out.
+
+    **INPUTS**
+
+    :decent_years: a sorted list of the stand's remeasurement years
+    :additions_years: the years of additions on the stand
+    :mortality_years: the years of mortality surveys on the stand
+
+    **RETURNS**
+
+    :add_map: a dictionary of additions year to replacement year
+    :mort_map: a dictionary of mortality year to replacement year; both are empty if there are no decent years
+    """
+    add_map = {}
+    mort_map = {}
+
+    if decent_years == []:
+        return add_map, mort_map
+
+    for each_year in additions_years:
+        # bisect left marks the left token, so step back one unless the year is itself a remeasurement
+        index = bisect.bisect_left(decent_years, each_year)
+        if index == len(decent_years) or decent_years[index] != each_year:
+            index = index - 1
+
+        # an additions year before the first remeasurement goes to the first remeasurement
+        if index < 0:
+            index = 0
+        add_map[each_year] = decent_years[index]
+
+    for each_year in mortality_years:
+        index = bisect.bisect_right(decent_years, each_year)
+        if index < len(decent_years):
+            mort_map[each_year] = decent_years[index]
+        else:
+            pass
+
+    return add_map, mort_map
+
+def stand_replacements(standid, decent_years, additions, mortalities):
+    """ The replacement year and plots of each additions year and each mortality year of a stand, as Stands keep them in `replacements` and `mort_replacements`.
+
+    **INPUTS**
+
+    :standid: the standid
+    :decent_years: a sorted list of the stand's remeasurement years
+    :additions: a dictionary of the stand's additions years to their plots, as in `Capture.additions[standid]`
+    :mortalities: a dictionary of the stand's mortality years to their plots, as in `Capture.mortalities[standid]`
+
+    **RETURNS**
+
+    :replacements: a dictionary of additions year to `{'replacement_year': year, 'plots': [plotids]}`
+    :mort_replacements: the same for mortality years; mortality years after the last remeasurement are not in it. Both are empty if the stand has no remeasurements, so its rows keep their years.
+    """
+    if decent_years == [] and (additions != {} or mortalities != {}):
+        print("there are no remeasurement years on " + str(standid) + " to roll its additions and mortalities to; its trees keep their years")
+
+    add_map, mort_map = replacement_years(decent_years, sorted(additions.keys()), sorted(mortalities.keys()))
+
+    replacements = {each_year: {'replacement_year': replacement_year, 'plots': additions[each_year]} for each_year, replacement_year in add_map.items()}
+    mort_replacements = {each_year: {'replacement_year': replacement_year, 'plots': mortalities[each_year]} for each_year, replacement_year in mort_map.items()}
+
+    return replacements, mort_replacements
+
+def remap_year_column(standids, years, plots, dead, replacements, mort_replacements):
+    """ Roll the years of a column of tree rows to their remeasurement years, for one stand or many at once.
+
+    The replacement years are found once per stand and year (see ``stand_replacements``), and turned into a lookup of (standid, year, plotid) to the year to roll to. The whole column is then rolled in one step, by looking up every row at once; rows not in the lookup keep their year. Additions are applied to every row first; mortalities are then applied to the dead rows, from their already rolled year.
+
+    **INPUTS**
+
+    :standids: the standid of each row
+    :years: the year of each row, or None
+    :plots: the plotid of each row
+    :dead: a bytearray with 1 where the row is a dead tree
+    :replacements: a dictionary of standid to its additions replacements, as in `Stand.replacements`
+    :mort_replacements: a dictionary of standid to its mortality replacements, as in `Stand.mort_replacements`
+
+    **RETURNS**
+
+    :new_years: a list of the rolled year of each row
+
+    .. Example:
+
+    >>> replacements, mort_replacements = {}, {}
+    >>> for each_stand in standids_of_the_run:
+    >>>     replacements[each_stand], mort_replacements[each_stand] = tps_Stand.stand_replacements(each_stand, decent_years[each_stand], XFACTOR.additions.get(each_stand, {}), XFACTOR.mortalities.get(each_stand, {}))
+    >>> new_years = tps_Stand.remap_year_column(standids, years, plots, dead, replacements, mort_replacements)
+    """
+    add_lookup = {}
+    mort_lookup = {}
+
+    for standid, stand_replacements in replacements.items():
+        for each_year, replacement in stand_replacements.items():
+            for plotid in replacement['plots']:
+                add_lookup[(standid, each_year, plotid)] = replacement['replacement_year']
+
+    # only dead rows are rolled by mortality, so their key carries the dead flag
+    for standid, stand_replacements in mort_replacements.items():
+        for each_year, replacement in stand_replacements.items():
+            for plotid in replacement['plots']:
+                mort_lookup[(standid, each_year, plotid, 1)] = replacement['replacement_year']
+
+    new_years = list(years)
+
+    if add_lookup:
+        new_years = list(map(add_lookup.get, zip(standids, new_years, plots), new_years))
+
+    if mort_lookup:
+        new_years = list(map(mort_lookup.get, zip(standids, new_years, plots, dead), new_years))
+
+    return new_years
+
+def init_chunk_worker():
+    """ Start a worker of ``Stand.group_in_chunks``. The workers only compute trees that are sent to them, so the Capture object they are forked with is detached from the connection of the process that forked them (see ``poptree_basis.detach_connection``).
+    """
+    poptree_basis.detach_connection(CHUNK_STAND['XFACTOR'])
+
+def plot_chunk_worker(task):
+    """ Compute one chunk of plots of a Stand, in a worker process; see ``Stand.plot_chunk_results``.
+
+    **INPUTS**
+
+    :task: a tuple of `(pickled Stand, plot codes, thresholds)`
+    """
+    pickled_stand, plot_codes, thresholds = task
+    return pickle.loads(pickled_stand).plot_chunk_results(CHUNK_STAND['XFACTOR'], plot_codes, thresholds)
+
+def chunk_pool(XFACTOR, workers):
+    """ The pool of worker processes that the plots of each stand are split over. It is forked the first time it is needed, with the Capture object, and kept for the rest of the run, so a run of many stands forks its plot workers once. A new pool is forked if the number of workers or the Capture object changes.
+
+    **INPUTS**
+
+    :XFACTOR: a Capture object, shared with the workers when they are forked
+    :workers: the number of worker processes
+
+    **RETURNS**
+
+    A multiprocessing pool. A ValueError is raised where processes can not be forked.
+    """
+    # a pool forked by another process can not be used from this one
+    if CHUNK_POOL != {} and CHUNK_POOL['pid'] != os.getpid():
+        CHUNK_POOL.clear()
+
+    if CHUNK_POOL != {} and (CHUNK_POOL['workers'] != workers or CHUNK_POOL['XFACTOR'] is not XFACTOR):
+        close_chunk_pool()
+
+    if CHUNK_POOL == {}:
+        context = multiprocessing.get_context('fork')
+
+        CHUNK_STAND['XFACTOR'] = XFACTOR
+        CHUNK_POOL['pool'] = context.Pool(workers, initializer=init_chunk_worker)
+        CHUNK_POOL['workers'] = workers
+        CHUNK_POOL['XFACTOR'] = XFACTOR
+        CHUNK_POOL['pid'] = os.getpid()
+
+    return CHUNK_POOL['pool']
+
+def close_chunk_pool():
+    """ Let the plot workers of the run finish and stop them. This is done when the program exits, if it was not done before.
+    """
+    if CHUNK_POOL != {} and CHUNK_POOL['pid'] == os.getpid():
+        CHUNK_POOL['pool'].close()
+        CHUNK_POOL['pool'].join()
+
+    CHUNK_POOL.clear()
+    CHUNK_STAND.clear()
+
+atexit.register(close_chunk_pool)
 
 class Stand(object):
     """Stands contain several plots, grouped by year and species. Stand produce outputs of biomass ( Mg/ha ), volume (m\ :sup:`3`), Jenkins biomass ( Mg/ha ), TPH (number of trees/ ha), and basal area (m\ :sup:`2` / ha).
@@ -18,11 +218,13 @@ class Stand(object):
     >>> A.tree_list = "SELECT fsdbdata.dbo.tp00101.treeid, fsdbdata.dbo.tp00101.species..."
     >>> A.species_list = ""SELECT DISTINCT(fsdbdata.dbo.tp00101.species) from ..."
     >>> A.eqn_query = "SELECT SPECIES, EQNSET, FORM, H1, H2, H3, B1 ..."
-    >>> A.eqns = {'abam': {'normal': <function Stand.select_eqns.<locals>.<lambda> at 0x1007d9730>}..."
+    >>> A.eqns = {'abam': {'normal': Equation(form='lnln', woodden=0.4, ...)}..."
     >>> A.od[1985]['abam'][4]['dead']
     >>> [('av06000400017', None, '6', '1985')]
     >>> A.od.keys()
     >>> dict_keys([1985, 1987, 1988, 2007, 1993, 1978, 1981, 1998, 1983])
+    >>> A.table.rows(1985, 'abam', 'av060004', 'dead')
+    >>> {'av06000400017': 12}
 
     **INPUTS**
 
@@ -48,7 +250,9 @@ class Stand(object):
         self.replacement_query = queries['stand']['query_replacements']
         self.numplot_query = queries['plot']['query_plot']
         self.eqns = {}
-        self.od = {}
+        self.equations = XFACTOR.equations
+        self.table = table_basis.TreeStateTable()
+        self.live_measurements = table_basis.MeasurementIndex()
         self.woodden_dict ={}
         self.proxy_dict = {}
         self.component_dict = {}
@@ -60,6 +264,11 @@ class Stand(object):
         self.additions = {}
         self.replacements = {}
         self.num_plots = {}
+        self.eqn_fallbacks = {}
+        self._results_version = None
+        self._grouped = None
+        self._bad = None
+        self._context = None
 
         # get the total area for the stand - this dictionary is for the years when there is an actual inventory and not a mortality check
         self.get_total_area(XFACTOR)
@@ -130,8 +339,9 @@ class Stand(object):
         :list_species: a list of the species on that stand in any year, used to query the database for distinct species
         :self.woodden_dict: a dictionary of wood densities by species
         :self.proxy_dict: a dictionary of equation proxies, by species
-        :self.eqns: a dictionary of eqns keyed by 'normal', 'big', or 'component' containing lambda functions to receive dbh (in cm) inputs and compute Biomass ( Mg ), Volume (m\ :sup:`3`), Jenkins' Biomass ( Mg ), and wood density.
+        :self.eqns: a dictionary of eqns keyed by 'normal', 'big', or 'component' containing ``biomass_basis.Equation`` objects to receive dbh (in cm) inputs and compute Biomass ( Mg ), Volume (m\ :sup:`3`), Jenkins' Biomass ( Mg ), and wood density.
 
+        If XFACTOR has the equations of every species compiled already (see ``Capture.load_equations``), they are used instead of querying TP00110 for each species.
         """
         list_species = []
 
@@ -140,103 +350,32 @@ class Stand(object):
         for row in self.cur:
             list_species.append(str(row[0]).strip().lower())
 
-        for each_species in list_species:
-
-            sql2 = self.eqn_query.format(species=each_species)
-            self.cur.execute(sql2)
-
-            for row in self.cur:
-                #print(row)
-                form = str(row[2]).strip().lower()
-
-                try:
-                    woodden = round(float(str(row[11])), 3)
-                except:
-                    woodden = None
-
-                if each_species not in self.woodden_dict:
-                    self.woodden_dict[each_species] = woodden
-                else:
-                    pass
-
-                try:
-                    proxy = str(row[12]).strip().lower()
-                except Exception:
-                    proxy = "None"
-
-                if each_species not in self.proxy_dict:
-                    self.proxy_dict[each_species] = proxy
-                else:
-                    pass
-
-                try:
-                    component = str(row[13]).strip().lower()
-                except Exception:
-                    component = "None"
-
-                if each_species not in self.component_dict:
-                    self.component_dict[each_species] = component
-                else:
-                    pass
-
-                try:
-                    h1 = round(float(str(row[3])), 11)
-                except:
-                    h1 = None
-                try:
-                    h2 = round(float(str(row[4])), 11)
-                except:
-                    h2 = None
-                try:
-                    h3 = round(float(str(row[5])), 11)
-                except:
-                    h3 = None
-                try:
-                    b1 = round(float(str(row[6])), 11)
-                except:
-                    b1 = None
-                try:
-                    b2 = round(float(str(row[7])), 11)
-                except:
-                    b2 = None
-                try:
-                    b3 = round(float(str(row[8])), 11)
-                except:
-                    b3 = None
-                try:
-                    j1 = round(float(str(row[9])), 11)
-                except:
-                    j1 = None
-                try:
-                    j2 = round(float(str(row[10])), 11)
-                except:
-                    j2 = None
+        # the equations of every species may already be compiled on XFACTOR, for instance when stands are run on worker processes
+        if self.equations != None:
+            eqns, woodden_dict, proxy_dict, component_dict = self.equations
 
+        else:
+            rows = []
 
-                if each_species not in sorted(list(self.eqns.keys())) and each_species != 'segi':
-                    form_type = form
-                    self.eqns[each_species] = {str(row[1]).rstrip().lower() : lambda x, b1=b1, b2=b2, b3=b3, j1=j1, j2=j2, h1=h1, h2=h2, h3=h3, form_type = form_type, woodden= woodden: biomass_basis.which_fx(form_type)(woodden, x, b1, b2, b3, j1, j2, h1, h2, h3)}
-                    #this_eqn = lambda x=row : biomass_basis.which_fx(form)(woodden, x, b1, b2, b3, j1, j2, h1, h2, h3)
+            for each_species in list_species:
 
+                sql2 = self.eqn_query.format(species=each_species)
+                self.cur.execute(sql2)
 
-                elif each_species not in sorted(list(self.eqns.keys())) and each_species == 'segi':
-                    form_type = 'segi_biopak'
-                    self.eqns[each_species] = {str(row[1]).rstrip().lower() : lambda x, b1=b1, b2=b2, b3=b3, j1=j1, j2=j2, h1=h1, h2=h2, h3=h3, form_type = form_type, woodden = woodden: biomass_basis.which_fx(form_type)(woodden, x, b1, b2, b3, j1, j2, h1, h2, h3)}
+                rows += [(each_species,) + tuple(row[1:]) for row in self.cur]
 
+            eqns, woodden_dict, proxy_dict, component_dict = biomass_basis.compile_equations(rows)
 
-                elif each_species in sorted(list(self.eqns.keys())) and each_species != 'segi':
-                    if str(row[1]).rstrip().lower() not in sorted(list(self.eqns[each_species].keys())):
-                        form_type = form
-                        self.eqns[each_species][str(row[1]).rstrip().lower()] = lambda x, b1=b1, b2=b2, b3=b3, j1=j1, j2=j2, h1=h1, h2=h2, h3=h3, form_type=form_type, woodden=woodden: biomass_basis.which_fx(form_type)(woodden, x, b1, b2, b3, j1, j2, h1, h2, h3)
-                    else:
-                        pass
+        for each_species in list_species:
 
-                elif each_species in sorted(list(self.eqns.keys())) and each_species =='segi':
-                    form_type = 'segi_biopak'
-                    if str(row[1]).rstrip().lower() not in sorted(list(self.eqns[each_species].keys())):
-                        self.eqns[each_species] = {str(row[1]).rstrip().lower() : lambda x, b1=b1, b2=b2, b3=b3, j1=j1, j2=j2, h1=h1, h2=h2, h3=h3, form_type = form_type, woodden = woodden: biomass_basis.which_fx(form_type)(woodden, x, b1, b2, b3, j1, j2, h1, h2, h3)}
-                    else:
-                        pass
+            if each_species in eqns:
+                self.eqns[each_species] = dict(eqns[each_species])
+            if each_species in woodden_dict:
+                self.woodden_dict[each_species] = woodden_dict[each_species]
+            if each_species in proxy_dict:
+                self.proxy_dict[each_species] = proxy_dict[each_species]
+            if each_species in component_dict:
+                self.component_dict[each_species] = component_dict[each_species]
 
 
     def check_additions_and_mort(self, XFACTOR):
@@ -287,46 +426,31 @@ class Stand(object):
 
         self.decent_years = sorted(decent_years)
 
-        # each additions year is replaced by a correct year from the table and the replacements table is updated.
-        if additions_years != []:
-            for each_year in additions_years:
-
-                try:
-                    if each_year not in self.decent_years:
-                        # bisect left marks the left token in case you are checking for a value already in the list so subtract 1.
-                        index = bisect.bisect_left(self.decent_years, each_year)-1
-                    elif each_year in self.decent_years:
-                        index = bisect.bisect_left(self.decent_years, each_year)
+        # if all the mortality years happen AFTER the last year of remeasurements, then purge the system of self.mortalities and also purge mortality_years
+        if mortality_years != [] and self.decent_years != [] and mortality_years[0] > self.decent_years[-1]:
+            self.mortalities = {}
+            mortality_years = []
 
-                    replacement_year = self.decent_years[index]
-                    plots_applied_to = XFACTOR.additions[self.standid][each_year]
-                    self.replacements.update({each_year:{'replacement_year': replacement_year, 'plots': plots_applied_to}})
+        # each additions and mortality year is replaced by a correct year from the table in one search; mortality years after the last remeasurement have no replacement and are not in mort_replacements
+        replacements, mort_replacements = stand_replacements(self.standid, self.decent_years, self.additions, self.mortalities)
+        self.replacements.update(replacements)
+        self.mort_replacements.update(mort_replacements)
 
-                except Exception:
-                    print("exception thrown while trying to list replacement years")
-                    import pdb; pdb.set_trace()
-        else:
-            pass
+    def remap_years(self, years, plots, dead):
+        """ Roll a column of this stand's tree years to their remeasurement years, using the additions and mortalities found in check_additions_and_mort().
 
-        # each mortality year is replaced by a correct year from the table and the mort_replacements plots are given
-        if mortality_years != []:
+        **INPUTS**
 
-            # if all the mortality years happen AFTER the last year of remeasurements, then purge the system of self.mortalities and also purge mortality_years
-            if sorted(mortality_years)[0] > self.decent_years[-1]:
-                self.mortalities = {}
-                mortality_years = []
+        :years: the year of each row
+        :plots: the plotid of each row
+        :dead: a bytearray with 1 where the row is a dead tree
 
-            for each_year in mortality_years:
-                try:
-                    index = bisect.bisect_right(self.decent_years, each_year)
-                    replacement_year = self.decent_years[index]
-                    plots_applied_to = XFACTOR.mortalities[self.standid][each_year]
-                    self.mort_replacements.update({each_year:{'replacement_year': replacement_year, 'plots': plots_applied_to}})
+        **RETURNS**
 
-                except Exception:
-                    if each_year > self.decent_years[-1]:
-                        pass
-                    #import pdb; pdb.set_trace()
+        :new_years: the rolled year of each row
+        """
+        standids = [self.standid] * len(years)
+        return remap_year_column(standids, years, plots, dead, {self.standid: self.replacements}, {self.standid: self.mort_replacements})
 
 
     def get_total_area(self, XFACTOR):
@@ -371,6 +495,7 @@ class Stand(object):
         """
         self.cur.execute(self.tree_list.format(standid=self.standid))
 
+        rows = []
         for row in self.cur:
             try:
                 year = int(row[6])
@@ -411,34 +536,15 @@ class Stand(object):
             except Exception:
                 dbh_code = None
 
-            # create variable for the 'old year' - hold it outside of changes - atomic/immutable! :)
-            old_year = year
-
-            # if the additions are not blank...
-            if self.additions != {}:
-
-                # if the tree is in an additions year, roll it back to where it belongs
-                if year in self.additions.keys() and plotid in self.additions[year]:
-                    new_year = self.replacements[year]['replacement_year']
-                    year = new_year
-                else:
-                    pass
-            else:
-                pass
+            rows.append((year, plotid, species, dbh, status, tid, dbh_code))
 
-            # if the tree is dead we need to get its dbh from elsewhere
-            if self.mortalities != {} and status == "6":
+        # roll the whole year column at once: additions go back to the prior remeasurement, trees dead in a mortality year go forward to the next one
+        old_years = [row[0] for row in rows]
+        plots = [row[1] for row in rows]
+        dead = bytearray([row[4] == "6" for row in rows])
+        new_years = self.remap_years(old_years, plots, dead)
 
-                # if the tree is dead and is in a mortality year, go ahead and roll it forward.
-                if year in self.mortalities.keys() and plotid in self.mortalities[year]:
-                    try:
-                        new_year = self.mort_replacements[year]['replacement_year']
-                        year = new_year
-                    except Exception:
-                        #print("the mortality check in " + str(year) + " follows the last remeasurement, and has not yet been included in the data")
-                        pass
-                else:
-                    pass
+        for (old_year, plotid, species, dbh, status, tid, dbh_code), year in zip(rows, new_years):
 
             # if the tree is missing we'll add it to the missing table. Then, after we've loaded in all the regular trees, we'll update the live table with a replicate of the last tree that was not missing with the same id, but in this new year.
             if status in ["9"]:
@@ -456,58 +562,26 @@ class Stand(object):
             else:
                 pass
 
-            if year not in self.od and status in ["6"]:
-                self.od[year]={species:{plotid: {'live': {}, 'ingrowth': {}, 'dead': {tid: (dbh, status, dbh_code, old_year)}}}}
-
-            elif year not in self.od and status not in ["6"]:
-                self.od[year]={species: {plotid: {'live': {tid: (dbh, status, dbh_code, old_year)}, 'ingrowth': {}, 'dead': {}}}}
-
-                if status == "2":
-                    self.od[year][species][plotid]['ingrowth'].update({tid: (dbh, status, dbh_code, old_year)})
+            # trees dead in TP00102 only start a plot in the table; their dbh comes from TP00103 in get_all_dead_trees()
+            if status in ["6"]:
+                if not self.table.has_plot(year, species, plotid):
+                    self.table.put(year, species, plotid, tid, dbh, status, dbh_code, old_year, 'dead')
                 else:
                     pass
 
-            elif year in self.od:
-
-                if species not in self.od[year] and status in ["6"]:
-                    self.od[year][species] ={plotid: {'live': {}, 'ingrowth': {}, 'dead': {tid: (dbh, status, dbh_code, old_year)}}}
-
-                elif species not in self.od[year] and status not in ["6"]:
-                    self.od[year][species] ={plotid: {'live': {tid: (dbh, status, dbh_code, old_year)}, 'ingrowth': {}, 'dead': {}}}
-
-                    if status == "2":
-                        self.od[year][species][plotid]['ingrowth'].update({tid: (dbh, status, dbh_code, old_year)})
-                    else:
-                        pass
-
-                elif species in self.od[year]:
-
-                    if status in ["6"] and plotid not in self.od[year][species]:
-                        self.od[year][species][plotid] = {'dead': {tid: (dbh, status, dbh_code, old_year)}, 'live': {}, 'ingrowth': {}}
-
-                    elif status not in ["6"] and plotid not in self.od[year][species]:
-                        self.od[year][species][plotid] = {'live': {tid: (dbh, status, dbh_code, old_year)}, 'dead': {}, 'ingrowth': {}}
-
-                        if status == "2":
-                            self.od[year][species][plotid]['ingrowth'].update({tid: (dbh, status, dbh_code, old_year)})
-                        else:
-                            pass
-
-                    elif status not in ["6"] and plotid in self.od[year][species]:
-
-                        self.od[year][species][plotid]['live'].update({tid: (dbh, status, dbh_code, old_year)})
-
-                        if status == "2":
-                            self.od[year][species][plotid]['ingrowth'].update({tid: (dbh, status, dbh_code, old_year)})
-                        else:
-                            pass
+            # live trees include ingrowth and missing trees, which the table marks with its masks
+            else:
+                self.table.put(year, species, plotid, tid, dbh, status, dbh_code, old_year, 'live')
 
-                    elif status in ["6"] and plotid in self.od[year][species][plotid]['dead']:
-                        self.od[year][species][plotid]['dead'].update({tid: (dbh, status, dbh_code, old_year)})
+                # remember each live measurement of the tree, for filling in its missing years
+                if status not in ["9"] and dbh != None and year != None:
+                    self.live_measurements.add(tid, year, dbh)
+                else:
+                    pass
 
 
     def get_all_dead_trees(self):
-        """ Gets all the dead trees from TP00103. Updates self.od, which was made in get_all_live_trees().
+        """ Gets all the dead trees from TP00103. Updates self.table, which was started in get_all_live_trees().
 
         **INPUTS**
 
@@ -520,6 +594,7 @@ class Stand(object):
 
         self.cur.execute(self.tree_list_m.format(standid=self.standid))
 
+        rows = []
         for row in self.cur:
             try:
                 year = int(row[5])
@@ -541,50 +616,29 @@ class Stand(object):
                 dbh = round(float(row[4]), 3)
             except Exception:
                 dbh = None
-                import pdb; pdb.set_trace()
-
-            # all status are 6
-            status = "6"
+                poptree_basis.debug_here("the dbh of a dead tree can not be read", {'standid': self.standid, 'treeid': str(row[0]).strip().lower(), 'year': row[5], 'dbh': str(row[4])})
 
             try:
                 tid = str(row[0]).strip().lower()
             except Exception:
                 tid = "None"
 
-            dbh_code = "M"
-
-            old_year = year
-
-            if self.mortalities != {}:
-
-                # if the tree is in a mortality year, go ahead and roll it forward to the next real inventory
-                if year in self.mortalities.keys() and plotid in self.mortalities[year]:
-
-                    try:
-                        new_year = self.mort_replacements[year]['replacement_year']
-                        year = new_year
-                    except Exception:
-                        pass
-                else:
-                    pass
-
-
-            if year not in self.od:
-                self.od[year] = {species: {plotid: {'live': {}, 'ingrowth': {}, 'dead': {tid: (dbh, status, dbh_code, old_year)}}}}
+            rows.append((year, plotid, species, dbh, tid))
 
-            elif year in self.od:
-                if species not in self.od[year]:
-                    self.od[year][species] ={plotid: {'live': {}, 'ingrowth': {}, 'dead': {tid: ( dbh, status, dbh_code, old_year)}}}
+        # all the rows are dead, so trees in a mortality year roll forward to the next real inventory
+        old_years = [row[0] for row in rows]
+        plots = [row[1] for row in rows]
+        new_years = self.remap_years(old_years, plots, bytearray([1]) * len(rows))
 
-                elif species in self.od[year]:
-                    if plotid not in self.od[year][species]:
-                        self.od[year][species][plotid] = {'dead': {tid: (dbh, status, dbh_code, old_year)}, 'live': {}, 'ingrowth': {}}
+        # all status are 6
+        status = "6"
+        dbh_code = "M"
 
-                    elif plotid in self.od[year][species]:
-                        self.od[year][species][plotid]['dead'].update({tid: (dbh, status, dbh_code, old_year)})
+        for (old_year, plotid, species, dbh, tid), year in zip(rows, new_years):
+            self.table.put(year, species, plotid, tid, dbh, status, dbh_code, old_year, 'dead')
 
     def update_all_missing_trees(self):
-        """ Get the missing trees from self.missing and try to match each to a tree in the main dictionary that is alive in the preceding year from self.decent_years, and then return a copy of that tree to the year it is missing, so we can compute its biomass. Trees were assigned here when pulled in from live. Because all trees are there now, we can roll the dbh from the appropriate last good measurement into this new year. The assumption is that all trees not known dead are considered alive.
+        """ Get the missing trees from self.missing and match each to the last live measurement of the same tree before the year it is missing, then return a copy of that tree to the year it is missing, so we can compute its biomass. The live measurements of every tree were indexed in self.live_measurements when they were loaded, so the dbh from the last known good measurement is found with one binary search, however many years the tree has been missing. The assumption is that all trees not known dead are considered alive.
 
         **INPUTS**
 
@@ -592,362 +646,896 @@ class Stand(object):
 
         **RETURNS**
 
-        This function updates the missing trees so that they are viewed as alive and with a dbh. It is actually fairly hard to manage as many trees have been missing for a good long time. If a tree ID can't be found, check it through ``tps_Tree`` and if it has many `9` status, you'll want to modify this script to help you catch those statuses and replace them.
+        This function updates the missing trees so that they are viewed as alive and with a dbh; the year the dbh was measured is kept as the raw year. If a tree ID has no live measurement before it went missing, a message is printed; check it through ``tps_Tree``.
 
         """
 
         for each_year in self.missings:
-
-            replacement_year_index = bisect.bisect_left(self.decent_years, each_year) - 1
-            replacement_year = self.decent_years[replacement_year_index]
-
             for each_species in self.missings[each_year].keys():
                 for each_plot in self.missings[each_year][each_species].keys():
 
                     for each_treeid in self.missings[each_year][each_species][each_plot]:
 
-                        try:
-                            replacement_tree_dbh = self.od[replacement_year][each_species][each_plot]['live'][each_treeid][0]
-                        except Exception:
-                            try:
-                                # if it has been missing for more than 1 year
-                                replacement_year = self.decent_years[replacement_year_index-1]
-                                replacement_tree_dbh = self.od[replacement_year][each_species][each_plot]['live'][each_treeid][0]
-                            except Exception:
-                                try:
-                                    # one more year back
-                                    replacement_year_index = bisect.bisect_left(self.decent_years, each_year) - 2
-                                    replacement_year = self.decent_years[replacement_year_index]
-                                    replacement_tree_dbh = self.od[replacement_year][each_species][each_plot]['live'][each_treeid][0]
-                                except Exception:
-                                    try:
-                                        replacement_year_index = bisect.bisect_left(self.decent_years, each_year) - 3
-                                        replacement_year = self.decent_years[replacement_year_index]
-                                        replacement_tree_dbh = self.od[replacement_year][each_species][each_plot]['live'][each_treeid][0]
-                                    except Exception:
-                                        try:
-                                            replacement_year_index = bisect.bisect_left(self.decent_years, each_year) - 4
-                                            replacement_year = self.decent_years[replacement_year_index]
-                                            replacement_tree_dbh = self.od[replacement_year][each_species][each_plot]['live'][each_treeid][0]
-                                        except Exception:
-                                            print("cannot find a match for the missing tree: " + each_treeid + " -- tested up to four intervals preceding " + each_year + "check the fsdb!")
-                                            continue
-
-                        # this tree should have a dbh but also a status of '9' and 'M'
-                        adjusted_replacement_tree_tuple = (replacement_tree_dbh, '9', 'M', replacement_year)
-
-                        # update the main database with a replica of this tree for the missing one
-                        self.od[each_year][each_species][each_plot]['live'].update({each_treeid: adjusted_replacement_tree_tuple})
-
-
-    def compute_biomasses(self, XFACTOR):
-        """ Compute the number of trees per Hectare (TPHA), Biomass ( Mg and Mg/Ha ), Jenkins Biomass ( Mg and Mg/Ha ), Volume ( m\ :sup:`3` ), and Basal Area ( m\ :sup:`2` ); can be used for stands with weird minimums, detail plots, or areas that are not 625 m. If a match to one of the unusual attributes of XFACTOR is not found, it is assumed the minimum is 15.0, the plot is not detail, and the area is 625. Most plots match on at least one category, though.
+                        replacement = self.live_measurements.last_before(each_treeid, each_year)
 
-        This function uses the Capture object to tell if a fancy computation (i.e. get a special area, minimum, etc. needs to be performed.
-            Load in the appropriate parameters for this computation. Separate "small" trees from "large" ones so that small ones can get the expansion factor. If they aren't on a detail plot, this number will just be "1".)
+                        if replacement == None:
+                            print("cannot find a live measurement for the missing tree: " + each_treeid + " before " + str(each_year) + " -- check the fsdb!")
+                            continue
+
+                        replacement_year, replacement_tree_dbh = replacement
+
+                        # update the main table with a replica of this tree for the missing one; this tree should have a dbh but also a status of '9' and 'M'
+                        self.table.put(each_year, each_species, each_plot, each_treeid, replacement_tree_dbh, '9', 'M', replacement_year, 'live')
+
+    def select_equation(self, species, dbh):
+        """ Choose the equation set for one tree. This is the set chosen by ``biomass_basis.maxref`` (i.e. `big` or `normal`) if the species has it in self.eqns, otherwise `normal`.
 
         **INPUTS**
 
-        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :species: the four character species code, in lowercase
+        :dbh: the tree's dbh, in cm
 
         **RETURNS**
 
-        :Biomasses: a species-separated, stand-scale composite of biomasses that are needed for the final output.
+        A tuple of the equation set wanted by ``biomass_basis.maxref`` and the equation set to use, which is None if the species has neither.
         """
-
-        Biomasses = {}
-        BadTreeRef = {}
-        Rob_Biomasses = {}
+        wanted = biomass_basis.maxref(dbh, species)
 
         try:
-            all_years = sorted(self.od.keys())
-        except Exception:
-            all_years = sorted([x for x in self.od.keys() if x != None])
+            eqns = self.eqns[species]
+        except KeyError:
+            return wanted, None
+
+        if wanted in eqns:
+            return wanted, wanted
+        elif 'normal' in eqns:
+            return wanted, 'normal'
+        else:
+            return wanted, None
 
-        for index, each_year in enumerate(all_years):
+    def compute_tree_metrics(self):
+        """ Compute the basal area ( m\ :sup:`2` ), Biomass ( Mg ), Volume ( m\ :sup:`3` ) and Jenkins' Biomass ( Mg ) once for each tree-year in self.table and store them in its metric columns (see ``table_basis.py``). The stand, plot, and individual tree outputs read from these columns rather than calling the equations again.
 
-            try:
-                num_plots = self.num_plots[each_year]
-            except Exception:
-                num_plots = 16.0
+        The equation set for each tree is chosen up front by ``select_equation``, so a tree that needs a `big` equation its species does not have falls back to `normal` on its own, without affecting any other tree. These trees are kept in self.eqn_fallbacks and reported.
 
-            try:
+        **INPUTS**
 
-                total_area = self.total_area_ref[each_year]
+        No explicit inputs are needed; this function is called through self.tree_results the first time an output needs it.
 
-            except Exception:
+        **RETURNS**
 
-                try:
-                    # get most recent similar year
-                    total_area = self.total_area_ref[all_years[index-1]]
+        Populates the metric columns of self.table and its `equation` column. Trees without a dbh, or whose species has no usable equation, are left as NaN.
 
-                except Exception:
-                    try:
-                        # get most recent year
-                        total_area = self.total_area_ref[all_years[-1]]
-                    except Exception:
-                        try:
-                            # get the first year
-                            total_area = self.total_area_ref[all_years[0]]
-                        except Exception:
+        :self.eqn_fallbacks: a dictionary keyed by (species, equation set wanted, equation set used) of lists of (treeid, year) that did not get the equation set they wanted
+        """
+        self.table.reset_metrics()
+        self.eqn_fallbacks = self.fallbacks_by_key(self.set_tree_metrics(range(len(self.table))))
 
-                            print("total area could not be found, defaulting to 10000m")
-                            total_area = 10000.
+        self._results_version = self.table.version
 
+        if self.eqn_fallbacks != {}:
+            self.report_eqn_fallbacks()
 
-            for each_species in self.od[each_year].keys():
+    def set_tree_metrics(self, rows):
+        """ Compute the metrics of some of the rows of self.table, for ``compute_tree_metrics`` or one chunk of plots (see ``plot_chunk_results``). The other rows are not changed.
 
-                for each_plot in self.od[each_year][each_species].keys():
+        **INPUTS**
 
-                    # try to find the plot in the unusual mins reference
-                    try:
-                        mindbh = XFACTOR.umins_reference[self.standid][each_year][each_plot]
-                    except KeyError as exc:
-                        mindbh = 15.0
+        :rows: the row numbers, in order
 
-                    # try to find the plot in the unusual areas reference
-                    try:
-                        area = XFACTOR.uplot_areas[self.standid][each_plot][each_year]
-                    except KeyError as exc:
-                        area = 625.
+        **RETURNS**
 
-                    # test if the plot is a detail plot
-                    if self.standid not in XFACTOR.detail_reference.keys():
-                        Xw = 1.0
+        :fallbacks: a list of `(row, (species, equation set wanted, equation set used))` for the rows that did not get the equation set they wanted, in row order
+        """
+        fallbacks = []
 
-                    else:
-                        try:
-                            Xw = XFACTOR.expansion[self.standid][each_year]
-                        except Exception:
-                            Xw = 1.0
-                        try:
-                            mindbh = XFACTOR.detail_reference[self.standid][each_year][each_plot]['min']
-                        except Exception:
-                            mindbh = 5.0
-                        try:
-                            area = XFACTOR.detail_reference[self.standid][each_year][each_plot]['area']
-                        except Exception:
-                            area = 625.
+        for row in rows:
+            dbh = self.table.dbh[row]
 
-                    # figure out the representative percentage of all the area of the stand that this plot represents in the given year
+            if math.isnan(dbh):
+                continue
 
-                    # if the area is 0. and the total_area is 0.
-                    if area == 0. and total_area == 0.:
-                        area = 10000.
-                        total_area = 10000.
+            species = self.table.species_codes.names[self.table.species[row]]
+            wanted, eqn_set = self.select_equation(species, dbh)
 
-                        print("area for " + each_plot + " in the database for " + str(each_year) + " is 0")
-                        print("area for " + self.standid + " in the database for " + str(each_year) + " is 0")
+            if eqn_set != wanted:
+                fallbacks.append((row, (species, wanted, eqn_set)))
 
-                    # if the area is 0. but the total area isn't 0.
-                    elif area == 0. and total_area != 0.:
-                        area = 625.
-                        print("area for " + each_plot + " in the database for " + str(each_year) + " is 0")
+            if eqn_set == None:
+                continue
 
-                    # if the total_area is 0. but the area is not 0.
-                    elif total_area == 0. and area != 0.:
-                        total_area = 10000.
-                        print("area for " + self.standid + " in the database for " + str(each_year) + " is 0")
+            self.table.equation[row] = self.table.equation_codes.code(eqn_set)
+            self.table.set_metrics(row, biomass_basis.basal_area(dbh), self.eqns[species][eqn_set](dbh))
 
-                    try:
-                        percent_area_of_total = area/total_area
+        return fallbacks
 
-                    except ZeroDivisionError:
-                        print("area for " + self.standid + " in the database for " + str(each_year) + " is 0")
-                        total_area = 10000.
-                        percent_area_of_total = area/total_area
+    def fallbacks_by_key(self, fallbacks):
+        """ Turn the fallbacks from ``set_tree_metrics`` into self.eqn_fallbacks: a dictionary keyed by (species, equation set wanted, equation set used) of lists of (treeid, year).
+        """
+        eqn_fallbacks = {}
 
-                    if total_area == None:
-                        print("area for " + self.standid + " in the database for " + str(each_year) + " is null")
-                        total_area = 10000.
-                        percent_area_of_total = area/total_area
-                    else:
-                        pass
+        for row, key in fallbacks:
+            if key not in eqn_fallbacks:
+                eqn_fallbacks[key] = []
+            eqn_fallbacks[key].append((self.table.tree_codes.names[self.table.tid[row]], self.table.get_year(row)))
 
-                    # original year is added here as `raw`
-                    try:
-                        large_dead_trees = {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] >= 15.0}
-                    except Exception:
-                        large_dead_trees = {k: {'bio': self.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] >= 15.0}
+        return eqn_fallbacks
 
-                    small_dead_trees = {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] < 15.0 and v[0] > mindbh}
+    def report_eqn_fallbacks(self):
+        """ Print the number of tree-years on the stand that did not get the equation set they wanted, by species, with the first few treeids.
 
-                    try:
-                        large_live_trees = {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] >= 15.0}
-                    except Exception:
-                        large_live_trees = {k: {'bio': self.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] >= 15.0}
+        **INPUTS**
 
-                    small_live_trees = {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] < 15.0 and v[0] > mindbh}
+        No explicit inputs are needed; uses self.eqn_fallbacks from ``compute_tree_metrics``.
 
-                    try:
-                        large_ingrowth_trees = {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['ingrowth'].items() if v[0] != None and v[0] >= 15.0}
-                    except Exception:
-                        large_ingrowth_trees = {k: {'bio': self.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['ingrowth'].items() if v[0] != None and v[0] >= 15.0}
+        **RETURNS**
 
-                    small_ingrowth_trees = {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'raw': str(v[3])} for k,v in self.od[each_year][each_species][each_plot]['ingrowth'].items() if v[0] != None and v[0] < 15.0 and v[0] > mindbh}
+        A list of the lines printed.
+        """
+        lines = []
 
-                    bad_dead_trees = [k for k in self.od[each_year][each_species][each_plot]['dead'].keys() if self.od[each_year][each_species][each_plot]['dead'][k] == None]
+        for (species, wanted, eqn_set), trees in self.eqn_fallbacks.items():
+            examples = ", ".join(sorted(set([tid for (tid, _) in trees]))[0:5])
 
-                    bad_live_trees = [k for k in self.od[each_year][each_species][each_plot]['live'].keys() if self.od[each_year][each_species][each_plot]['live'][k] == None]
+            if eqn_set == None:
+                lines.append(self.standid + ": " + str(len(trees)) + " tree-years of " + str(species) + " have no '" + str(wanted) + "' or 'normal' equation and are not computed (" + examples + ")")
+            else:
+                lines.append(self.standid + ": " + str(len(trees)) + " tree-years of " + str(species) + " have no '" + str(wanted) + "' equation and use '" + eqn_set + "' (" + examples + ")")
 
-                    bad_ingrowth_trees = [k for k in self.od[each_year][each_species][each_plot]['ingrowth'].keys() if self.od[each_year][each_species][each_plot]['ingrowth'][k] == None]
+        for each_line in lines:
+            print(each_line)
 
-                    # write the "bad trees" to a reference
-                    if bad_dead_trees == [] and bad_live_trees == [] and bad_ingrowth_trees ==[]:
-                        pass
-                    else:
-                        if each_year not in BadTreeRef:
-                            BadTreeRef[each_year] = {each_species:{each_plot: {'dead': bad_dead_trees, 'live': bad_live_trees, 'ingrowth': bad_ingrowth_trees}}}
-                        elif each_year in BadTreeRef:
-                            if each_species not in BadTreeRef[each_year]:
-                                BadTreeRef[each_year][each_species] = {each_plot:{'dead': bad_dead_trees, 'live': bad_live_trees, 'ingrowth': bad_ingrowth_trees}}
-                            elif each_species in BadTreeRef[each_year]:
-                                if each_plot not in BadTreeRef[each_year][each_species]:
-                                    BadTreeRef[each_year][each_species][each_plot] = {'dead': bad_dead_trees, 'live': bad_live_trees, 'ingrowth': bad_ingrowth_trees}
-                                elif each_plot in BadTreeRef[each_year][each_species]:
-                                    BadTreeRef[each_year][each_species][each_plot]['dead'] += bad_dead_trees
-                                    BadTreeRef[each_year][each_species][each_plot]['live'] += bad_live_trees
-                                    BadTreeRef[each_year][each_species][each_plot]['ingrowth'] += bad_ingrowth_trees
-
-                    # count the number of total dead, live, and ingrowth trees. Divide by area to get the number of trees per unit area
-                    try:
-                        total_dead_trees = (len(large_dead_trees)/area + len(small_dead_trees)*Xw/area)*percent_area_of_total
-                    except Exception:
-                        total_dead_trees = 0.
+        return lines
 
-                    try:
-                        total_live_trees = (len(large_live_trees)/area + len(small_live_trees)*Xw/area)*percent_area_of_total
-                    except Exception:
-                        total_live_trees = 0.
+    @property
+    def tree_results(self):
+        """ The per-tree results of the Stand: self.table, with its basal area, biomass, volume, and Jenkins columns filled. The equations are evaluated for every tree-year the first time this is used and the results are kept on the Stand, so that ``compute_biomasses``, ``Plot.compute_biomasses_plot`` and ``write_individual_trees`` all read the same results. If the table changes afterwards, the results are computed again on next use.
 
-                    try:
-                        total_ingrowth_trees = (len(large_ingrowth_trees)/area + len(small_ingrowth_trees)/area*Xw)*percent_area_of_total
-                    except Exception:
-                        total_ingrowth_trees = 0.
+        .. Example:
 
-                    # compute the total "rob trees" which are only those > 15 cm
-                    # count the number of total dead, live, and ingrowth trees.
-                    try:
-                        rob_total_dead_trees = len(large_dead_trees)/area
-                    except Exception:
-                        rob_total_dead_trees = 0.
+        >>> A = Stand(cur, XFACTOR, queries, 'ncna')
+        >>> A.tree_results.biomass[0]
+        >>> 1.2639
+        """
+        if self._results_version != self.table.version:
+            self.compute_tree_metrics()
 
-                    try:
-                        rob_total_live_trees = len(large_live_trees)/area
-                    except Exception:
-                        rob_total_live_trees = 0.
+        return self.table
 
-                    try:
-                        rob_total_ingrowth_trees = len(large_ingrowth_trees)/area
-                    except Exception:
-                        rob_total_ingrowth_trees = 0.
+    @property
+    def od(self):
+        """ A compatibility view of self.table as the nested dictionary of year, species, plot, `live`/`ingrowth`/`dead`, and treeid to `(dbh, status, dbh_code, raw_year)`. It is built on first use and cached until the table changes; new code should read self.table instead.
+        """
+        return self.table.as_nested()
 
+    def plot_min_dbh(self, XFACTOR, year, plot):
+        """ The minimum dbh ( cm ) counted on a plot in a year at the plot scale. It is 15.0 unless the plot is in the unusual minimums reference.
 
-                    # compute the totals at the stand level, divide by area to get the area for each of the plots, multiply by the percent area of the total
-                    total_live_bio = (sum([large_live_trees[tree]['bio'][0]/area for tree in large_live_trees.keys()]) + sum([(small_live_trees[tree]['bio'][0]/area)*Xw for tree in small_live_trees.keys()]))*percent_area_of_total
-                    total_ingrowth_bio = (sum([large_ingrowth_trees[tree]['bio'][0]/area for tree in large_ingrowth_trees.keys()])+ sum([(small_ingrowth_trees[tree]['bio'][0]/area)*Xw for tree in small_ingrowth_trees.keys()]))* percent_area_of_total
-                    total_dead_bio = (sum([large_dead_trees[tree]['bio'][0]/area for tree in large_dead_trees.keys()]) + sum([(small_dead_trees[tree]['bio'][0]/area)*Xw for tree in small_dead_trees.keys()]))* percent_area_of_total
+        **INPUTS**
 
-                    rob_total_live_bio = (sum([large_live_trees[tree]['bio'][0]/area for tree in large_live_trees.keys()]))*percent_area_of_total
-                    rob_total_ingrowth_bio = (sum([large_ingrowth_trees[tree]['bio'][0]/area for tree in large_ingrowth_trees.keys()]))*percent_area_of_total
-                    rob_total_dead_bio = (sum([large_dead_trees[tree]['bio'][0]/area for tree in large_dead_trees.keys()]))*percent_area_of_total
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :year: the year
+        :plot: the plotid
 
+        **RETURNS**
 
-                    total_live_jenkins = (sum([large_live_trees[tree]['bio'][2]/area for tree in large_live_trees.keys()]) + sum([(small_live_trees[tree]['bio'][2]/area)*Xw for tree in small_live_trees.keys()])) * percent_area_of_total
-                    total_ingrowth_jenkins = (sum([large_ingrowth_trees[tree]['bio'][2]/area for tree in large_ingrowth_trees.keys()])  + sum([(small_ingrowth_trees[tree]['bio'][2]/area)*Xw for tree in small_ingrowth_trees.keys()])) * percent_area_of_total
-                    total_dead_jenkins = (sum([large_dead_trees[tree]['bio'][2]/area for tree in large_dead_trees.keys()]) + sum([(small_dead_trees[tree]['bio'][2]/area)*Xw for tree in small_dead_trees.keys()])) * percent_area_of_total
+        The minimum dbh, in cm.
+        """
+        try:
+            return XFACTOR.umins_reference[self.standid][year][plot]
+        except KeyError:
+            return 15.0
 
-                    rob_total_live_jenkins = (sum([large_live_trees[tree]['bio'][2]/area for tree in large_live_trees.keys()]))*percent_area_of_total
-                    rob_total_ingrowth_jenkins = (sum([large_ingrowth_trees[tree]['bio'][2]/area for tree in large_ingrowth_trees.keys()]))*percent_area_of_total
-                    rob_total_dead_jenkins = (sum([large_dead_trees[tree]['bio'][2]/area for tree in large_dead_trees.keys()]))*percent_area_of_total
+    def min_dbh(self, XFACTOR, year, plot):
+        """ The minimum dbh ( cm ) counted on a plot in a year at the stand scale. This is the plot scale minimum (see ``plot_min_dbh``), except on stands with detail plots, where it is taken from the detail reference, or 5.0.
 
-                    total_live_volume = (sum([large_live_trees[tree]['bio'][1]/area for tree in large_live_trees.keys()])  + sum([(small_live_trees[tree]['bio'][1]/area)*Xw for tree in small_live_trees.keys()])) * percent_area_of_total
-                    total_ingrowth_volume = (sum([large_ingrowth_trees[tree]['bio'][1]/area for tree in large_ingrowth_trees.keys()]) + sum([(small_ingrowth_trees[tree]['bio'][1]/area)*Xw for tree in small_ingrowth_trees.keys()])) * percent_area_of_total
-                    total_dead_volume = (sum([large_dead_trees[tree]['bio'][1]/area for tree in large_dead_trees.keys()]) + sum([(small_dead_trees[tree]['bio'][1]/area)*Xw for tree in small_dead_trees.keys()])) * percent_area_of_total
+        **INPUTS**
 
-                    rob_total_live_volume = (sum([large_live_trees[tree]['bio'][1]/area for tree in large_live_trees.keys()]))*percent_area_of_total
-                    rob_total_ingrowth_volume = (sum([large_ingrowth_trees[tree]['bio'][1]/area for tree in large_ingrowth_trees.keys()]))*percent_area_of_total
-                    rob_total_dead_volume = (sum([large_dead_trees[tree]['bio'][1]/area for tree in large_dead_trees.keys()]))*percent_area_of_total
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :year: the year
+        :plot: the plotid
 
-                    total_live_basal = (sum([large_live_trees[tree]['ba']/area for tree in large_live_trees.keys()]) + sum([(small_live_trees[tree]['ba']/area)*Xw for tree in small_live_trees.keys()])) * percent_area_of_total
-                    total_ingrowth_basal = (sum([large_ingrowth_trees[tree]['ba']/area for tree in large_ingrowth_trees.keys()])+  sum([(small_ingrowth_trees[tree]['ba']/area)*Xw for tree in small_ingrowth_trees.keys()])) * percent_area_of_total
-                    total_dead_basal = (sum([large_dead_trees[tree]['ba']/area for tree in large_dead_trees.keys()]) + sum([(small_dead_trees[tree]['ba']/area)*Xw for tree in small_dead_trees.keys()])) * percent_area_of_total
+        **RETURNS**
 
-                    rob_total_live_basal = (sum([large_live_trees[tree]['ba']/area for tree in large_live_trees.keys()]))*percent_area_of_total
-                    rob_total_ingrowth_basal = (sum([large_ingrowth_trees[tree]['ba']/area for tree in large_ingrowth_trees.keys()]))*percent_area_of_total
-                    rob_total_dead_basal = (sum([large_dead_trees[tree]['ba']/area for tree in large_dead_trees.keys()]))*percent_area_of_total
+        The minimum dbh, in cm.
+        """
+        mindbh = self.plot_min_dbh(XFACTOR, year, plot)
+
+        if self.standid in XFACTOR.detail_reference.keys():
+            try:
+                mindbh = XFACTOR.detail_reference[self.standid][year][plot]['min']
+            except Exception:
+                mindbh = 5.0
+
+        return mindbh
+
+    def build_plot_context(self, XFACTOR):
+        """ Build the context of every plot in every year on the stand: the area, minimum dbh, expansion factor, and percent of the stand area used at the stand scale, and the area and minimum dbh used at the plot scale. These depend only on the year and plot, so they are looked up once here, with all the defaults applied, rather than for every species.
+
+        At the stand scale, the area is from the unusual areas reference (or 625), and on stands with detail plots from the detail reference (or 625), which also gives the expansion factor (or 1). The total area of the stand comes from the year, or the year before, or the last or first year, or 10000. A zero plot area becomes 625 (or 10000 if the stand area is also 0), and a zero or null stand area becomes 10000.
+
+        At the plot scale, the area is from the unusual areas reference in that year or in the year before, or 625.
+
+        **INPUTS**
+
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+
+        **RETURNS**
+
+        :context: a dictionary keyed by (year, plot) of dictionaries with the keys `area`, `min_dbh`, `expansion`, `pct`, `plot_area`, and `plot_min_dbh`.
+        """
+        layout = self.table.layout()
+        context = {}
+
+        try:
+            all_years = sorted(layout.keys())
+        except Exception:
+            all_years = sorted([x for x in layout.keys() if x != None])
+
+        plot_years = sorted([x for x in layout.keys() if x != None])
+
+        for index, each_year in enumerate(all_years):
+
+            try:
+
+                total_area = self.total_area_ref[each_year]
+
+            except Exception:
+
+                try:
+                    # get most recent similar year
+                    total_area = self.total_area_ref[all_years[index-1]]
+
+                except Exception:
+                    try:
+                        # get most recent year
+                        total_area = self.total_area_ref[all_years[-1]]
+                    except Exception:
+                        try:
+                            # get the first year
+                            total_area = self.total_area_ref[all_years[0]]
+                        except Exception:
+
+                            print("total area could not be found, defaulting to 10000m")
+                            total_area = 10000.
+
+            if total_area == None:
+                print("area for " + self.standid + " in the database for " + str(each_year) + " is null")
+                total_area = 10000.
+
+            # each plot once, in the order they are first found in that year
+            plots = []
+            for each_species in layout[each_year].keys():
+                plots += [x for x in layout[each_year][each_species] if x not in plots]
+
+            for each_plot in plots:
+
+                # try to find the plot in the unusual areas reference
+                try:
+                    area = XFACTOR.uplot_areas[self.standid][each_plot][each_year]
+                except KeyError as exc:
+                    area = 625.
+
+                # test if the plot is a detail plot
+                if self.standid not in XFACTOR.detail_reference.keys():
+                    Xw = 1.0
+
+                else:
+                    try:
+                        Xw = XFACTOR.expansion[self.standid][each_year]
+                    except Exception:
+                        Xw = 1.0
+                    try:
+                        area = XFACTOR.detail_reference[self.standid][each_year][each_plot]['area']
+                    except Exception:
+                        area = 625.
+
+                # figure out the representative percentage of all the area of the stand that this plot represents in the given year
+
+                # if the area is 0. and the total_area is 0.
+                if area == 0. and total_area == 0.:
+                    area = 10000.
+                    total_area = 10000.
+
+                    print("area for " + each_plot + " in the database for " + str(each_year) + " is 0")
+                    print("area for " + self.standid + " in the database for " + str(each_year) + " is 0")
+
+                # if the area is 0. but the total area isn't 0.
+                elif area == 0. and total_area != 0.:
+                    area = 625.
+                    print("area for " + each_plot + " in the database for " + str(each_year) + " is 0")
+
+                # if the total_area is 0. but the area is not 0.
+                elif total_area == 0. and area != 0.:
+                    total_area = 10000.
+                    print("area for " + self.standid + " in the database for " + str(each_year) + " is 0")
+
+                percent_area_of_total = area/total_area
+
+                # the plot scale uses only the area of the plot
+                if self.standid not in XFACTOR.uplot_areas.keys():
+                    plot_area = 625.
+
+                elif each_plot not in XFACTOR.uplot_areas[self.standid]:
+                    plot_area = 625.
+
+                else:
+                    try:
+                        plot_area = XFACTOR.uplot_areas[self.standid][each_plot][each_year]
+                    except Exception:
+                        try:
+                            plot_area = XFACTOR.uplot_areas[self.standid][each_plot][plot_years[plot_years.index(each_year)-1]]
+                        except Exception:
+                            print("exception thrown trying to get the plot area for " + each_plot + " in " + str(each_year))
+                            plot_area = 625.
+
+                context[(each_year, each_plot)] = {'area': area, 'min_dbh': self.min_dbh(XFACTOR, each_year, each_plot), 'expansion': Xw, 'pct': percent_area_of_total, 'plot_area': plot_area, 'plot_min_dbh': self.plot_min_dbh(XFACTOR, each_year, each_plot)}
+
+        return context
+
+    def __getstate__(self):
+        """ A Stand is pickled without its cursor, to send it to the plot workers (see ``group_in_chunks``); they only compute trees that are already loaded.
+        """
+        state = self.__dict__.copy()
+        state['cur'] = None
+        return state
+
+    def plot_context(self, XFACTOR):
+        """ The plot context from ``build_plot_context``, built on first use and kept on the Stand. It is built again if the table or XFACTOR changes.
+
+        **INPUTS**
+
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+
+        **RETURNS**
+
+        :context: see ``build_plot_context``
+        """
+        key = (self.table.version, id(XFACTOR))
+
+        if self._context == None or self._context[0] != key:
+            self._context = (key, self.build_plot_context(XFACTOR))
+
+        return self._context[1]
+
+    def group_tree_results(self, XFACTOR, thresholds=THRESHOLDS, rows=None):
+        """ Walk the tree results once and add up the number of trees, Biomass ( Mg ), Volume ( m\ :sup:`3` ), Jenkins' Biomass ( Mg ) and basal area ( m\ :sup:`2` ) into buckets for each year, species, plot, group (`live`, `dead`, or `ingrowth`) and size class. These per-plot sums are the basis of both the stand (``compute_biomasses``) and the plot (``Plot.compute_biomasses_plot``) outputs.
+
+        Trees of 15 cm or more are `large`. Trees under 15 cm are counted if they are over the minimum dbh for that plot. Because the stand scale minimum (``min_dbh``) and the plot scale minimum (``plot_min_dbh``) can differ, small trees are `small` if they count at both scales, `small_stand` if only at the stand scale, and `small_plot` if only at the plot scale. Other trees, and trees without a dbh, are not counted. Ingrowth trees are counted in both `live` and `ingrowth`.
+
+        In the same pass, each tree counted at the stand scale is also added to the portion of every dbh threshold it meets or exceeds, split into `large` and `small` (`small` and `small_stand` together) so that the small trees can be expanded.
+
+        **INPUTS**
+
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :thresholds: a list of dbh ( cm ) cutoffs for the portions, defaults to THRESHOLDS
+        :rows: optional, the row numbers to group, in order; all the rows if not given
+
+        **RETURNS**
+
+        :buckets: a dictionary keyed by (year, species, plot, group, size class) of lists like `[trees, biomass, volume, jenkins, basal, treeid codes]`, in the order of BUCKET_METRICS. The treeid codes are an array of codes in the table's tree_codes.
+        :portions: a dictionary keyed by (year, species, plot, group, threshold, `large` or `small`) of lists like `[trees, biomass, volume, jenkins, basal]`.
+        """
+        results = self.tree_results
+        context = self.plot_context(XFACTOR)
+        thresholds = sorted(thresholds)
+        buckets = {}
+        portions = {}
 
-                    # get a list of tree names for checking
-                    living_trees = list(large_live_trees) + list(small_live_trees)
-                    ingrowth_trees = list(large_ingrowth_trees) + list(small_ingrowth_trees)
-                    dead_trees = list(large_dead_trees) + list(small_dead_trees)
+        if rows == None:
+            rows = range(len(results))
+
+        for row in rows:
+            dbh = results.dbh[row]
+
+            if math.isnan(dbh):
+                continue
+
+            year = results.get_year(row)
+            plot = results.plot_codes.names[results.plot[row]]
+
+            if dbh >= 15.0:
+                size = 'large'
+            else:
+                stand_min = context[(year, plot)]['min_dbh']
+                plot_min = context[(year, plot)]['plot_min_dbh']
+
+                if dbh > stand_min and dbh > plot_min:
+                    size = 'small'
+                elif dbh > stand_min:
+                    size = 'small_stand'
+                elif dbh > plot_min:
+                    size = 'small_plot'
+                else:
+                    continue
+
+            species = results.species_codes.names[results.species[row]]
+
+            if results.live[row] and results.ingrowth[row]:
+                groups = ['live', 'ingrowth']
+            elif results.live[row]:
+                groups = ['live']
+            else:
+                groups = ['dead']
+
+            for each_group in groups:
+                key = (year, species, plot, each_group, size)
+
+                if key not in buckets:
+                    buckets[key] = [0, 0., 0., 0., 0., array.array('L')]
+
+                bucket = buckets[key]
+                bucket[0] += 1
+                bucket[1] += results.biomass[row]
+                bucket[2] += results.volume[row]
+                bucket[3] += results.jenkins[row]
+                bucket[4] += results.basal[row]
+                bucket[5].append(results.tid[row])
+
+                # the portions only hold trees counted at the stand scale; the number of thresholds at or below the dbh says which portions the tree is in
+                if size == 'small_plot':
+                    continue
+
+                if size == 'large':
+                    portion_size = 'large'
+                else:
+                    portion_size = 'small'
+
+                for each_threshold in thresholds[:bisect.bisect_right(thresholds, dbh)]:
+                    key = (year, species, plot, each_group, each_threshold, portion_size)
+
+                    if key not in portions:
+                        portions[key] = [0, 0., 0., 0., 0.]
+
+                    portion = portions[key]
+                    portion[0] += 1
+                    portion[1] += results.biomass[row]
+                    portion[2] += results.volume[row]
+                    portion[3] += results.jenkins[row]
+                    portion[4] += results.basal[row]
+
+        return buckets, portions
+
+    def grouped_results(self, XFACTOR, thresholds=None):
+        """ The buckets and portions from ``group_tree_results``, computed on first use and kept on the Stand, so the stand and plot outputs share one pass over the trees. They are computed again if the table or XFACTOR changes, or if different thresholds are asked for.
+
+        If PLOT_WORKERS is more than 1, the plots are split over that many processes (see ``group_in_chunks``).
+
+        **INPUTS**
+
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :thresholds: a list of dbh ( cm ) cutoffs for the portions. If not given, the portions already kept are used, or THRESHOLDS if there are none.
+
+        **RETURNS**
+
+        :buckets: see ``group_tree_results``
+        :portions: see ``group_tree_results``
+        """
+        key = (self.table.version, id(XFACTOR))
+
+        if thresholds == None:
+            if self._grouped != None and self._grouped[0] == key:
+                return self._grouped[2], self._grouped[3]
+            thresholds = THRESHOLDS
+
+        thresholds = tuple(sorted(thresholds))
+
+        if self._grouped == None or self._grouped[0] != key or self._grouped[1] != thresholds:
+
+            # worker processes can not start workers of their own, so a stand that is already on a worker is grouped on that worker
+            if PLOT_WORKERS > 1 and multiprocessing.current_process().daemon and DAEMON_WARNING == []:
+                print("the plots of stands computed on worker processes are not split over plot workers; each stand is computed on its worker")
+                DAEMON_WARNING.append(True)
+
+            if PLOT_WORKERS > 1 and len(self.table.plot_codes) > 1 and not multiprocessing.current_process().daemon:
+                buckets, portions = self.group_in_chunks(XFACTOR, thresholds, PLOT_WORKERS)
+            else:
+                buckets, portions = self.group_tree_results(XFACTOR, thresholds)
+
+            self._grouped = (key, thresholds, buckets, portions)
+
+        return self._grouped[2], self._grouped[3]
+
+    def plot_chunks(self, n_chunks):
+        """ Split the plots of the Stand into chunks with about the same number of tree-years. The plots are dealt out from the largest to the smallest, each to the chunk with the fewest tree-years so far.
+
+        **INPUTS**
+
+        :n_chunks: the number of chunks wanted; there are fewer if the Stand has fewer plots
+
+        **RETURNS**
+
+        A list of lists of plot codes (see self.table.plot_codes).
+        """
+        counts = {}
+        for each_code in self.table.plot:
+            counts[each_code] = counts.get(each_code, 0) + 1
+
+        chunks = [[] for x in range(min(n_chunks, len(counts)))]
+        loads = [0]*len(chunks)
+
+        for each_code in sorted(counts.keys(), key=lambda x: (-counts[x], x)):
+            index = loads.index(min(loads))
+            chunks[index].append(each_code)
+            loads[index] += counts[each_code]
+
+        return chunks
+
+    def plot_chunk_results(self, XFACTOR, plot_codes, thresholds=THRESHOLDS):
+        """ Compute the tree metrics and the buckets and portions of the trees on some of the plots of the Stand. This is run on a forked copy of the Stand by ``group_in_chunks``, so the metrics it puts in the table are only seen by that copy, and are returned.
+
+        **INPUTS**
+
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :plot_codes: the codes of the plots (see self.table.plot_codes)
+        :thresholds: a list of dbh ( cm ) cutoffs for the portions
+
+        **RETURNS**
+
+        :rows: an array of the row numbers on those plots
+        :metrics: the basal area, biomass, volume, and Jenkins columns of those rows and the names of their equation sets, or None if the metrics of the table had already been computed
+        :fallbacks: the fallbacks of those rows, see ``set_tree_metrics``
+        :buckets: the buckets of those plots, see ``group_tree_results``
+        :portions: the portions of those plots, see ``group_tree_results``
+        """
+        table = self.table
+        wanted = set(plot_codes)
+        rows = array.array('L', [row for row in range(len(table)) if table.plot[row] in wanted])
+
+        if self._results_version != table.version:
+            table.reset_metrics()
+            fallbacks = self.set_tree_metrics(rows)
+            self._results_version = table.version
+
+            metrics = [array.array('d', [each_column[row] for row in rows]) for each_column in [table.basal, table.biomass, table.volume, table.jenkins]]
+            # the equation codes are only good in this process, so the names are sent back
+            metrics.append([table.equation_codes.names[table.equation[row]] for row in rows])
+        else:
+            fallbacks = []
+            metrics = None
+
+        buckets, portions = self.group_tree_results(XFACTOR, thresholds, rows)
+
+        return rows, metrics, fallbacks, buckets, portions
+
+    def group_in_chunks(self, XFACTOR, thresholds, workers):
+        """ Compute the tree metrics and group them like ``group_tree_results``, with the plots of the Stand split into chunks (see ``plot_chunks``) on a pool of forked worker processes.
+
+        Every bucket and portion belongs to one plot, so each is added up by one worker, over its trees in the same order as on one process. The chunks are put back together and weighted by area in ``compute_biomasses`` and ``Plot.compute_biomasses_plot`` exactly as before, so the outputs are the same as on one process. The metrics computed by the workers are put in self.table, so self.tree_results does not compute them again.
+
+        **INPUTS**
+
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :thresholds: a list of dbh ( cm ) cutoffs for the portions
+        :workers: the number of worker processes
+
+        **RETURNS**
+
+        :buckets: see ``group_tree_results``
+        :portions: see ``group_tree_results``
+        """
+        try:
+            pool = chunk_pool(XFACTOR, workers)
+        except ValueError:
+            return self.group_tree_results(XFACTOR, thresholds)
+
+        # build the plot context here, so the workers do not each build it
+        self.plot_context(XFACTOR)
+
+        # the Stand is pickled once and the same bytes are sent with each chunk
+        pickled_stand = pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+        chunks = pool.map(plot_chunk_worker, [(pickled_stand, x, thresholds) for x in self.plot_chunks(workers)], chunksize=1)
+
+        buckets = {}
+        portions = {}
+        fallbacks = []
+        new_metrics = False
+
+        for rows, metrics, chunk_fallbacks, chunk_buckets, chunk_portions in chunks:
+
+            if metrics != None:
+                if new_metrics == False:
+                    self.table.reset_metrics()
+                    new_metrics = True
+
+                basal, biomass, volume, jenkins, equation = metrics
+                for index, row in enumerate(rows):
+                    self.table.basal[row] = basal[index]
+                    self.table.biomass[row] = biomass[index]
+                    self.table.volume[row] = volume[index]
+                    self.table.jenkins[row] = jenkins[index]
+                    self.table.equation[row] = self.table.equation_codes.code(equation[index])
+
+            fallbacks += chunk_fallbacks
+            buckets.update(chunk_buckets)
+            portions.update(chunk_portions)
+
+        if new_metrics == True:
+            # in row order, as they would be on one process
+            fallbacks.sort(key=lambda x: x[0])
+            self.eqn_fallbacks = self.fallbacks_by_key(fallbacks)
+            self._results_version = self.table.version
+
+            if self.eqn_fallbacks != {}:
+                self.report_eqn_fallbacks()
+
+        return buckets, portions
+
+    def plot_bucket(self, buckets, year, species, plot, group, sizes):
+        """ Add up the buckets of several size classes for one year, species, plot, and group.
+
+        **INPUTS**
+
+        :buckets: the buckets from ``grouped_results``
+        :year: the year
+        :species: the species
+        :plot: the plotid
+        :group: `live`, `dead`, or `ingrowth`
+        :sizes: a list of size classes, like `['small', 'small_stand']`
+
+        **RETURNS**
+
+        A list like `[trees, biomass, volume, jenkins, basal, treeid codes]`.
+        """
+        found = [buckets[(year, species, plot, group, each_size)] for each_size in sizes if (year, species, plot, group, each_size) in buckets]
+
+        if found == []:
+            return EMPTY_BUCKET
+        elif len(found) == 1:
+            return found[0]
+        else:
+            tids = array.array('L')
+            for x in found:
+                tids.extend(x[-1])
+            return [sum([x[index] for x in found]) for index in range(len(BUCKET_METRICS))] + [tids]
+
+    def tree_names(self, codes):
+        """ Turn an array of treeid codes, like the `name_live` of ``compute_biomasses(XFACTOR, keep_names=True)``, back into a list of treeids.
+        """
+        return [self.table.tree_codes.names[x] for x in codes]
+
+    def bad_tree_rows(self):
+        """ The rows of self.table that are "bad trees": tree-years that were loaded without a dbh, so no equation can be used on them. The whole table is checked at once with a mask (see ``TreeStateTable.no_dbh_mask``) the first time this is used, and the rows are kept until the table changes.
+
+        **RETURNS**
+
+        A list of row numbers, in the order they were loaded.
+        """
+        if self._bad == None or self._bad[0] != self.table.version:
+            mask = self.table.no_dbh_mask()
+            self._bad = (self.table.version, [row for row in range(len(mask)) if mask[row]])
+
+        return self._bad[1]
+
+    def bad_tree_table(self):
+        """ The bad trees of the Stand as a flat table, one row for each tree-year, like the QC output: `[standid, year, species, plot, treeid, state, issue]`. The state is `live` or `dead`; ingrowth trees are `live`. Rows without a year are not aggregated anywhere, so they are left out.
+
+        .. Example:
+
+        >>> A.bad_tree_table()
+        >>> [['ncna', 1985, 'psme', 'ncna0001', 'ncna000100012', 'live', 'dbh is None'], ...]
+        """
+        table = self.table
+        bad_table = []
+
+        for row in self.bad_tree_rows():
+            year = table.get_year(row)
+
+            if year == None:
+                continue
+
+            if table.dead[row]:
+                state = 'dead'
+            else:
+                state = 'live'
+
+            bad_table.append([self.standid, year, table.species_codes.names[table.species[row]], table.plot_codes.names[table.plot[row]], table.tree_codes.names[table.tid[row]], state, 'dbh is None'])
+
+        return bad_table
+
+    def bad_tree_ref(self):
+        """ The bad trees of the Stand by year, species, and plot, like this: `{year: {species: {plot: {'dead': [treeid, ...], 'live': [...], 'ingrowth': [...]}}}}`. Only plots with a bad tree are included. Ingrowth trees are in both `live` and `ingrowth`, as they are in self.table.
+
+        **RETURNS**
+
+        :BadTreeRef: the BadTreeRef that ``compute_biomasses`` returns
+        """
+        table = self.table
+        BadTreeRef = {}
+
+        for row in self.bad_tree_rows():
+            year = table.get_year(row)
+
+            if year == None:
+                continue
+
+            species = table.species_codes.names[table.species[row]]
+            plot = table.plot_codes.names[table.plot[row]]
+            treeid = table.tree_codes.names[table.tid[row]]
+
+            if table.dead[row]:
+                state = 'dead'
+            else:
+                state = 'live'
+
+            if year not in BadTreeRef:
+                BadTreeRef[year] = {}
+            if species not in BadTreeRef[year]:
+                BadTreeRef[year][species] = {}
+            if plot not in BadTreeRef[year][species]:
+                BadTreeRef[year][species][plot] = {'dead': [], 'live': [], 'ingrowth': []}
+
+            BadTreeRef[year][species][plot][state].append(treeid)
+
+            if table.ingrowth[row]:
+                BadTreeRef[year][species][plot]['ingrowth'].append(treeid)
+
+        return BadTreeRef
+
+    def write_bad_trees(self, *args):
+        """ Writes the bad trees of the Stand, from ``bad_tree_table``. These are the live and dead rows that the member check of ``tps_check.QC`` writes from BadTreeRef (``QC.check_stand_members``), which also lists the ingrowth trees again as `ingrowth`.
+
+        **INPUTS**
+
+        :args: two arguements, a csv filename and a mode of write or append. Without them, the file is `<standid>_stand_member_check.csv`.
+
+        **RETURNS**
+
+        A csv file like ``standid, year, species, plot, treeid, state, issue``.
+        """
+        if args and args != []:
+            filename_out = args[0]
+            mode = args[1]
+        else:
+            filename_out = self.standid + "_stand_member_check.csv"
+            mode = 'w'
+
+        with open(filename_out, mode) as writefile:
+            writer = csv.writer(writefile, delimiter = ",", quoting=csv.QUOTE_NONNUMERIC)
+
+            if mode == 'w':
+                writer.writerow(['standid','year', 'species', 'plot', 'treeid', 'state', 'issue'])
+
+            for new_row in self.bad_tree_table():
+                writer.writerow(new_row)
+
+    def compute_biomasses(self, XFACTOR, thresholds=None, keep_names=False):
+        """ Compute the number of trees per Hectare (TPHA), Biomass ( Mg and Mg/Ha ), Jenkins Biomass ( Mg and Mg/Ha ), Volume ( m\ :sup:`3` ), and Basal Area ( m\ :sup:`2` ); can be used for stands with weird minimums, detail plots, or areas that are not 625 m. If a match to one of the unusual attributes of XFACTOR is not found, it is assumed the minimum is 15.0, the plot is not detail, and the area is 625. Most plots match on at least one category, though.
+
+        This function uses the Capture object to tell if a fancy computation (i.e. get a special area, minimum, etc. needs to be performed.
+            Load in the appropriate parameters for this computation. Separate "small" trees from "large" ones so that small ones can get the expansion factor. If they aren't on a detail plot, this number will just be "1".)
+
+        **INPUTS**
+
+        :XFACTOR: a Capture object containing the detail plots, minimum dbhs, etc.
+        :thresholds: optional, a list of dbh ( cm ) cutoffs, like `[10.0, 15.0, 25.0, 50.0]`. The portion of the stand in trees at or above each cutoff is computed in the same pass over the trees as the totals.
+        :keep_names: optional, if True each year and species also gets `name_live`, `name_mort`, and `name_ingrowth`: arrays of the codes of the trees counted, which ``tree_names`` turns back into treeids. Only the population checks of QC need these, so they are left out by default.
+
+        **RETURNS**
+
+        :Biomasses: a species-separated, stand-scale composite of biomasses that are needed for the final output.
+        :BadTreeRef: the trees on each plot that have no dbh, see ``bad_tree_ref``.
+        :Rob_Biomasses: if no thresholds are given, the portion of the stand in trees of 15 cm or more ("rob" trees), by year and species; every value of it, the live Jenkins' biomass too, is from those trees alone. If thresholds are given, a dictionary of these portions keyed by each threshold instead, which ``write_stand_portions`` can write.
+
+        .. note:: small trees in a portion (when the threshold is under 15 cm) are expanded like they are for the totals. The trees per unit area of a portion are not multiplied by the percent area of the total.
+
+        .. note:: the trees of each plot are added up first and then divided by the area of the plot once, where each tree used to be divided on its own. The totals are the same, but their last digits can differ (by about one part in 10\ :sup:`15`).
+        """
+
+        Biomasses = {}
+
+        # the bad trees are found for the whole stand at once
+        BadTreeRef = self.bad_tree_ref()
+
+        if thresholds == None:
+            portion_thresholds = sorted(THRESHOLDS)
+        else:
+            portion_thresholds = sorted(thresholds)
+
+        Portions = {each_threshold: {} for each_threshold in portion_thresholds}
+
+        layout = self.table.layout()
+        results = self.tree_results
+        buckets, portion_buckets = self.grouped_results(XFACTOR, portion_thresholds)
+        context = self.plot_context(XFACTOR)
+
+        try:
+            all_years = sorted(layout.keys())
+        except Exception:
+            all_years = sorted([x for x in layout.keys() if x != None])
+
+        for index, each_year in enumerate(all_years):
+
+            try:
+                num_plots = self.num_plots[each_year]
+            except Exception:
+                num_plots = 16.0
+
+            for each_species in layout[each_year].keys():
+
+                for each_plot in layout[each_year][each_species]:
+
+                    # the area, expansion factor, and percent of the stand area for this plot and year
+                    area = context[(each_year, each_plot)]['area']
+                    Xw = context[(each_year, each_plot)]['expansion']
+                    percent_area_of_total = context[(each_year, each_plot)]['pct']
+
+                    totals = {}
+                    portion_totals = {each_threshold: {} for each_threshold in portion_thresholds}
+                    names = {}
+
+                    for each_group in ['live', 'dead', 'ingrowth']:
+                        large = self.plot_bucket(buckets, each_year, each_species, each_plot, each_group, ['large'])
+                        small = self.plot_bucket(buckets, each_year, each_species, each_plot, each_group, ['small', 'small_stand'])
+
+                        # divide by area to get the amount per unit area, expand the small trees by Xw, and multiply by the percent area of the total
+                        for index_metric, each_metric in enumerate(BUCKET_METRICS):
+                            totals['total_' + each_group + '_' + each_metric] = (large[index_metric]/area + small[index_metric]*Xw/area)*percent_area_of_total
+
+                        # get the codes of the tree names for checking, if they are wanted
+                        if keep_names == True:
+                            names[each_group] = array.array('L')
+                            names[each_group].extend(large[-1])
+                            names[each_group].extend(small[-1])
+
+                        # the portions at each threshold; only thresholds under 15 cm have small trees in them
+                        for each_threshold in portion_thresholds:
+                            large_portion = portion_buckets.get((each_year, each_species, each_plot, each_group, each_threshold, 'large'), EMPTY_BUCKET)
+                            small_portion = portion_buckets.get((each_year, each_species, each_plot, each_group, each_threshold, 'small'))
+
+                            for index_metric, each_metric in enumerate(BUCKET_METRICS):
+                                if small_portion == None:
+                                    per_area = large_portion[index_metric]/area
+                                else:
+                                    per_area = large_portion[index_metric]/area + small_portion[index_metric]*Xw/area
+
+                                # the trees per unit area of a portion are not multiplied by the percent area of the total
+                                if each_metric == 'trees':
+                                    portion_totals[each_threshold]['total_' + each_group + '_' + each_metric] = per_area
+                                else:
+                                    portion_totals[each_threshold]['total_' + each_group + '_' + each_metric] = per_area*percent_area_of_total
 
                     if each_year not in Biomasses:
-                        Biomasses[each_year] = {each_species : {'total_live_bio': total_live_bio, 'total_dead_bio' : total_dead_bio, 'total_ingrowth_bio': total_ingrowth_bio, 'total_live_jenkins': total_live_jenkins, 'total_ingrowth_jenkins': total_ingrowth_jenkins, 'total_dead_jenkins' : total_dead_jenkins, 'total_live_volume' : total_live_volume, 'total_dead_volume' : total_dead_volume, 'total_ingrowth_volume': total_ingrowth_volume, 'total_live_trees': total_live_trees, 'total_dead_trees': total_dead_trees, 'total_ingrowth_trees': total_ingrowth_trees, 'total_live_basal': total_live_basal, 'name_live': living_trees, 'name_mort': dead_trees, 'total_ingrowth_basal': total_ingrowth_basal, 'total_dead_basal': total_dead_basal,  'name_ingrowth': ingrowth_trees, 'num_plots': num_plots}}
-
-
-                    elif each_year in Biomasses:
-                        # do not need to augment the wood density :) -> but do make sure it is in here
-                        if each_species not in Biomasses[each_year]:
-                            Biomasses[each_year][each_species]={'total_live_bio': total_live_bio, 'total_dead_bio' : total_dead_bio, 'total_ingrowth_bio': total_ingrowth_bio, 'total_live_jenkins': total_live_jenkins, 'total_ingrowth_jenkins': total_ingrowth_jenkins, 'total_dead_jenkins' : total_dead_jenkins, 'total_live_volume' : total_live_volume, 'total_dead_volume' : total_dead_volume, 'total_ingrowth_volume': total_ingrowth_volume, 'total_live_trees': total_live_trees, 'total_dead_trees': total_dead_trees, 'total_ingrowth_trees': total_ingrowth_trees, 'total_live_basal': total_live_basal, 'total_dead_basal': total_dead_basal, 'name_live': living_trees, 'total_ingrowth_basal': total_ingrowth_basal, 'name_mort': dead_trees,'name_ingrowth': ingrowth_trees, 'num_plots':num_plots}
-
-                        # don't need to augment the wood density - one time is enough! - this is adding in each of the plots, which are already on area basis
-                        elif each_species in Biomasses[each_year]:
-                            Biomasses[each_year][each_species]['total_live_bio'] += total_live_bio
-                            Biomasses[each_year][each_species]['total_dead_bio'] += total_dead_bio
-                            Biomasses[each_year][each_species]['total_ingrowth_bio'] += total_ingrowth_bio
-                            Biomasses[each_year][each_species]['total_live_jenkins'] +=total_live_jenkins
-                            Biomasses[each_year][each_species]['total_ingrowth_jenkins'] += total_ingrowth_jenkins
-                            Biomasses[each_year][each_species]['total_dead_jenkins'] += total_dead_jenkins
-                            Biomasses[each_year][each_species]['total_live_volume'] += total_live_volume
-                            Biomasses[each_year][each_species]['total_dead_volume'] += total_dead_volume
-                            Biomasses[each_year][each_species]['total_ingrowth_volume'] += total_ingrowth_volume
-                            Biomasses[each_year][each_species]['total_live_trees'] += total_live_trees
-                            Biomasses[each_year][each_species]['total_dead_trees'] += total_dead_trees
-                            Biomasses[each_year][each_species]['total_ingrowth_trees'] += total_ingrowth_trees
-                            Biomasses[each_year][each_species]['name_live'] += living_trees
-                            Biomasses[each_year][each_species]['name_mort'] += dead_trees
-                            Biomasses[each_year][each_species]['name_ingrowth'] += ingrowth_trees
-                            Biomasses[each_year][each_species]['total_live_basal']+=total_live_basal
-                            Biomasses[each_year][each_species]['total_dead_basal']+=total_dead_basal
-                            Biomasses[each_year][each_species]['total_ingrowth_basal']+=total_ingrowth_basal
-                            Biomasses[each_year][each_species]['num_plots'] = num_plots
-                        else:
-                            pass
-
-
-                    # do the same for rob bio
-                    if each_year not in Rob_Biomasses:
-                        Rob_Biomasses[each_year] = {each_species : {'total_live_bio': rob_total_live_bio, 'total_dead_bio' : rob_total_dead_bio, 'total_ingrowth_bio': rob_total_ingrowth_bio, 'total_live_jenkins': total_live_jenkins, 'total_ingrowth_jenkins': rob_total_ingrowth_jenkins, 'total_dead_jenkins' : rob_total_dead_jenkins, 'total_live_volume' : rob_total_live_volume, 'total_dead_volume' : rob_total_dead_volume, 'total_ingrowth_volume': rob_total_ingrowth_volume, 'total_live_trees': rob_total_live_trees, 'total_dead_trees': rob_total_dead_trees, 'total_ingrowth_trees': rob_total_ingrowth_trees, 'total_live_basal': rob_total_live_basal, 'total_ingrowth_basal': rob_total_ingrowth_basal, 'total_dead_basal': rob_total_dead_basal, 'num_plots': num_plots}}
-
-
-                    elif each_year in Rob_Biomasses:
-                        # do not need to augment the wood density :) -> but do make sure it is in here
-                        if each_species not in Rob_Biomasses[each_year]:
-                            Rob_Biomasses[each_year][each_species]={'total_live_bio': rob_total_live_bio, 'total_dead_bio' : rob_total_dead_bio, 'total_ingrowth_bio': rob_total_ingrowth_bio, 'total_live_jenkins': rob_total_live_jenkins, 'total_ingrowth_jenkins': rob_total_ingrowth_jenkins, 'total_dead_jenkins' : rob_total_dead_jenkins, 'total_live_volume' : rob_total_live_volume, 'total_dead_volume' : rob_total_dead_volume, 'total_ingrowth_volume': rob_total_ingrowth_volume, 'total_live_trees': rob_total_live_trees, 'total_dead_trees': rob_total_dead_trees, 'total_ingrowth_trees': rob_total_ingrowth_trees, 'total_live_basal':rob_total_live_basal, 'total_dead_basal': rob_total_dead_basal,  'total_ingrowth_basal': rob_total_ingrowth_basal, 'num_plots':num_plots}
-
-                        # don't need to augment the wood density - one time is enough! - this is adding in each of the plots, which are already on area basis
-                        elif each_species in Rob_Biomasses[each_year]:
-                            Rob_Biomasses[each_year][each_species]['total_live_bio'] += rob_total_live_bio
-                            Rob_Biomasses[each_year][each_species]['total_dead_bio'] += rob_total_dead_bio
-                            Rob_Biomasses[each_year][each_species]['total_ingrowth_bio'] += rob_total_ingrowth_bio
-                            Rob_Biomasses[each_year][each_species]['total_live_jenkins'] +=rob_total_live_jenkins
-                            Rob_Biomasses[each_year][each_species]['total_ingrowth_jenkins'] += rob_total_ingrowth_jenkins
-                            Rob_Biomasses[each_year][each_species]['total_dead_jenkins'] += rob_total_dead_jenkins
-                            Rob_Biomasses[each_year][each_species]['total_live_volume'] += rob_total_live_volume
-                            Rob_Biomasses[each_year][each_species]['total_dead_volume'] += rob_total_dead_volume
-                            Rob_Biomasses[each_year][each_species]['total_ingrowth_volume'] += rob_total_ingrowth_volume
-                            Rob_Biomasses[each_year][each_species]['total_live_trees'] += rob_total_live_trees
-                            Rob_Biomasses[each_year][each_species]['total_dead_trees'] += rob_total_dead_trees
-                            Rob_Biomasses[each_year][each_species]['total_ingrowth_trees'] += rob_total_ingrowth_trees
-                            Rob_Biomasses[each_year][each_species]['total_live_basal']+=rob_total_live_basal
-                            Rob_Biomasses[each_year][each_species]['total_dead_basal']+=rob_total_dead_basal
-                            Rob_Biomasses[each_year][each_species]['total_ingrowth_basal']+=rob_total_ingrowth_basal
-                            Rob_Biomasses[each_year][each_species]['num_plots'] = num_plots
+                        Biomasses[each_year] = {}
+
+                    if each_species not in Biomasses[each_year]:
+                        Biomasses[each_year][each_species] = dict(totals, num_plots=num_plots)
+
+                        if keep_names == True:
+                            Biomasses[each_year][each_species].update({'name_live': names['live'], 'name_mort': names['dead'], 'name_ingrowth': names['ingrowth']})
+
+                    # this is adding in each of the plots, which are already on area basis
+                    else:
+                        for each_total in totals:
+                            Biomasses[each_year][each_species][each_total] += totals[each_total]
+
+                        if keep_names == True:
+                            Biomasses[each_year][each_species]['name_live'].extend(names['live'])
+                            Biomasses[each_year][each_species]['name_mort'].extend(names['dead'])
+                            Biomasses[each_year][each_species]['name_ingrowth'].extend(names['ingrowth'])
+
+                        Biomasses[each_year][each_species]['num_plots'] = num_plots
+
+                    # do the same for each portion
+                    for each_threshold in portion_thresholds:
+                        Portion = Portions[each_threshold]
+
+                        if each_year not in Portion:
+                            Portion[each_year] = {}
+
+                        if each_species not in Portion[each_year]:
+                            Portion[each_year][each_species] = dict(portion_totals[each_threshold], num_plots=num_plots)
+
                         else:
-                            pass
+                            for each_total in portion_totals[each_threshold]:
+                                Portion[each_year][each_species][each_total] += portion_totals[each_threshold][each_total]
+                            Portion[each_year][each_species]['num_plots'] = num_plots
 
-        return Biomasses, BadTreeRef, Rob_Biomasses
+        # without thresholds, the third output is the "rob" portion alone, as it has always been
+        if thresholds == None:
+            return Biomasses, BadTreeRef, Portions[THRESHOLDS[0]]
+
+        return Biomasses, BadTreeRef, Portions
 
     def aggregate_biomasses(self, Biomasses):
         """ For each year in biomasses, add up all the trees from all the species, and output the stand summary over all the species as a nearly identical data structure.
@@ -966,20 +1554,42 @@ class Stand(object):
         Biomasses_Agg = {}
 
         for each_year in sorted(Biomasses.keys()):
+            Biomasses_Agg[each_year] = {}
 
-            if each_year not in Biomasses_Agg:
+            for each_metric in TOTAL_METRICS:
+                Biomasses_Agg[each_year][each_metric] = sum([Biomasses[each_year][x][each_metric] for x in Biomasses[each_year].keys()])
 
-                Biomasses_Agg[each_year]= {'total_live_trees': sum([Biomasses[each_year][x]['total_live_trees'] for x in Biomasses[each_year].keys()]), 'total_dead_trees': sum([Biomasses[each_year][x]['total_dead_trees'] for x in Biomasses[each_year].keys()]), 'total_ingrowth_trees': sum([Biomasses[each_year][x]['total_ingrowth_trees'] for x in Biomasses[each_year].keys()]), 'total_live_basal': sum([Biomasses[each_year][x]['total_live_basal'] for x in Biomasses[each_year].keys()]), 'total_dead_basal': sum([Biomasses[each_year][x]['total_dead_basal'] for x in Biomasses[each_year].keys()]), 'total_ingrowth_basal': sum([Biomasses[each_year][x]['total_ingrowth_basal'] for x in Biomasses[each_year].keys()]), 'total_live_bio': sum([Biomasses[each_year][x]['total_live_bio'] for x in Biomasses[each_year].keys()]), 'total_dead_bio': sum([Biomasses[each_year][x]['total_dead_bio'] for x in Biomasses[each_year].keys()]), 'total_ingrowth_bio': sum([Biomasses[each_year][x]['total_ingrowth_bio'] for x in Biomasses[each_year].keys()]), 'total_live_volume': sum([Biomasses[each_year][x]['total_live_volume'] for x in Biomasses[each_year].keys()]), 'total_dead_volume': sum([Biomasses[each_year][x]['total_dead_volume'] for x in Biomasses[each_year].keys()]), 'total_ingrowth_volume': sum([Biomasses[each_year][x]['total_ingrowth_volume'] for x in Biomasses[each_year].keys()]), 'total_live_jenkins': sum([Biomasses[each_year][x]['total_live_jenkins'] for x in Biomasses[each_year].keys()]), 'total_dead_jenkins': sum([Biomasses[each_year][x]['total_dead_jenkins'] for x in Biomasses[each_year].keys()]), 'total_ingrowth_jenkins': sum([Biomasses[each_year][x]['total_ingrowth_jenkins'] for x in Biomasses[each_year].keys()])}
+        return Biomasses_Agg
 
-            elif each_year in Biomasses_Agg:
-                print("the year has already been included in aggregate biomass- what's up on line 869?")
+    def portion_rows(self, Portion, each_year, each_species, num_plots):
+        """ The `INGROWTH`, `LIVE`, and `MORT` rows of one year and species of a portion from ``compute_biomasses``, on a per hectare basis.
 
-        return Biomasses_Agg
+        **INPUTS**
+
+        :Portion: the portion of the stand at one dbh threshold, by year and species
+        :each_year: the year
+        :each_species: the species
+        :num_plots: the number of plots in the year
+
+        **RETURNS**
+
+        :rows: a list of three rows, each like `['TP001', '06', STANDID, SPECIES, YEAR, PORTION, TPH_NHA, BA_M2HA, VOL_M3HA, BIO_MGHA, JENKBIO_MGHA, NO_PLOTS]`
+        """
+        rows = []
+
+        for each_group, each_label in [('ingrowth', 'INGROWTH'), ('live', 'LIVE'), ('dead', 'MORT')]:
+
+            # remember to multiply by 10000 to go from m2 to hectare
+            new_row = ['TP001', '06', self.standid.upper(), each_species.upper(), each_year, each_label, math.ceil(Portion[each_year][each_species]['total_' + each_group + '_trees']*10000), round(Portion[each_year][each_species]['total_' + each_group + '_basal']*10000, 3), round(Portion[each_year][each_species]['total_' + each_group + '_volume']*10000,3), round(Portion[each_year][each_species]['total_' + each_group + '_bio']*10000,3), round(Portion[each_year][each_species]['total_' + each_group + '_jenkins']*10000,3), num_plots]
+
+            rows.append(new_row)
+
+        return rows
 
     def write_stand_rob(self, RobBiomass, XFACTOR, *args):
         """ quick little method that ignores all the detail plot (trees < 15.)
 
-        .. note:: This is NOT a permanent script. It is here to help look at detail plots. It should not be considered final.
+        .. note:: This is NOT a permanent script. It is here to help look at detail plots. It should not be considered final. For other dbh cutoffs, see ``write_stand_portions``.
         """
 
         if args and args != []:
@@ -1001,23 +1611,49 @@ class Stand(object):
                 num_plots = self.num_plots[each_year]
 
                 for each_species in RobBiomass[each_year]:
+                    for new_row in self.portion_rows(RobBiomass, each_year, each_species, num_plots):
+                        writer.writerow(new_row)
 
-                    # remember to multiply by 10000 to go from m2 to hectare
-                    new_row_1 = ['TP001', '06', self.standid.upper(), each_species.upper(), each_year,'INGROWTH', math.ceil(RobBiomass[each_year][each_species]['total_ingrowth_trees']*10000), round(RobBiomass[each_year][each_species]['total_ingrowth_basal']*10000, 3), round(RobBiomass[each_year][each_species]['total_ingrowth_volume']*10000,3), round(RobBiomass[each_year][each_species]['total_ingrowth_bio']*10000,3), round(RobBiomass[each_year][each_species]['total_ingrowth_jenkins']*10000,3), num_plots]
+    def write_stand_portions(self, Portions, XFACTOR, *args):
+        """ Writes the portions of the stand at or above each dbh threshold, as computed by ``compute_biomasses`` when it is given thresholds. Each threshold gets its own `INGROWTH`, `LIVE`, and `MORT` rows, with the threshold in the `DBH_MIN_CM` column.
 
-                    #writer.writerow(new_row)
+        .. Example:
 
-                    # remember to multiply by 10000 to go from m2 to hectare
-                    new_row_2 = ['TP001', '06', self.standid.upper(), each_species.upper(), each_year,'LIVE', math.ceil(RobBiomass[each_year][each_species]['total_live_trees']*10000), round(RobBiomass[each_year][each_species]['total_live_basal']*10000, 3), round(RobBiomass[each_year][each_species]['total_live_volume']*10000,3), round(RobBiomass[each_year][each_species]['total_live_bio']*10000,3), round(RobBiomass[each_year][each_species]['total_live_jenkins']*10000,3), num_plots]
+        >>> BM, BTR, Portions = A.compute_biomasses(XFACTOR, [10.0, 15.0, 25.0, 50.0])
+        >>> A.write_stand_portions(Portions, XFACTOR)
 
-                    #writer.writerow(new_row)
+        **INPUTS**
 
-                    # remember to multiply by 10000 to go from m2 to hectare
-                    new_row_3 = ['TP001', '06', self.standid.upper(), each_species.upper(), each_year,'MORT', math.ceil(RobBiomass[each_year][each_species]['total_dead_trees']*10000), round(RobBiomass[each_year][each_species]['total_dead_basal']*10000, 3), round(RobBiomass[each_year][each_species]['total_dead_volume']*10000,3), round(RobBiomass[each_year][each_species]['total_dead_bio']*10000,3), round(RobBiomass[each_year][each_species]['total_dead_jenkins']*10000,3), num_plots]
+        :Portions: a dictionary of portions keyed by threshold, from ``compute_biomasses``
+        :XFACTOR: the reference object used for computing areas and such.
+        :args: two arguements, a csv filename and a mode of write or append
 
-                    writer.writerow(new_row_1)
-                    writer.writerow(new_row_2)
-                    writer.writerow(new_row_3)
+        **RETURNS**
+
+        A csv file of the portions, by threshold, year, and species.
+        """
+
+        if args and args != []:
+            filename_out = args[0]
+            mode = args[1]
+        else:
+            filename_out = self.standid + "_stand_portions_output.csv"
+            mode = 'w'
+
+        with open(filename_out,mode) as writefile:
+            writer = csv.writer(writefile, delimiter = ",", quoting=csv.QUOTE_NONNUMERIC)
+
+            writer.writerow(['DBCODE','ENTITY','STANDID','SPECIES','YEAR','DBH_MIN_CM','PORTION','TPH_NHA','BA_M2HA','VOL_M3HA','BIO_MGHA','JENKBIO_MGHA', 'NO_PLOTS'])
+
+            for each_threshold in sorted(Portions.keys()):
+
+                for each_year in sorted(Portions[each_threshold].keys()):
+
+                    num_plots = self.num_plots[each_year]
+
+                    for each_species in Portions[each_threshold][each_year]:
+                        for new_row in self.portion_rows(Portions[each_threshold], each_year, each_species, num_plots):
+                            writer.writerow(new_row[:5] + [each_threshold] + new_row[5:])
 
     def write_stand_composite(self, Biomasses, Biomasses_Agg, XFACTOR, *args):
         """ Generates an output file which combines the Trees Per Hectare (TPH), Biomass ( Mg ), Volume (m\ :sup:`3`), Jenkins' Biomass ( Mg ), Basal Area (m \ :sup:`2`) by species with a row of "all" containing the composite TPH, Biomass ( Mg ), Volume (m\ :sup:`3`), Jenkins' Biomass ( Mg ), and Basal Area (m \ :sup:`2`)
@@ -1142,28 +1778,25 @@ class Stand(object):
                 pass
 
 
-            for each_year in sorted([x for x in self.od.keys() if x != None]):
-                for each_species in self.od[each_year].keys():
+            layout = self.table.layout()
+            results = self.tree_results
 
-                    my_component = self.component_dict[each_species]
-                    for each_plot in self.od[each_year][each_species].keys():
+            for each_year in sorted([x for x in layout.keys() if x != None]):
+                for each_species in layout[each_year].keys():
 
-                        try:
-                            live_trees= {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'status': v[1], 'raw':v[3]} for k,v in self.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] >= 5.0}
+                    my_component = self.component_dict[each_species]
+                    for each_plot in layout[each_year][each_species]:
 
-                        except Exception:
-                            live_trees= {k: {'bio': self.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'status': v[1], 'raw':v[3]} for k,v in self.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] >= 5.0}
+                        # trees of 5 cm or more are written; the measurements are read from the metric columns
+                        live_trees = {k: row for k,row in results.rows(each_year, each_species, each_plot, 'live').items() if results.dbh[row] >= 5.0}
 
-                        try:
-                            dead_trees= {k: {'bio': self.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'status': v[1], 'raw':v[3]} for k,v in self.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] >= 5.0}
-                        except Exception:
-                            dead_trees= {k: {'bio': self.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4), 'status': v[1], 'raw':v[3]} for k,v in self.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] >= 5.0}
+                        dead_trees = {k: row for k,row in results.rows(each_year, each_species, each_plot, 'dead').items() if results.dbh[row] >= 5.0}
 
-                        for each_tree in live_trees.keys():
-                            writer.writerow(['TP001', '11', each_tree.upper(), my_component.upper(), each_year, live_trees[each_tree]['raw'], live_trees[each_tree]['ba'], round(live_trees[each_tree]['bio'][1],4), live_trees[each_tree]['bio'][0], live_trees[each_tree]['bio'][2]])
+                        for each_tree, row in live_trees.items():
+                            writer.writerow(['TP001', '11', each_tree.upper(), my_component.upper(), each_year, results.get_raw_year(row), results.basal[row], round(results.volume[row],4), results.biomass[row], results.jenkins[row]])
 
-                        for each_tree in dead_trees.keys():
-                            writer.writerow(['TP001', '11', each_tree.upper(), my_component.upper(), each_year, dead_trees[each_tree]['raw'], dead_trees[each_tree]['ba'], round(dead_trees[each_tree]['bio'][1],4), dead_trees[each_tree]['bio'][0], dead_trees[each_tree]['bio'][2]])
+                        for each_tree, row in dead_trees.items():
+                            writer.writerow(['TP001', '11', each_tree.upper(), my_component.upper(), each_year, results.get_raw_year(row), results.basal[row], round(results.volume[row],4), results.biomass[row], results.jenkins[row]])
 
 
 class Plot(Stand):
@@ -1190,6 +1823,8 @@ class Plot(Stand):
     def compute_biomasses_plot(self, XFACTOR):
         """ Compute the biomass ( Mg/ha ), volume (m\ :sup:`3`), Jenkins biomass ( Mg/ha ), TPH (number of trees/ ha), and basal area (m\ :sup:`2` / ha). Use at the plot scale, so no expansion factors are needed here.
 
+        The per-plot sums come from the Stand's ``grouped_results``, which ``Stand.compute_biomasses`` also uses, so computing both the stand and the plot outputs only walks the trees once.
+
         **INPUTS**
 
         :XFACTOR: An instance of the Capture object used for parameterization.
@@ -1200,13 +1835,17 @@ class Plot(Stand):
         """
         Biomasses = {}
 
-        all_years = sorted([x for x in self.Stand.od.keys() if x != None])
+        layout = self.Stand.table.layout()
+        buckets, _ = self.Stand.grouped_results(XFACTOR)
+        context = self.Stand.plot_context(XFACTOR)
+
+        all_years = sorted([x for x in layout.keys() if x != None])
 
         for index, each_year in enumerate(all_years):
 
-            for each_species in self.Stand.od[each_year].keys():
+            for each_species in layout[each_year].keys():
 
-                for each_plot in self.Stand.od[each_year][each_species].keys():
+                for each_plot in layout[each_year][each_species]:
 
                     # so you can specify a plot or set of plots if you want - if it's empty we do all the plots, if not, we skip that plot we already have
                     if self.plotlist !=[] and each_plot.lower() not in self.plotlist:
@@ -1214,111 +1853,28 @@ class Plot(Stand):
                     else:
                         pass
 
-                    if self.Stand.standid not in XFACTOR.uplot_areas.keys():
-                        total_area = 625.
+                    total_area = context[(each_year, each_plot)]['plot_area']
 
-                    elif each_plot not in XFACTOR.uplot_areas[self.Stand.standid]:
-                        total_area = 625.
+                    # the plot scale counts the large trees and the small trees over the plot scale minimum dbh, per unit area of the plot
+                    totals = {}
 
-                    else:
-                        try:
-                            total_area = XFACTOR.uplot_areas[self.Stand.standid][each_plot][each_year]
-                        except Exception:
-                            try:
-                                total_area = XFACTOR.uplot_areas[self.Stand.standid][each_plot][all_years[index-1]]
-                            except Exception:
-                                print("exception thrown trying to get the plot area for " + each_plot + " in " + str(each_year))
-
-                    # try to find the plot in the unusual mins reference
-                    try:
-                        mindbh = XFACTOR.umins_reference[self.Stand.standid][each_year][each_plot]
-                    except KeyError as exc:
-                        mindbh = 15.0
-
-                    # try to find the plot in the unusual areas reference
-                    try:
-                        area = XFACTOR.uplot_areas[self.Stand.standid][each_plot][each_year]
-                    except KeyError as exc:
-                        area = 625.
-
-
-                    try:
-                        large_dead_trees = {k: {'bio': self.Stand.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] >= 15.0}
-                    except Exception:
-                        large_dead_trees = {k: {'bio': self.Stand.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] >= 15.0}
-
-                    small_dead_trees = {k: {'bio': self.Stand.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['dead'].items() if v[0] != None and v[0] < 15.0 and v[0] > mindbh}
-
-                    try:
-                        large_live_trees = {k: {'bio': self.Stand.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] >= 15.0}
-                    except Exception:
-                        large_live_trees = {k: {'bio': self.Stand.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] >= 15.0}
-
-                    small_live_trees = {k: {'bio': self.Stand.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['live'].items() if v[0] != None and v[0] < 15.0 and v[0] > mindbh}
-
-                    try:
-                        large_ingrowth_trees = {k: {'bio': self.Stand.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['ingrowth'].items() if v[0] != None and v[0] >= 15.0}
-                    except Exception:
-                        large_ingrowth_trees = {k: {'bio': self.Stand.eqns[each_species]['normal'](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['ingrowth'].items() if v[0] != None and v[0] >= 15.0}
-
-                    small_ingrowth_trees = {k: {'bio': self.Stand.eqns[each_species][biomass_basis.maxref(v[0], each_species)](v[0]), 'ba': round(0.00007854*float(v[0])*float(v[0]),4)} for k,v in self.Stand.od[each_year][each_species][each_plot]['ingrowth'].items() if v[0] != None and v[0] < 15.0 and v[0] > mindbh}
-
-
-                    # count the number of total dead, live, and ingrowth trees by the plot
-                    try:
-                        total_dead_trees = (len(large_dead_trees)/total_area + len(small_dead_trees)/total_area)
-                    except Exception:
-                        total_dead_trees = 0.
-
-                    try:
-                        total_live_trees = (len(large_live_trees)/total_area + len(small_live_trees)/total_area)
-                    except Exception:
-                        total_live_trees = 0.
-
-                    try:
-                        total_ingrowth_trees = (len(large_ingrowth_trees)/total_area + len(small_ingrowth_trees)/total_area)
-                    except Exception:
-                        total_ingrowth_trees = 0.
-
-                    # compute the totals
-
-                    try:
-                        total_live_bio = sum([large_live_trees[tree]['bio'][0]/total_area for tree in large_live_trees.keys()]) + sum([small_live_trees[tree]['bio'][0]/total_area for tree in small_live_trees.keys()])
-                    except Exception:
-                        import pdb; pdb.set_trace()
-                    total_ingrowth_bio = sum([large_ingrowth_trees[tree]['bio'][0]/total_area for tree in large_ingrowth_trees.keys()])+ sum([small_ingrowth_trees[tree]['bio'][0]/total_area for tree in small_ingrowth_trees.keys()])
-                    total_dead_bio = sum([large_dead_trees[tree]['bio'][0]/total_area for tree in large_dead_trees.keys()]) + sum([small_dead_trees[tree]['bio'][0]/total_area for tree in small_dead_trees.keys()])
-
-                    total_live_jenkins = sum([large_live_trees[tree]['bio'][2]/total_area for tree in large_live_trees.keys()]) + sum([small_live_trees[tree]['bio'][2]/total_area for tree in small_live_trees.keys()])
-                    total_ingrowth_jenkins = sum([large_ingrowth_trees[tree]['bio'][2]/total_area for tree in large_ingrowth_trees.keys()])  + sum([small_ingrowth_trees[tree]['bio'][2]/total_area for tree in small_ingrowth_trees.keys()])
-                    total_dead_jenkins = sum([large_dead_trees[tree]['bio'][2]/total_area for tree in large_dead_trees.keys()]) + sum([small_dead_trees[tree]['bio'][2]/total_area for tree in small_dead_trees.keys()])
-
-                    total_live_volume = sum([large_live_trees[tree]['bio'][1]/total_area for tree in large_live_trees.keys()])  + sum([small_live_trees[tree]['bio'][1]/total_area for tree in small_live_trees.keys()])
-                    total_ingrowth_volume = sum([large_ingrowth_trees[tree]['bio'][1]/total_area for tree in large_ingrowth_trees.keys()]) + sum([small_ingrowth_trees[tree]['bio'][1]/total_area for tree in small_ingrowth_trees.keys()])
-                    total_dead_volume = sum([large_dead_trees[tree]['bio'][1]/total_area for tree in large_dead_trees.keys()]) + sum([small_dead_trees[tree]['bio'][1]/total_area for tree in small_dead_trees.keys()])
-
-                    total_live_basal = sum([large_live_trees[tree]['ba']/total_area for tree in large_live_trees.keys()]) + sum([small_live_trees[tree]['ba']/total_area for tree in small_live_trees.keys()])
-                    total_ingrowth_basal = sum([large_ingrowth_trees[tree]['ba']/total_area for tree in large_ingrowth_trees.keys()])+  sum([small_ingrowth_trees[tree]['ba']/total_area for tree in small_ingrowth_trees.keys()])
-                    total_dead_basal = sum([large_dead_trees[tree]['ba']/total_area for tree in large_dead_trees.keys()]) + sum([small_dead_trees[tree]['ba']/total_area for tree in small_dead_trees.keys()])
+                    for each_group in ['live', 'dead', 'ingrowth']:
+                        large = self.Stand.plot_bucket(buckets, each_year, each_species, each_plot, each_group, ['large'])
+                        small = self.Stand.plot_bucket(buckets, each_year, each_species, each_plot, each_group, ['small', 'small_plot'])
 
+                        for index_metric, each_metric in enumerate(BUCKET_METRICS):
+                            totals['total_' + each_group + '_' + each_metric] = large[index_metric]/total_area + small[index_metric]/total_area
 
                     if each_year not in Biomasses:
-                        Biomasses[each_year] = {each_species : {each_plot : {'total_live_bio': total_live_bio, 'total_dead_bio' : total_dead_bio, 'total_ingrowth_bio': total_ingrowth_bio, 'total_live_jenkins': total_live_jenkins, 'total_ingrowth_jenkins': total_ingrowth_jenkins, 'total_dead_jenkins' : total_dead_jenkins, 'total_live_volume' : total_live_volume, 'total_dead_volume' : total_dead_volume, 'total_ingrowth_volume': total_ingrowth_volume, 'total_live_trees': total_live_trees, 'total_dead_trees': total_dead_trees, 'total_ingrowth_trees': total_ingrowth_trees, 'total_live_basal': total_live_basal,'total_ingrowth_basal': total_ingrowth_basal, 'total_dead_basal': total_dead_basal}}}
+                        Biomasses[each_year] = {}
 
+                    if each_species not in Biomasses[each_year]:
+                        Biomasses[each_year][each_species] = {}
 
-                    elif each_year in Biomasses:
-
-                        if each_species not in Biomasses[each_year]:
-                            Biomasses[each_year][each_species]= {each_plot : {'total_live_bio': total_live_bio, 'total_dead_bio' : total_dead_bio, 'total_ingrowth_bio': total_ingrowth_bio, 'total_live_jenkins': total_live_jenkins, 'total_ingrowth_jenkins': total_ingrowth_jenkins, 'total_dead_jenkins' : total_dead_jenkins, 'total_live_volume' : total_live_volume, 'total_dead_volume' : total_dead_volume, 'total_ingrowth_volume': total_ingrowth_volume, 'total_live_trees': total_live_trees, 'total_dead_trees': total_dead_trees, 'total_ingrowth_trees': total_ingrowth_trees, 'total_live_basal': total_live_basal, 'total_dead_basal': total_dead_basal, 'total_ingrowth_basal': total_ingrowth_basal}}
-
-                        # don't need to augment the wood density - one time is enough! - this is adding in each of the plots, which are already on area basis
-                        elif each_species in Biomasses[each_year]:
-                            if each_plot not in Biomasses[each_year][each_species]:
-                                Biomasses[each_year][each_species][each_plot] = {'total_live_bio': total_live_bio, 'total_dead_bio' : total_dead_bio, 'total_ingrowth_bio': total_ingrowth_bio, 'total_live_jenkins': total_live_jenkins, 'total_ingrowth_jenkins': total_ingrowth_jenkins, 'total_dead_jenkins' : total_dead_jenkins, 'total_live_volume' : total_live_volume, 'total_dead_volume' : total_dead_volume, 'total_ingrowth_volume': total_ingrowth_volume, 'total_live_trees': total_live_trees, 'total_dead_trees': total_dead_trees, 'total_ingrowth_trees': total_ingrowth_trees, 'total_live_basal': total_live_basal, 'total_dead_basal': total_dead_basal, 'total_ingrowth_basal': total_ingrowth_basal}
-                            elif each_plot in Biomasses[each_year][each_species]:
-                                print("error, you have already processed " + each_plot)
-                        else:
-                            pass
+                    if each_plot not in Biomasses[each_year][each_species]:
+                        Biomasses[each_year][each_species][each_plot] = totals
+                    else:
+                        print("error, you have already processed " + each_plot)
 
         return Biomasses
 
@@ -1342,48 +1898,18 @@ class Plot(Stand):
             for each_species in Biomasses[each_year].keys():
 
                 for each_plot in Biomasses[each_year][each_species].keys():
+                    totals = Biomasses[each_year][each_species][each_plot]
 
                     if each_plot not in Biomasses_Agg:
+                        Biomasses_Agg[each_plot] = {}
+
+                    if each_year not in Biomasses_Agg[each_plot]:
+                        Biomasses_Agg[each_plot][each_year] = {each_metric: totals[each_metric] for each_metric in TOTAL_METRICS}
 
-                        Biomasses_Agg[each_plot] = { each_year: {
-                        'total_live_trees': Biomasses[each_year][each_species][each_plot]['total_live_trees'],
-                        'total_dead_trees': Biomasses[each_year][each_species][each_plot]['total_dead_trees'],
-                        'total_ingrowth_trees': Biomasses[each_year][each_species][each_plot]['total_ingrowth_trees'],
-                        'total_live_basal': Biomasses[each_year][each_species][each_plot]['total_live_basal'],
-                        'total_dead_basal': Biomasses[each_year][each_species][each_plot]['total_dead_basal'],
-                        'total_ingrowth_basal': Biomasses[each_year][each_species][each_plot]['total_ingrowth_basal'],
-                        'total_live_bio': Biomasses[each_year][each_species][each_plot]['total_live_bio'],
-                        'total_dead_bio': Biomasses[each_year][each_species][each_plot]['total_dead_bio'],
-                        'total_ingrowth_bio': Biomasses[each_year][each_species][each_plot]['total_ingrowth_bio'],
-                        'total_live_volume': Biomasses[each_year][each_species][each_plot]['total_live_volume'],
-                        'total_dead_volume': Biomasses[each_year][each_species][each_plot]['total_dead_volume'],
-                        'total_ingrowth_volume': Biomasses[each_year][each_species][each_plot]['total_ingrowth_volume'],
-                        'total_live_jenkins': Biomasses[each_year][each_species][each_plot]['total_live_jenkins'],
-                        'total_dead_jenkins': Biomasses[each_year][each_species][each_plot]['total_dead_jenkins'],
-                        'total_ingrowth_jenkins': Biomasses[each_year][each_species][each_plot]['total_ingrowth_jenkins']}}
-
-                    elif each_plot in Biomasses_Agg:
-
-                        if each_year not in Biomasses_Agg[each_plot]:
-                            Biomasses_Agg[each_plot][each_year] = {'total_live_trees': Biomasses[each_year][each_species][each_plot]['total_live_trees'],'total_dead_trees': Biomasses[each_year][each_species][each_plot]['total_dead_trees'], 'total_ingrowth_trees': Biomasses[each_year][each_species][each_plot]['total_ingrowth_trees'], 'total_live_basal': Biomasses[each_year][each_species][each_plot]['total_live_basal'], 'total_dead_basal': Biomasses[each_year][each_species][each_plot]['total_dead_basal'], 'total_ingrowth_basal': Biomasses[each_year][each_species][each_plot]['total_ingrowth_basal'], 'total_live_bio': Biomasses[each_year][each_species][each_plot]['total_live_bio'], 'total_dead_bio': Biomasses[each_year][each_species][each_plot]['total_dead_bio'], 'total_ingrowth_bio': Biomasses[each_year][each_species][each_plot]['total_ingrowth_bio'], 'total_live_volume': Biomasses[each_year][each_species][each_plot]['total_live_volume'], 'total_dead_volume': Biomasses[each_year][each_species][each_plot]['total_dead_volume'], 'total_ingrowth_volume': Biomasses[each_year][each_species][each_plot]['total_ingrowth_volume'], 'total_live_jenkins': Biomasses[each_year][each_species][each_plot]['total_live_jenkins'], 'total_dead_jenkins': Biomasses[each_year][each_species][each_plot]['total_dead_jenkins'], 'total_ingrowth_jenkins': Biomasses[each_year][each_species][each_plot]['total_ingrowth_jenkins']}
-
-                        # if you already have that year and plot, just add whatever the heck species it is.
-                        elif each_year in Biomasses_Agg[each_plot]:
-                            Biomasses_Agg[each_plot][each_year]['total_live_trees'] += Biomasses[each_year][each_species][each_plot]['total_live_trees']
-                            Biomasses_Agg[each_plot][each_year]['total_dead_trees'] += Biomasses[each_year][each_species][each_plot]['total_dead_trees']
-                            Biomasses_Agg[each_plot][each_year]['total_ingrowth_trees'] += Biomasses[each_year][each_species][each_plot]['total_ingrowth_trees']
-                            Biomasses_Agg[each_plot][each_year]['total_live_basal'] += Biomasses[each_year][each_species][each_plot]['total_live_basal']
-                            Biomasses_Agg[each_plot][each_year]['total_dead_basal'] += Biomasses[each_year][each_species][each_plot]['total_dead_basal']
-                            Biomasses_Agg[each_plot][each_year]['total_ingrowth_basal'] += Biomasses[each_year][each_species][each_plot]['total_ingrowth_basal']
-                            Biomasses_Agg[each_plot][each_year]['total_live_bio'] += Biomasses[each_year][each_species][each_plot]['total_live_bio']
-                            Biomasses_Agg[each_plot][each_year]['total_dead_bio'] += Biomasses[each_year][each_species][each_plot]['total_dead_bio']
-                            Biomasses_Agg[each_plot][each_year]['total_ingrowth_bio'] += Biomasses[each_year][each_species][each_plot]['total_ingrowth_bio']
-                            Biomasses_Agg[each_plot][each_year]['total_live_volume'] += Biomasses[each_year][each_species][each_plot]['total_live_volume']
-                            Biomasses_Agg[each_plot][each_year]['total_dead_volume'] += Biomasses[each_year][each_species][each_plot]['total_dead_volume']
-                            Biomasses_Agg[each_plot][each_year]['total_ingrowth_volume'] += Biomasses[each_year][each_species][each_plot]['total_ingrowth_volume']
-                            Biomasses_Agg[each_plot][each_year]['total_live_jenkins'] += Biomasses[each_year][each_species][each_plot]['total_live_jenkins']
-                            Biomasses_Agg[each_plot][each_year]['total_dead_jenkins'] += Biomasses[each_year][each_species][each_plot]['total_dead_jenkins']
-                            Biomasses_Agg[each_plot][each_year]['total_ingrowth_jenkins'] += Biomasses[each_year][each_species][each_plot]['total_ingrowth_jenkins']
+                    # if you already have that year and plot, just add whatever the heck species it is.
+                    else:
+                        for each_metric in TOTAL_METRICS:
+                            Biomasses_Agg[each_plot][each_year][each_metric] += totals[each_metric]
 
         return Biomasses_Agg
 
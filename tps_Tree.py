@@ -216,7 +216,7 @@ class Tree(object):
 
         try:
             list_of_biomasses = [self.eqns[biomass_basis.maxref(x, self.species)](x) for (_,x,_,_) in self.state]
-            list_of_basal = [round(0.00007854*float(x)*float(x),6) for (_,x,_,_) in self.state]
+            list_of_basal = [biomass_basis.basal_area(x, 6) for (_,x,_,_) in self.state]
             
             return list_of_biomasses, list_of_basal
         
@@ -233,7 +233,7 @@ class Tree(object):
             else:
                 try:
                     list_of_biomasses = [self.eqns['normal'](x) for (_,x,_,_) in self.state]
-                    list_of_basal = [round(0.00007854*float(x)*float(x),6) for (_,x,_,_) in self.state]
+                    list_of_basal = [biomass_basis.basal_area(x, 6) for (_,x,_,_) in self.state]
                     
                     return list_of_biomasses, list_of_basal
                 
@@ -251,7 +251,7 @@ class Tree(object):
                                     pass
                         
                         list_of_biomasses = [self.eqns['normal'](x) for (_,x,_,_) in self.state]
-                        list_of_basal = [round(0.00007854*float(x)*float(x),6) for (_,x,_,_) in self.state]
+                        list_of_basal = [biomass_basis.basal_area(x, 6) for (_,x,_,_) in self.state]
 
                         return list_of_biomasses, list_of_basal
                     
@@ -266,7 +266,7 @@ class Tree(object):
                                 
                                 list_of_biomasses = [self.eqns[biomass_basis.maxref(x, self.species)](x) for (_,x,_,_) in self.state[:-1]]
 
-                                list_of_basal = [round(0.00007854*float(x)*float(x),6) for (_,x,_,_) in self.state[:-1]]
+                                list_of_basal = [biomass_basis.basal_area(x, 6) for (_,x,_,_) in self.state[:-1]]
                                 
                                 final_biomasses = list_of_biomasses[-1]
                                 final_basal = list_of_basal[-1]
@@ -582,8 +582,7 @@ class Tree(object):
                         writer.writerow(new_row)
 
                     else:
-                        print("an unexpected error has occured while trying to print individual tree output, please debug. check the inputs in tp00101 and the equations in tp00110")
-                        import pdb; pdb.set_trace()
+                        poptree_basis.debug_here("an unexpected error has occured while trying to print individual tree output, please debug. check the inputs in tp00101 and the equations in tp00110", {'treeid': self.tid, 'year': each_state[0]})
 
 
         # writes the checks output, if it can be written, otherwise, just goes on.
@@ -660,8 +659,7 @@ class Tree(object):
                         writer.writerow(new_row)
 
                     else:
-                        print("an unexpected error has occured while trying to print individual tree output, please debug. check the inputs in tp00101 and the equations in tp00110")
-                        import pdb; pdb.set_trace()
+                        poptree_basis.debug_here("an unexpected error has occured while trying to print individual tree output, please debug. check the inputs in tp00101 and the equations in tp00110", {'treeid': self.tid, 'year': each_state[0]})
 
 
     def only_output_checks(self, Checks, checkfile = 'all_indv_tree_checks.csv', mode='wt'):
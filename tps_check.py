@@ -93,8 +93,15 @@ class QC(object):
 
         A = Stand(cur, pcur, XFACTOR, queries, self.target)
 
-        BM, BTR = A.compute_normal_biomasses(XFACTOR)
-        
+        # the population checks need the names of the trees, which are only kept when asked for
+        BM, BTR, _ = A.compute_biomasses(XFACTOR, keep_names=True)
+
+        # the names come back as arrays of tree codes; the checks compare treeids, so turn them back into lists of treeids
+        for each_year in BM:
+            for each_species in BM[each_year]:
+                for each_key in ['name_live', 'name_mort', 'name_ingrowth']:
+                    BM[each_year][each_species][each_key] = A.tree_names(BM[each_year][each_species][each_key])
+
         if BM == {}:
             Biomasses, BadTreeSpec = A.compute_special_biomasses(XFACTOR)
 
@@ -148,11 +155,11 @@ def population_check(self):
             for each_species in first_species_list:
                 if each_species not in second_species_list:
 
-                    name_dead = self.BM[first_year][each_species]['name_dead']
+                    name_dead = self.BM[first_year][each_species]['name_mort']
                     name_live = self.BM[first_year][each_species]['name_live']
                     name_ingrowth = self.BM[first_year][each_species]['name_ingrowth']
                     name_live_2 = self.BM[each_year][each_species]['name_live']
-                    name_dead_2 = self.BM[each_year][each_species]['name_dead']
+                    name_dead_2 = self.BM[each_year][each_species]['name_mort']
 
                 # check if some trees randomly appear - same check as the ingrowth tree lost check below, except can occur within a species which does not disappear
                 elif each_species in second_species_list:
@@ -7,11 +7,29 @@ import biomass_basis
 import tps_Tree
 import tps_Stand
 import tps_NPP
+import execution_basis
+import jobs_basis
 import math
 import csv
 import sys
 import argparse
 
+### put together the shards of an --all run; this does not need the database
+if len(sys.argv) >= 3 and sys.argv[1] == "merge":
+
+    merge_parser = argparse.ArgumentParser(prog="tps_cli.py merge", description="Put together the outputs of the shards of an --all run made with --shard, in the order of the run, from their manifests.")
+    merge_parser.add_argument("manifests", nargs="+", help="The manifest (.json) of every shard, like `all_stands_biomass_composite_output.shard-*-of-4.json`")
+    merge_parser.add_argument("--output", default=None, help="The csv file for the merged output; the file of the regular --all run if not given")
+    merge_args = merge_parser.parse_args(sys.argv[2:])
+
+    try:
+        execution_basis.merge_shards(merge_args.manifests, merge_args.output)
+    except ValueError as error:
+        print("the shards were not merged: " + str(error))
+        sys.exit(1)
+
+    sys.exit(0)
+
 ### CREATE CONNECTION OBJECTS GLOBALLY HERE !! ###
 
 DATABASE_CONNECTION = poptree_basis.YamlConn()
@@ -37,17 +55,212 @@ if num_args == 3 and sys.argv[1] == "dtx":
 else:
     pass
 
+### run again only the stands and trees a --batch run quarantined
+if num_args >= 3 and sys.argv[1] == "retry":
+
+    retry_parser = argparse.ArgumentParser(prog="tps_cli.py retry", description="Run again only the stands and trees in the quarantine file of a --batch run, writing them to retry files next to the outputs of their runs. The units that fail again are kept in the quarantine file; if none do, it is renamed with `.done` at the end.")
+    retry_parser.add_argument("quarantine", help="The quarantine file, like `quarantine.jsonl`")
+    retry_parser.add_argument("--debug", action="store_true", help="Stop at the debugger on bad data instead of quarantining the units again")
+    retry_args = retry_parser.parse_args(sys.argv[2:])
+
+    execution_basis.retry_quarantined(cur, XFACTOR, queries, retry_args.quarantine, retry_args.debug)
+
+    sys.exit(0)
+
+### run a batch of jobs from a YAML file at the same time, sharing XFACTOR
+if num_args >= 3 and sys.argv[1] == "jobs":
+
+    jobs_parser = argparse.ArgumentParser(prog="tps_cli.py jobs", description="Run a batch of biomass, NPP, and tree jobs from a YAML file at the same time, sharing one set of reference tables and equations. See `jobs_basis.read_jobs` for the format of the file.")
+    jobs_parser.add_argument("jobfile", help="The YAML file listing the jobs")
+    jobs_parser.add_argument("--workers", type=int, default=2, help="The number of processes computing stands")
+    jobs_parser.add_argument("--threads", type=int, default=4, help="The number of threads, each with its own connection, running queries")
+    jobs_parser.add_argument("--queue-depth", type=int, default=None, help="The most fetched stands held at once; twice --workers if not given")
+    jobs_parser.add_argument("--job-report", default="job_report.csv", help="The csv file for what became of each job")
+    jobs_parser.add_argument("--batch", action="store_true", help="Never stop at the debugger: trees of `tree` jobs that raise an error are quarantined and skipped, and any other job with bad data fails")
+    jobs_parser.add_argument("--quarantine", default="quarantine.jsonl", help="The file the trees set aside by --batch are recorded in")
+    jobs_args = jobs_parser.parse_args(sys.argv[2:])
+
+    if jobs_args.batch:
+        poptree_basis.BATCH = True
+        quarantine = execution_basis.Quarantine(jobs_args.quarantine)
+    else:
+        quarantine = None
+
+    try:
+        jobs = jobs_basis.read_jobs(jobs_args.jobfile)
+    except ValueError as error:
+        print("the jobs were not run: " + str(error))
+        sys.exit(1)
+
+    print("running " + str(len(jobs)) + " jobs from " + jobs_args.jobfile + " on " + str(jobs_args.threads) + " threads and " + str(jobs_args.workers) + " workers")
+
+    results = jobs_basis.run_jobs(jobs, queries, XFACTOR, jobs_args.workers, jobs_args.threads, jobs_args.queue_depth, quarantine)
+    jobs_basis.write_job_report(results, jobs_args.job_report)
+
+    if quarantine != None and quarantine.count > 0:
+        print(str(quarantine.count) + " trees were quarantined in " + quarantine.filename + "; run them again with `tps_cli.py retry " + quarantine.filename + "`")
+
+    sys.exit(0)
+
 ### otherwise process a good set of trees
 
 parser = argparse.ArgumentParser(description="""TPS computes the biomass, npp, volume, basal area, and trees per hectare for trees, plots, stands, and studies from the PSP studies.
     """)
 parser.add_argument("action", help="`bio` for biomass, `npp` for npp, `qc` for qc, `dtx` for details")
-parser.add_argument("scale", help="`stand` for stand-scale, `tree` for individual tree scale, `plot` for all plots at the stand-scale, `study` for all stands in one study")
+parser.add_argument("scale", help="`stand` for stand-scale, `tree` for individual tree scale, `plot` for all plots at the stand-scale, `study` for all stands in one study. A stand in more than one study is computed once by a plain `study --all` run, but once for each of its studies with --stream, --memory-budget, --resume, --batch, --workers, --pipeline, or --shard, and by runs of selected studies")
 parser.add_argument("analysis", help="`composite` for species/all species output at the stand scale, `tree` for individual trees at the chosen scale. If using the `tree` scale, you may also specify `checks` to run quality control")
 parser.add_argument("number", help="List stands, plots, studies, treeids, etc. here, one after another, separated by only spaces. The keyword --all will trigger an analysis of all the units you wish to compute at the chosen scale for the chosen analysis and action", nargs=argparse.REMAINDER)
+parser.add_argument("--stream", action="store_true", help="For --all runs of stands and plots: load, compute, and write one stand at a time, and record the time and memory of each stand in a run summary. Put this before the action, like `tps_cli.py --stream bio stand composite --all`")
+parser.add_argument("--memory-budget", type=float, default=None, help="A memory budget in MB for a streamed --all run. If the run is still over the budget after a stand, once garbage is collected, the run stops there with exit code 3 and can be resumed with --resume. Implies --stream")
+parser.add_argument("--run-summary", default="run_summary.csv", help="The csv file for the run summary of a streamed --all run")
+parser.add_argument("--batch", action="store_true", help="Never stop at the debugger on bad data. For --all runs that can be streamed: a stand that raises an error is recorded in the --quarantine file and skipped, and the run goes on; run the quarantined stands again with `tps_cli.py retry`. Implies --stream, and can not be combined with --workers, --pipeline, or --shard")
+parser.add_argument("--quarantine", default="quarantine.jsonl", help="The file the stands set aside by --batch are recorded in")
+parser.add_argument("--resume", action="store_true", help="For --all runs that can be streamed: go on from the last stand in the journal of a run that did not finish, instead of starting over. Implies --stream")
+parser.add_argument("--workers", type=int, default=1, help="For --all runs: the number of worker processes to spread the stands over. The largest stands are started first, and the output is written in the same order as a run on one process. Put this before the action, like `tps_cli.py --workers 8 bio stand composite --all`")
+parser.add_argument("--cost-report", default="stand_costs.csv", help="The csv file for the estimated and actual cost of each stand of an --all run on workers")
+parser.add_argument("--shard", type=execution_basis.parse_shard, default=None, help="For --all runs: compute only shard i of n, like `--shard 2/4`, for spreading a run over n machines; put the shards together with `tps_cli.py merge`. Put this before the action, like `tps_cli.py --shard 2/4 bio stand composite --all`")
+parser.add_argument("--pipeline", action="store_true", help="For --all runs: fetch the stands on --fetchers threads, compute them on --workers processes, and write them on one writer, all at once, and report how busy each stage was. Put this before the action, like `tps_cli.py --pipeline --workers 8 bio stand composite --all`")
+parser.add_argument("--fetchers", type=int, default=2, help="For --pipeline runs: the number of threads fetching stands from the database")
+parser.add_argument("--queue-depth", type=int, default=None, help="For --pipeline runs: the most fetched stands waiting to be computed; twice --workers if not given")
+parser.add_argument("--pipeline-report", default="pipeline_report.csv", help="The csv file for how busy each stage of a --pipeline run was")
+parser.add_argument("--plot-workers", type=int, default=1, help="The number of worker processes the plots of each stand are split over, for very large stands. The outputs are the same as on one process. Not with --workers or --pipeline. Put this before the action, like `tps_cli.py --plot-workers 4 bio stand composite ws01`")
 
 args = parser.parse_args()
 
+# the stands of --workers and --pipeline runs are computed on worker processes, which can not split them again
+if args.plot_workers > 1 and (args.workers > 1 or args.pipeline):
+    parser.error("--plot-workers can not be combined with --workers or --pipeline; the stands of those runs are already computed on worker processes")
+
+# a batch run quarantines its stands on one process, in the order of the run
+if args.batch and (args.workers > 1 or args.pipeline or args.shard != None):
+    parser.error("--batch can not be combined with --workers, --pipeline, or --shard; --batch runs are streamed on one process")
+
+# the plots of each stand are split over this many processes
+tps_Stand.PLOT_WORKERS = args.plot_workers
+
+# bad data raises poptree_basis.DataError instead of stopping at the debugger
+if args.batch:
+    poptree_basis.BATCH = True
+
+
+### ONE SHARD OF AN --all RUN ###
+if args.shard != None and not args.resume and len(args.number) == 1 and args.number[0] == "--all":
+
+    run_key = (args.action.lower(), args.scale.lower(), args.analysis.lower())
+
+    if run_key in execution_basis.STREAMING_RUNS:
+        shard, shards = args.shard
+        print("computing shard " + str(shard) + " of " + str(shards) + " of ALL " + args.scale.lower() + "s with the " + args.analysis.lower() + " analysis for " + args.action.lower())
+
+        # the first shard to start splits the stands by their costs, and the others use its split; the costs are only counted for that
+        list_all_stands = execution_basis.all_standids(cur, queries, args.scale.lower())
+        costs = lambda: execution_basis.stand_costs(cur, queries)
+
+        try:
+            execution_basis.run_shard(cur, XFACTOR, queries, list_all_stands, run_key, shard, shards, costs)
+        except ValueError as error:
+            print("the shard was not run: " + str(error))
+            sys.exit(1)
+
+        sys.exit(0)
+
+    else:
+        print("shards are only available for --all runs of " + ", ".join([" ".join(x) for x in sorted(execution_basis.STREAMING_RUNS.keys())]) + "; running the whole run")
+
+
+### --all RUNS AS A FETCH, COMPUTE, AND WRITE PIPELINE ###
+if args.pipeline and not args.resume and len(args.number) == 1 and args.number[0] == "--all":
+
+    run_key = (args.action.lower(), args.scale.lower(), args.analysis.lower())
+
+    if run_key in execution_basis.STREAMING_RUNS:
+        print("computing ALL " + args.scale.lower() + "s with the " + args.analysis.lower() + " analysis for " + args.action.lower() + " in a pipeline of " + str(args.fetchers) + " fetch threads and " + str(args.workers) + " compute workers")
+
+        # get all the stands, in this case from the database
+        list_all_stands = execution_basis.all_standids(cur, queries, args.scale.lower())
+
+        # estimate the cost of each stand by its tree-years, so the largest stands are fetched first
+        costs = execution_basis.stand_costs(cur, queries)
+
+        summary, stages = execution_basis.run_pipeline(list_all_stands, run_key, queries, XFACTOR, args.workers, args.fetchers, args.queue_depth, None, costs)
+        execution_basis.write_cost_report(summary, args.cost_report)
+        execution_basis.write_pipeline_report(stages, args.pipeline_report)
+
+        sys.exit(0)
+
+    else:
+        print("the pipeline is only available for --all runs of " + ", ".join([" ".join(x) for x in sorted(execution_basis.STREAMING_RUNS.keys())]) + "; running without it")
+
+
+### --all RUNS ON WORKER PROCESSES ###
+if args.workers > 1 and not args.resume and len(args.number) == 1 and args.number[0] == "--all":
+
+    run_key = (args.action.lower(), args.scale.lower(), args.analysis.lower())
+
+    if run_key in execution_basis.STREAMING_RUNS:
+        print("computing ALL " + args.scale.lower() + "s with the " + args.analysis.lower() + " analysis for " + args.action.lower() + " on " + str(args.workers) + " workers")
+
+        if args.stream or args.memory_budget != None:
+            print("each worker holds one stand at a time; the run summary of --stream is only written for runs on one process")
+
+        # get all the stands, in this case from the database
+        list_all_stands = execution_basis.all_standids(cur, queries, args.scale.lower())
+
+        # estimate the cost of each stand by its tree-years, so the largest stands start first
+        costs = execution_basis.stand_costs(cur, queries)
+
+        # the workers share XFACTOR and its equations instead of each building their own
+        summary = execution_basis.run_parallel(list_all_stands, run_key, queries, args.workers, None, costs, XFACTOR)
+        execution_basis.write_cost_report(summary, args.cost_report)
+
+        sys.exit(0)
+
+    else:
+        print("workers are only available for --all runs of " + ", ".join([" ".join(x) for x in sorted(execution_basis.STREAMING_RUNS.keys())]) + "; running on one process")
+
+
+### STREAMING --all RUNS ###
+if (args.stream or args.memory_budget != None or args.resume or args.batch) and len(args.number) == 1 and args.number[0] == "--all":
+
+    run_key = (args.action.lower(), args.scale.lower(), args.analysis.lower())
+
+    if run_key in execution_basis.STREAMING_RUNS:
+        print("streaming ALL " + args.scale.lower() + "s with the " + args.analysis.lower() + " analysis for " + args.action.lower())
+
+        if args.resume and (args.workers > 1 or args.pipeline or args.shard != None):
+            print("resumed runs are streamed on one process; --workers, --pipeline, and --shard are not used")
+
+        # stands with bad data are set aside here, instead of stopping the run
+        if args.batch:
+            quarantine = execution_basis.Quarantine(args.quarantine)
+        else:
+            quarantine = None
+
+        # get all the stands, in this case from the database
+        list_all_stands = execution_basis.all_standids(cur, queries, args.scale.lower())
+
+        # the journal records each stand as it is written, so that the run can be resumed with --resume
+        journal = execution_basis.RunJournal(execution_basis.STREAMING_RUNS[run_key], run_key, list_all_stands, args.resume)
+
+        results, write = execution_basis.stream_results(cur, XFACTOR, queries, list_all_stands[journal.next_index:], args.action.lower(), args.scale.lower(), args.analysis.lower(), quarantine)
+        summary = execution_basis.run_streaming(results, write, args.memory_budget, journal.next_index, journal)
+        journal.close()
+
+        execution_basis.write_run_summary(summary, args.run_summary, args.memory_budget)
+
+        if quarantine != None and quarantine.count > 0:
+            print(str(quarantine.count) + " stands were quarantined in " + quarantine.filename + "; run them again with `tps_cli.py retry " + quarantine.filename + "`")
+
+        # the run stopped at the memory budget; it goes on from the journal in a new process
+        if summary != [] and summary[-1]['over_budget'] == True:
+            print("the run stopped after " + summary[-1]['standid'] + " at the memory budget; go on from the next stand with `tps_cli.py --resume --memory-budget " + str(args.memory_budget) + " " + " ".join(run_key) + " --all`")
+            sys.exit(3)
+
+        sys.exit(0)
+
+    else:
+        print("streaming is only available for --all runs of " + ", ".join([" ".join(x) for x in sorted(execution_basis.STREAMING_RUNS.keys())]) + "; running without streaming")
+
 
 #args.action, args.scale, args.analysis, args.number - arguements needed
 
@@ -438,60 +651,8 @@ if args.action.lower() == 'bio':
                 for row in cur:
                     list_of_all_studies.append(str(row[0]))
 
-                first_study = list_of_all_studies[0]
-
-
-                sql = queries['execution']['list_of_stands_in_studies'].format(studyid=first_study)
-
-                cur.execute(sql)
-
-                # a blank list for each stand on this study
-                list_of_stands = []
-
-                # extract the first stand and start a file
-                for row in cur:
-                    list_of_stands.append(str(row[0]))
-
-                # create the file with the first stand on that first study
-                A = tps_Stand.Stand(cur, XFACTOR, queries, list_of_stands[0].lower())
-                BM, BTR, _ = A.compute_biomasses(XFACTOR)
-                BMA = A.aggregate_biomasses(BM)
-                A.write_stand_composite(BM, BMA, XFACTOR, 'all_studies_biomass_composite_output.csv', 'w')
-                del A
-                del BM
-                del BMA
-
-                for each_stand in list_of_stands[1:]:
-                    A = tps_Stand.Stand(cur, XFACTOR, queries, each_stand.lower())
-                    BM, BTR, _ = A.compute_biomasses(XFACTOR)
-                    BMA = A.aggregate_biomasses(BM)
-                    A.write_stand_composite(BM, BMA, XFACTOR, 'all_studies_biomass_composite_output.csv', 'a')
-                    del A
-                    del BM
-                    del BMA
-
-                for each_study in list_of_all_studies[1:]:
-
-                    sql = queries['execution']['list_of_stands_in_studies'].format(studyid=each_study)
-                    cur.execute(sql)
-
-                    # a blank list for each stand on this study
-                    list_of_stands = []
-
-                    # extract the first stand and start a file
-                    for row in cur:
-                        list_of_stands.append(str(row[0]))
-
-                    # get each stand from the list of stands and append output to the file
-                    # for the -- all method
-                    for each_stand in list_of_stands:
-                        A = tps_Stand.Stand(cur, XFACTOR, queries, each_stand.lower())
-                        BM, BTR, _ = A.compute_biomasses(XFACTOR)
-                        BMA = A.aggregate_biomasses(BM)
-                        A.write_stand_composite(BM, BMA, XFACTOR, 'all_studies_biomass_composite_output.csv', 'a')
-                        del A
-                        del BM
-                        del BMA
+                # a stand in more than one study is computed once and written for each of them
+                execution_basis.run_study(cur, XFACTOR, queries, list_of_all_studies, ('bio', 'study', 'composite'), 'all_studies_biomass_composite_output.csv')
 
             # if the first arguement is not all, no further arguements would be all
             elif args.number[0] != "--all":
@@ -606,9 +767,6 @@ if args.action.lower() == 'bio':
             if len(args.number) == 1 and args.number[0]=="--all":
                 print("computing ALL " + args.scale.lower() + "s with the " + args.analysis.lower() + " analysis for " + args.action.lower())
 
-                # get all the units from the inputs that follow the last argument in.
-                list_all_stands = []
-
                 cli_filename = "all_study_indvtree_output.csv"
 
                 cur.execute(queries['execution']['list_of_all_studies'])
@@ -619,43 +777,8 @@ if args.action.lower() == 'bio':
                 for row in cur:
                     list_of_all_studies.append(str(row[0]))
 
-                first_study = list_of_all_studies[0]
-
-                sql = queries['execution']['list_of_stands_in_studies'].format(studyid=first_study)
-                cur.execute(sql)
-                list_of_stands = []
-
-                # extract the first stand and start a file
-                for row in cur:
-                    list_of_stands.append(str(row[0]))
-
-                # create the file with the first stand
-                A = tps_Stand.Stand(cur, XFACTOR, queries, list_of_stands[0].lower())
-
-                # create the file with the first stand
-                A = tps_Stand.Stand(cur, XFACTOR, queries, list_of_stands[0].lower())
-                A.write_individual_trees(cli_filename, 'w')
-                del A
-
-                for each_stand in list_of_stands[1:]:
-                    # create the file with the first stand
-                    A = tps_Stand.Stand(cur, XFACTOR, queries, each_stand.lower())
-                    A.write_individual_trees(cli_filename, 'a')
-
-                for each_study in list_of_all_studies[1:]:
-                    sql = queries['execution']['list_of_stands_in_studies'].format(studyid=each_study)
-                    cur.execute(sql)
-                    list_of_stands = []
-
-                    # extract the first stand and start a file
-                    for row in cur:
-                        list_of_stands.append(str(row[0]))
-
-                    for each_stand in list_of_stands:
-                        # create the file with the first stand
-                        A = tps_Stand.Stand(cur, XFACTOR, queries, each_stand.lower())
-                        A.write_individual_trees(cli_filename, 'a')
-                        del A
+                # a stand in more than one study is computed once and written for each of them
+                execution_basis.run_study(cur, XFACTOR, queries, list_of_all_studies, ('bio', 'study', 'tree'), cli_filename)
 
             # if the first arguement is not all, no further arguements would be all
             elif args.number[0] != "--all":